@@ -0,0 +1,30 @@
+"""product sku
+
+Revision ID: a6c8e0b2d4f5
+Revises: f3b5d7e9a1c2
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c8e0b2d4f5'
+down_revision: Union[str, Sequence[str], None] = 'f3b5d7e9a1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: артикул товара — ключ импорта прайс-листов."""
+    op.add_column('products', sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_products_sku', 'products', ['sku'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_products_sku', 'products', type_='unique')
+    op.drop_column('products', 'sku')
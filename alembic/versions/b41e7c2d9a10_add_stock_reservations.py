@@ -0,0 +1,56 @@
+"""add stock reservations
+
+Revision ID: b41e7c2d9a10
+Revises: 2caba12c368a
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41e7c2d9a10'
+down_revision: Union[str, Sequence[str], None] = '2caba12c368a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: резервы остатков под заказы."""
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False, server_default='active'),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_reservations_order_id'), 'stock_reservations', ['order_id'], unique=False)
+    # Частичный индекс для фонового освобождения просроченных резервов
+    op.create_index(
+        'ix_stock_reservations_active_expires_at',
+        'stock_reservations',
+        ['expires_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'active' AND expires_at IS NOT NULL"),
+    )
+    # Остаток не может уйти в минус даже при ошибке в коде резервирования.
+    # Отрицательные остатки от прежних гонок при оформлении заказов обнуляем.
+    op.execute("UPDATE products SET qty = 0 WHERE qty < 0")
+    op.create_check_constraint('ck_products_qty_non_negative', 'products', 'qty >= 0')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('ck_products_qty_non_negative', 'products', type_='check')
+    op.drop_index('ix_stock_reservations_active_expires_at', table_name='stock_reservations')
+    op.drop_index(op.f('ix_stock_reservations_order_id'), table_name='stock_reservations')
+    op.drop_table('stock_reservations')
@@ -0,0 +1,28 @@
+"""broadcast lease owner
+
+Revision ID: b7d9f1a3c5e8
+Revises: a6c8e0b2d4f5
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d9f1a3c5e8'
+down_revision: Union[str, Sequence[str], None] = 'a6c8e0b2d4f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: токен аренды рассылки — прогресс сохраняет только её владелец."""
+    op.add_column('broadcasts', sa.Column('lease_owner', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('broadcasts', 'lease_owner')
@@ -0,0 +1,35 @@
+"""telegram webhooks
+
+Revision ID: b7e9a1c3d5f6
+Revises: a4d6f8b0c2e1
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e9a1c3d5f6'
+down_revision: Union[str, Sequence[str], None] = 'a4d6f8b0c2e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: зарегистрированный webhook бота (URL и хэш секрета)."""
+    op.create_table(
+        'telegram_webhooks',
+        sa.Column('bot_id', sa.BigInteger(), nullable=False),
+        sa.Column('url', sa.String(length=512), nullable=False),
+        sa.Column('secret_sha256', sa.String(length=64), nullable=True),
+        sa.Column('registered_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('bot_id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('telegram_webhooks')
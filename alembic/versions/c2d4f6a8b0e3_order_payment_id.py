@@ -0,0 +1,30 @@
+"""order payment id
+
+Revision ID: c2d4f6a8b0e3
+Revises: b7e9a1c3d5f6
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d4f6a8b0e3'
+down_revision: Union[str, Sequence[str], None] = 'b7e9a1c3d5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: платёж ЮKassa, созданный для заказа."""
+    op.add_column('orders', sa.Column('payment_id', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_orders_payment_id', 'orders', ['payment_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_orders_payment_id', 'orders', type_='unique')
+    op.drop_column('orders', 'payment_id')
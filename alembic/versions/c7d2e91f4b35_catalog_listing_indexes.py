@@ -0,0 +1,44 @@
+"""catalog listing indexes
+
+Revision ID: c7d2e91f4b35
+Revises: b41e7c2d9a10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e91f4b35'
+down_revision: Union[str, Sequence[str], None] = 'b41e7c2d9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: индексы для фильтров и keyset-пагинации GET /products."""
+    # Рекурсивный обход вложенных категорий
+    op.create_index(op.f('ix_categories_parent_id'), 'categories', ['parent_id'], unique=False)
+    # Фильтр по категории, порядок по id
+    op.create_index('ix_products_category_id_id', 'products', ['category_id', 'id'], unique=False)
+    # Фильтр «в наличии»
+    op.create_index(
+        'ix_products_in_stock_id', 'products', ['id'], unique=False,
+        postgresql_where=sa.text('qty > 0'),
+    )
+    # Диапазон цен и порядок (price, id) среди текущих цен
+    op.create_index(
+        'ix_prices_current_price_product_id', 'prices', ['price', 'product_id'], unique=False,
+        postgresql_where=sa.text('is_current IS TRUE'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_prices_current_price_product_id', table_name='prices')
+    op.drop_index('ix_products_in_stock_id', table_name='products')
+    op.drop_index('ix_products_category_id_id', table_name='products')
+    op.drop_index(op.f('ix_categories_parent_id'), table_name='categories')
@@ -0,0 +1,84 @@
+"""current price, primary image and fk indexes
+
+Revision ID: d3a8f6b1c2e7
+Revises: c7d2e91f4b35
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a8f6b1c2e7'
+down_revision: Union[str, Sequence[str], None] = 'c7d2e91f4b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema.
+
+    Условия частичных индексов записаны как ``IS TRUE`` — ровно так, как их пишут запросы
+    (``.is_(True)``): планировщик не сопоставляет ``WHERE is_current`` с ``is_current IS TRUE``.
+    Индексы строятся CONCURRENTLY, чтобы не блокировать запись в горячие таблицы.
+    """
+    # Одна текущая цена на товар: у дублей оставляем самую свежую запись
+    op.execute(
+        """
+        UPDATE prices AS p
+        SET is_current = false, end_date = COALESCE(p.end_date, now())
+        WHERE p.is_current IS TRUE
+          AND EXISTS (
+              SELECT 1 FROM prices AS q
+              WHERE q.product_id = p.product_id AND q.is_current IS TRUE AND q.id > p.id
+          )
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_prices_current_product_id', 'prices', ['product_id'], unique=True,
+            postgresql_where=sa.text('is_current IS TRUE'), postgresql_concurrently=True,
+        )
+        op.create_index(
+            'uq_product_images_primary_product_id', 'product_images', ['product_id'], unique=True,
+            postgresql_where=sa.text('is_primary IS TRUE'), postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_orders_user_id'), 'orders', ['user_id'], unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix_cart_items_product_id'), 'cart_items', ['product_id'], unique=False,
+            postgresql_concurrently=True,
+        )
+
+    # Заменены частичными индексами выше
+    op.execute("DROP INDEX IF EXISTS uq_product_images_primary_per_product")
+    op.drop_index(op.f('ix_prices_is_current'), table_name='prices')
+    op.drop_index(op.f('ix_product_images_is_primary'), table_name='product_images')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_product_images_is_primary'), 'product_images', ['is_primary'], unique=False)
+    op.create_index(op.f('ix_prices_is_current'), 'prices', ['is_current'], unique=False)
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_product_images_primary_per_product
+        ON product_images(product_id)
+        WHERE is_primary = true;
+        """
+    )
+    op.drop_index(op.f('ix_cart_items_product_id'), table_name='cart_items')
+    op.drop_index(op.f('ix_orders_user_id'), table_name='orders')
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_index('uq_product_images_primary_product_id', table_name='product_images')
+    op.drop_index('uq_prices_current_product_id', table_name='prices')
@@ -0,0 +1,49 @@
+"""payment events inbox
+
+Revision ID: d5f7b9c1e3a4
+Revises: c2d4f6a8b0e3
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f7b9c1e3a4'
+down_revision: Union[str, Sequence[str], None] = 'c2d4f6a8b0e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: inbox уведомлений ЮKassa с дедупликацией по платежу и событию."""
+    op.create_table(
+        'payment_events',
+        sa.Column('payment_id', sa.String(length=64), nullable=False),
+        sa.Column('event', sa.String(length=64), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('received_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('result', sa.String(length=32), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('payment_id', 'event'),
+    )
+    op.create_index(
+        'ix_payment_events_pending_next_attempt_at',
+        'payment_events',
+        ['next_attempt_at'],
+        unique=False,
+        postgresql_where=sa.text('processed_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payment_events_pending_next_attempt_at', table_name='payment_events')
+    op.drop_table('payment_events')
@@ -0,0 +1,36 @@
+"""product image variants
+
+Revision ID: e5b7c9d1a3f4
+Revises: d3a8f6b1c2e7
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7c9d1a3f4'
+down_revision: Union[str, Sequence[str], None] = 'd3a8f6b1c2e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: ширины готовых вариантов изображения.
+
+    Для существующих строк колонка пустая; варианты создаёт
+    ``python -m app.services.image_variants``.
+    """
+    op.add_column(
+        'product_images',
+        sa.Column('variant_widths', postgresql.ARRAY(sa.Integer()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product_images', 'variant_widths')
@@ -0,0 +1,36 @@
+"""orders keyset indexes
+
+Revision ID: e8a0c2d4f6b7
+Revises: d5f7b9c1e3a4
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a0c2d4f6b7'
+down_revision: Union[str, Sequence[str], None] = 'd5f7b9c1e3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: индексы для постраничной истории заказов по (order_date, id)."""
+    op.create_index(
+        'ix_orders_user_id_order_date', 'orders',
+        ['user_id', sa.text('order_date DESC'), sa.text('id DESC')],
+    )
+    op.create_index('ix_orders_order_date_id', 'orders', [sa.text('order_date DESC'), sa.text('id DESC')])
+    # Покрывается составным индексом (user_id — его первый столбец)
+    op.drop_index('ix_orders_user_id', table_name='orders')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_orders_user_id', 'orders', ['user_id'])
+    op.drop_index('ix_orders_order_date_id', table_name='orders')
+    op.drop_index('ix_orders_user_id_order_date', table_name='orders')
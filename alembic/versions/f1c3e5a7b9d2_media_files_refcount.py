@@ -0,0 +1,39 @@
+"""media files refcount
+
+Revision ID: f1c3e5a7b9d2
+Revises: e5b7c9d1a3f4
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c3e5a7b9d2'
+down_revision: Union[str, Sequence[str], None] = 'e5b7c9d1a3f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema: счётчики ссылок на файлы хранилища, адресуемого по содержимому.
+
+    Существующие файлы ``media/products/<id>/`` переносит в хранилище
+    ``python -m app.services.media_migration`` — ему нужен доступ к media_root.
+    """
+    op.create_table(
+        'media_files',
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('refcount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('path'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('media_files')
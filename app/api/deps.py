@@ -1,4 +1,4 @@
-"""Зависимости FastAPI: получение сессии БД и текущего пользователя.
+"""Зависимости FastAPI: получение сессии БД (primary или реплика для чтения) и текущего пользователя.
 
 Поддерживаются два режима авторизации:
 - Основной: JWT (Authorization: Bearer), выдаётся через /tg/webapp/auth после валидации initData Mini App.
@@ -7,13 +7,14 @@
 from __future__ import annotations
 
 import logging
+from typing import AsyncIterator
 
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 import jwt
 
-from app.core.db import get_session
+from app.core.db import replicas, request_session
 from app.schemas.user import UserMe
 from app.services.user_service import UserService
 from app.core.config import settings
@@ -21,11 +22,20 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
-async def get_db_session() -> AsyncSession:
-    """Асинхронна�� сессия БД."""
-    async for s in get_session():
-        return s
-    raise RuntimeError("Не удалось получить сессию БД")
+async def get_db_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Асинхронная сессия БД на время запроса; закрывается сразу после обработки."""
+    async with request_session(f"{request.method} {request.url.path}") as session:
+        yield session
+
+
+async def get_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Сессия для чтения: реплика, если настроена, иначе primary.
+
+    Только для эндпоинтов, которым не важно увидеть собственные только что сделанные
+    записи (каталог). Корзина, адреса и заказы используют ``get_db_session``.
+    """
+    async with request_session(f"{request.method} {request.url.path}", replicas.read_factory()) as session:
+        yield session
 
 
 async def get_current_user(
@@ -35,7 +45,8 @@ async def get_current_user(
 ) -> UserMe:
     """Получить текущего пользователя.
 
-    Приоритет: Bearer JWT → dev fallback X-Telegram-Id.
+    Приоритет: Bearer JWT → dev fallback X-Telegram-Id. Пользователь берётся из
+    in-process кэша по telegram_id, поэтому обычный запрос не пишет в БД.
     """
     user_service = UserService(session)
 
@@ -50,14 +61,12 @@ async def get_current_user(
         except Exception as e:
             logger.warning(f"Недействительный JWT токен: {e}")
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Недействительный токен")
-        user = await user_service.get_or_create_by_telegram(telegram_id=telegram_id)
-        return UserMe(id=user.id, telegram_id=user.telegram_id, role=user.role)  # type: ignore[arg-type]
+        return await user_service.resolve_identity(telegram_id=telegram_id)
 
     # 2) Dev fallback (устаревший путь)
     if settings.app_env == "dev" and x_telegram_id is not None:
         logger.debug(f"Dev fallback авторизация: X-Telegram-Id={x_telegram_id}")
-        user = await user_service.get_or_create_by_telegram(telegram_id=x_telegram_id)
-        return UserMe(id=user.id, telegram_id=user.telegram_id, role=user.role)  # type: ignore[arg-type]
+        return await user_service.resolve_identity(telegram_id=x_telegram_id)
 
     logger.warning("Попытка доступа без авторизации")
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Требуется авторизация")
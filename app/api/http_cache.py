@@ -0,0 +1,76 @@
+"""Условные HTTP-ответы (ETag / Last-Modified / 304) для кэшируемых снимков и медиа-файлов."""
+from __future__ import annotations
+
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import PurePath
+
+from fastapi import Request, Response, status
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+from app.core.cache import Snapshot
+from app.core.config import settings
+from app.services.file_service import OBJECTS_DIR
+
+# Файл по адресу из хэша содержимого никогда не меняется
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _not_modified(request: Request, snapshot: Snapshot) -> bool:
+    """Проверка предусловий по RFC 9110: If-None-Match приоритетнее If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Для If-None-Match допускается слабое сравнение: прокси могут добавить W/
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or snapshot.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(snapshot.last_modified) <= since
+    return False
+
+
+def snapshot_response(request: Request, snapshot: Snapshot, max_age: int | None = None) -> Response:
+    """JSON-ответ из снимка с валидаторами кэша или 304 без тела, если клиентская копия актуальна."""
+    max_age = settings.catalog_http_max_age_seconds if max_age is None else max_age
+    headers = {
+        "ETag": snapshot.etag,
+        "Last-Modified": formatdate(snapshot.last_modified, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if _not_modified(request, snapshot):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+class MediaFiles(StaticFiles):
+    """Раздача media_root; файлы хранилища по содержимому кэшируются навсегда.
+
+    ETag таких файлов — хэш из имени (для вариантов — с суффиксом ширины), поэтому
+    он одинаков во всех воркерах и не зависит от mtime. Остальные файлы раздаются
+    как обычно.
+    """
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike[str],
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        if not self.get_path(scope).startswith(f"{OBJECTS_DIR}/"):
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        headers = {"ETag": f'"{PurePath(full_path).stem}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,51 @@
+"""Роуты рассылок подписчикам (только для администраторов).
+
+Рассылка создаётся в статусе ``pending`` и выполняется фоновой задачей
+(``run_broadcast_worker``), поэтому запрос возвращается сразу.
+"""
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import require_role_at_most, get_db_session
+from app.models.broadcast import Broadcast
+from app.models.user import UserRole
+from app.schemas.broadcast import BroadcastIn, BroadcastOut
+from app.services.broadcast_service import BroadcastService, throughput
+
+router = APIRouter(
+    prefix="/broadcasts",
+    tags=["broadcasts"],
+    dependencies=[Depends(require_role_at_most(UserRole.ADMIN))],
+)
+
+
+def _out(broadcast: Broadcast) -> BroadcastOut:
+    out = BroadcastOut.model_validate(broadcast)
+    out.messages_per_second = throughput(broadcast)
+    return out
+
+
+@router.post("", status_code=202, response_model=BroadcastOut)
+async def create_broadcast(data: BroadcastIn, session: AsyncSession = Depends(get_db_session)):
+    broadcast = await BroadcastService(session).create(data.text)
+    return _out(broadcast)
+
+
+@router.get("/{broadcast_id}", response_model=BroadcastOut)
+async def get_broadcast(broadcast_id: int, session: AsyncSession = Depends(get_db_session)):
+    broadcast = await BroadcastService(session).get(broadcast_id)
+    if broadcast is None:
+        raise HTTPException(404, "Рассылка не найдена")
+    return _out(broadcast)
+
+
+@router.post("/{broadcast_id}/cancel", response_model=BroadcastOut)
+async def cancel_broadcast(broadcast_id: int, session: AsyncSession = Depends(get_db_session)):
+    service = BroadcastService(session)
+    if not await service.cancel(broadcast_id):
+        raise HTTPException(409, "Рассылка не найдена или уже завершена")
+    broadcast = await service.get(broadcast_id)
+    await session.refresh(broadcast)
+    return _out(broadcast)
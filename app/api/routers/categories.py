@@ -1,20 +1,39 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import require_role_at_most, get_db_session
+from app.api.deps import require_role_at_most, get_db_session, get_read_session
+from app.api.http_cache import snapshot_response
+from app.core.cache import catalog_cache
 from app.models.user import UserRole
 from app.models.catalog import Category
-from app.schemas.category import CategoryIn, CategoryUpdate
+from app.schemas.category import CategoryIn, CategoryOut, CategoryUpdate
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+_categories_adapter = TypeAdapter(list[CategoryOut])
+
+
+@router.get("", response_model=list[CategoryOut])
+async def list_categories(request: Request, session: AsyncSession = Depends(get_read_session)):
+    """Все категории (дерево задаётся parent_id). Поддерживает ETag/304."""
+
+    async def build() -> list[CategoryOut]:
+        res = await session.execute(select(Category).order_by(Category.id))
+        return [CategoryOut.model_validate(c) for c in res.scalars().all()]
+
+    snapshot = await catalog_cache.get(build, _categories_adapter.dump_json, key=("categories",))
+    return snapshot_response(request, snapshot)
+
 
 @router.post("", status_code=201, dependencies=[Depends(require_role_at_most(UserRole.MANAGER))])
 async def create_category(data: CategoryIn, session: AsyncSession = Depends(get_db_session)):
     c = Category(**data.model_dump())
     session.add(c)
+    catalog_cache.mark_dirty(session)
     await session.commit()
     await session.refresh(c)
     return {"id": c.id}
@@ -27,6 +46,7 @@ async def update_category(category_id: int, data: CategoryUpdate, session: Async
         raise HTTPException(status_code=404, detail="Категория не найдена")
     for k, v in data.model_dump(exclude_none=True).items():
         setattr(c, k, v)
+    catalog_cache.mark_dirty(session)
     await session.commit()
     return {"ok": True}
 
@@ -37,4 +57,5 @@ async def delete_category(category_id: int, session: AsyncSession = Depends(get_
     if not c:
         raise HTTPException(status_code=404, detail="Категория не найдена")
     await session.delete(c)
+    catalog_cache.mark_dirty(session)
     await session.commit()
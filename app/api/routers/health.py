@@ -1,8 +1,13 @@
 """Проверка состояния сервера."""
 from __future__ import annotations
 
+from typing import Any
+
 from fastapi import APIRouter
 
+from app.core.cache import catalog_cache, identity_cache, init_data_cache
+from app.core.db import pool_stats, replicas
+
 router = APIRouter(prefix="/health", tags=["health"])
 
 
@@ -10,3 +15,19 @@ router = APIRouter(prefix="/health", tags=["health"])
 async def ping() -> dict[str, str]:
     """Простой пинг для проверки доступности сервера."""
     return {"status": "ok"}
+
+
+@router.get("/cache")
+async def cache_stats() -> dict[str, dict]:
+    """Счётчики in-process кэшей (попадания, промахи, время пересборки)."""
+    return {
+        "catalog": catalog_cache.stats(),
+        "identity": identity_cache.stats(),
+        "webapp_init_data": init_data_cache.stats(),
+    }
+
+
+@router.get("/db")
+async def db_pool_stats() -> dict[str, Any]:
+    """Состояние пулов соединений (primary и реплик): занятые/свободные, выдачи, ожидание."""
+    return {"pool": pool_stats(), "replicas": replicas.stats()}
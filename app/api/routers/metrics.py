@@ -0,0 +1,14 @@
+"""Метрики для Prometheus."""
+from __future__ import annotations
+
+from fastapi import APIRouter, Response
+
+from app.core.metrics import CONTENT_TYPE, exposition
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Метрики всех воркеров (или этого процесса, если METRICS_MULTIPROC_DIR не задан)."""
+    return Response(exposition(), media_type=CONTENT_TYPE)
@@ -1,11 +1,13 @@
-"""Роуты для оформления заказов."""
+"""Роуты для оформления заказов и истории заказов."""
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db_session
-from app.schemas.order import OrderCreate, OrderOut
+from app.api.deps import get_current_user, get_db_session, require_role_at_most
+from app.models.order import OrderStatus
+from app.models.user import UserRole
+from app.schemas.order import OrderCreate, OrderOut, OrderPage, OrderStatusChange, OrderStatusChangeOut
 from app.schemas.user import UserMe
 from app.services.order_service import OrderService
 
@@ -27,3 +29,85 @@ async def create_order(
         return await service.create_order(user=user, data=data)  # type: ignore[arg-type]
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("", response_model=OrderPage)
+async def list_my_orders(
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    user: UserMe = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+) -> OrderPage:
+    """История заказов текущего пользователя, новые первыми.
+
+    Следующая страница запрашивается с ``cursor`` из ``next_cursor`` предыдущего ответа.
+    """
+    try:
+        return await OrderService(session).list_orders(limit=limit, cursor=cursor, user_id=user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/all", response_model=OrderPage)
+async def list_all_orders(
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user_id: int | None = None,
+    order_status: OrderStatus | None = Query(default=None, alias="status"),
+    _: UserMe = Depends(require_role_at_most(UserRole.MANAGER)),
+    session: AsyncSession = Depends(get_db_session),
+) -> OrderPage:
+    """Заказы всех пользователей для менеджеров (новые первыми), с фильтром по пользователю и статусу."""
+    try:
+        return await OrderService(session).list_orders(
+            limit=limit, cursor=cursor, user_id=user_id, status=order_status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post("/status", response_model=OrderStatusChangeOut)
+async def change_orders_status(
+    data: OrderStatusChange,
+    _: UserMe = Depends(require_role_at_most(UserRole.MANAGER)),
+    session: AsyncSession = Depends(get_db_session),
+) -> OrderStatusChangeOut:
+    """Перевести пачку заказов в новый статус (например, все собранные — в доставку).
+
+    Переходы: created → assembling | cancelled, assembling → delivering | completed | cancelled,
+    delivering → completed. Заказы в других статусах, неоплаченные заказы с предоплатой
+    (кроме отмены) и оплаченные (при отмене) возвращаются в ``skipped``.
+    """
+    try:
+        return await OrderService(session).change_status(order_ids=data.order_ids, status=data.status)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/{order_id}", response_model=OrderOut)
+async def get_order(
+    order_id: int,
+    user: UserMe = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+) -> OrderOut:
+    """Заказ с позициями: свой — для покупателя, любой — для менеджера и администратора."""
+    owner_id = None if int(user.role) <= int(UserRole.MANAGER) else user.id
+    order = await OrderService(session).get_order(order_id=order_id, user_id=owner_id)
+    if order is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Заказ не найден")
+    return order
+
+
+@router.post("/{order_id}/cancel")
+async def cancel_order(
+    order_id: int,
+    user: UserMe = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+) -> dict[str, bool]:
+    """Отменить свой неоплаченный заказ в статусе created; остатки возвращаются на склад."""
+    service = OrderService(session)
+    try:
+        await service.cancel_order(user=user, order_id=order_id)  # type: ignore[arg-type]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"ok": True}
@@ -1,33 +1,62 @@
-"""Роуты платежей (ЮKassa): callback вебхук и (опционально) создание платежа."""
+"""Роуты платежей (ЮKassa): callback вебхук и создание платежа по заказу."""
 from __future__ import annotations
 
-from typing import Any
+import hmac
+import math
 
-from fastapi import APIRouter, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.payments import YooKassaService
+from app.api.deps import get_current_user, get_db_session
+from app.core.config import settings
+from app.schemas.payment import PaymentCreate, PaymentNotification, PaymentOut
+from app.schemas.user import UserMe
+from app.services.payment_inbox import PaymentInboxService
+from app.services.payments import PaymentGatewayUnavailable, PaymentRejected, PaymentService
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
 @router.post("/yookassa/callback")
-async def yookassa_callback(request: Request) -> dict[str, str]:
-    """Обработчик webhook от ЮKassa.
-
-    На данном этапе заглушка: принимает JSON и отвечает 200 OK.
-    В реальной реализации здесь обновляется статус оплаты заказа.
+async def yookassa_callback(
+    request: Request,
+    token: str | None = None,
+    session: AsyncSession = Depends(get_db_session),
+) -> dict[str, str]:
+    """Webhook ЮKassa: сохранить уведомление в inbox и сразу ответить 200.
+
+    Если задан ``YOOKASSA__WEBHOOK_SECRET``, URL webhook в кабинете должен содержать
+    ``?token=<секрет>``. Повторная доставка уже сохранённого уведомления ничего не меняет;
+    к заказу уведомление применяет фоновый воркер после сверки платежа с API ЮKassa.
     """
+    secret = settings.yookassa.webhook_secret
+    if secret and not hmac.compare_digest((token or "").encode(), secret.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Неверный токен webhook")
     try:
-        payload: Any = await request.json()
-        # TODO: проверить подпись, обновить статус заказа по payload
-    except Exception as e:  # pragma: no cover
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        notification = PaymentNotification.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.errors(include_url=False))
+    await PaymentInboxService(session).record(notification)
     return {"status": "ok"}
 
 
-@router.post("/yookassa/create")
-async def yookassa_create(amount: float, description: str) -> dict[str, Any]:
-    """Пример создания платежа (упрощённо)."""
-    service = YooKassaService()
-    payment = await service.create_payment(amount=amount, description=description)
-    return payment
+@router.post("/yookassa/create", response_model=PaymentOut)
+async def yookassa_create(
+    data: PaymentCreate,
+    user: UserMe = Depends(get_current_user),
+    session: AsyncSession = Depends(get_db_session),
+) -> PaymentOut:
+    """Создать платёж по своему заказу с предоплатой и вернуть ссылку на оплату.
+
+    Повторный вызов для того же заказа возвращает тот же платёж.
+    """
+    try:
+        return await PaymentService(session).create_for_order(user_id=user.id, order_id=data.order_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PaymentGatewayUnavailable as e:
+        headers = {"Retry-After": str(max(1, math.ceil(e.retry_after or 1)))}
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers=headers)
+    except PaymentRejected as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
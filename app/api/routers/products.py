@@ -1,45 +1,117 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+import io
+from decimal import Decimal
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import require_role_at_most, get_db_session
+from app.api.deps import require_role_at_most, get_db_session, get_read_session
+from app.api.http_cache import snapshot_response
 from app.models.user import UserRole
 from app.models.catalog import Product
-from app.schemas.product import ProductIn, ProductUpdate, ProductImageOut
+from app.schemas.product import CatalogImportResult, ProductIn, ProductUpdate, ProductImageOut, ProductPage
 from app.repositories.product_repository import ProductRepository
+from app.services.catalog_import import CatalogImportService, detect_format
 from app.services.product_service import ProductService
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
+@router.get("", response_model=ProductPage)
+async def list_products(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    sort: Literal["id", "price"] = "id",
+    category_id: int | None = None,
+    price_min: Decimal | None = Query(default=None, ge=0),
+    price_max: Decimal | None = Query(default=None, ge=0),
+    in_stock: bool = False,
+    session: AsyncSession = Depends(get_read_session),
+) -> Response:
+    """Каталог с keyset-пагинацией.
+
+    Следующая страница запрашивается с ``cursor`` из ``next_cursor`` предыдущего ответа
+    и теми же фильтрами и сортировкой. ``category_id`` включает вложенные категории.
+    Ответ содержит ETag/Last-Modified; при совпадении If-None-Match возвращается 304.
+    """
+    service = ProductService(session)
+    try:
+        page = await service.get_products_page(
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            category_id=category_id,
+            price_min=price_min,
+            price_max=price_max,
+            in_stock=in_stock,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return snapshot_response(request, page)
+
+
 @router.post("", status_code=201, dependencies=[Depends(require_role_at_most(UserRole.MANAGER))])
 async def create_product(data: ProductIn, session: AsyncSession = Depends(get_db_session)):
     repo = ProductRepository(session)
-    p = await repo.create(data.model_dump())
+    try:
+        p = await repo.create(data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     await session.commit()
     return {"id": p.id}
 
 
+@router.post("/import", response_model=CatalogImportResult,
+             dependencies=[Depends(require_role_at_most(UserRole.MANAGER))])
+async def import_products(
+    file: UploadFile = File(...),
+    format: Literal["csv", "jsonl"] | None = None,
+    session: AsyncSession = Depends(get_db_session),
+) -> CatalogImportResult:
+    """Импорт прайс-листа (CSV или JSON Lines, UTF-8): товары сопоставляются по ``sku``.
+
+    Ошибочные строки пропускаются и перечисляются в ``errors``, остальные загружаются.
+    Формат — из ``format`` или по расширению файла.
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Загруженный файл уже во временном файле Starlette — читаем его потоково, не целиком
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return await CatalogImportService(session).import_stream(stream, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    finally:
+        stream.detach()
+
+
 @router.put("/{product_id}", dependencies=[Depends(require_role_at_most(UserRole.MANAGER))])
 async def update_product(product_id: int, data: ProductUpdate, session: AsyncSession = Depends(get_db_session)):
     p = await session.get(Product, product_id)
     if not p:
         raise HTTPException(status_code=404, detail="Товар не найден")
     repo = ProductRepository(session)
-    await repo.update(p, data.model_dump(exclude_none=True))
+    try:
+        await repo.update(p, data.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     await session.commit()
     return {"ok": True}
 
 
 @router.delete("/{product_id}", status_code=204, dependencies=[Depends(require_role_at_most(UserRole.ADMIN))])
 async def delete_product(product_id: int, session: AsyncSession = Depends(get_db_session)):
-    p = await session.get(Product, product_id)
-    if not p:
-        raise HTTPException(status_code=404, detail="Товар не найден")
-    await session.delete(p)
-    await session.commit()
+    service = ProductService(session)
+    try:
+        await service.delete_product(product_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 
 class PriceIn(BaseModel):
@@ -71,10 +143,11 @@ async def upload_product_image(
 @router.get("/{product_id}/images", response_model=list[ProductImageOut])
 async def list_product_images(
     product_id: int,
-    session: AsyncSession = Depends(get_db_session),
+    request: Request,
+    session: AsyncSession = Depends(get_read_session),
 ):
     service = ProductService(session)
-    return await service.list_product_images(product_id)
+    return snapshot_response(request, await service.get_product_images(product_id))
 
 
 @router.patch("/images/{image_id}/set-primary", response_model=ProductImageOut,
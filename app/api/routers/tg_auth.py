@@ -1,6 +1,7 @@
 """Авторизация Telegram Mini App через валидацию initData и выдача JWT."""
 from __future__ import annotations
 
+import functools
 import hashlib
 import hmac
 import json
@@ -13,8 +14,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.deps import get_db_session
+from app.core.cache import init_data_cache
 from app.core.config import settings
-from app.core.db import get_session
 from app.services.user_service import UserService
 
 router = APIRouter(prefix="/tg/webapp", tags=["tg-webapp"])
@@ -48,6 +50,24 @@ def _hmac_sha256(key: bytes, msg: bytes) -> bytes:
     return hmac.new(key, msg, hashlib.sha256).digest()
 
 
+@functools.lru_cache(maxsize=4)
+def webapp_secret(bot_token: str) -> bytes:
+    """Секрет проверки initData: HMAC_SHA256("WebAppData", bot_token), вычисляется один раз на токен."""
+    return _hmac_sha256(b"WebAppData", bot_token.encode())
+
+
+def _check_auth_date(data: dict[str, str]) -> None:
+    try:
+        auth_date = int(data.get("auth_date", "0"))
+    except ValueError:
+        logger.warning("Некорректный auth_date в initData")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный auth_date")
+
+    if auth_date <= 0 or (time.time() - auth_date) > settings.webapp_auth_ttl_seconds:
+        logger.warning(f"Авторизационные данные истекли: auth_date={auth_date}")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Авторизационные данные истекли")
+
+
 def verify_webapp_init_data(init_data: str, bot_token: str) -> dict:
     """Проверка initData согласно https://core.telegram.org/bots/webapps#validating-data-received-via-the-web-app
 
@@ -55,7 +75,7 @@ def verify_webapp_init_data(init_data: str, bot_token: str) -> dict:
     - Разобрать URL-encoded пары в словарь.
     - Извлечь и удалить hash.
     - Построить data_check_string (ключи отсортированы, формат key=value, объединены через \n).
-    - Вычислить secret = HMAC_SHA256("WebAppData", bot_token).
+    - Вычислить secret = HMAC_SHA256("WebAppData", bot_token) (кэшируется, см. ``webapp_secret``).
     - Проверить, что calc_hash == hash (hex).
     - Проверить TTL по auth_date.
     Возвращает словарь параметров initData (без hash).
@@ -76,23 +96,13 @@ def verify_webapp_init_data(init_data: str, bot_token: str) -> dict:
     check_lines = [f"{k}={v}" for k, v in sorted(data.items())]
     data_check_string = "\n".join(check_lines).encode()
 
-    secret = _hmac_sha256(b"WebAppData", bot_token.encode())
-    calc_hash = hmac.new(secret, data_check_string, hashlib.sha256).hexdigest()
+    calc_hash = hmac.new(webapp_secret(bot_token), data_check_string, hashlib.sha256).hexdigest()
 
-    if calc_hash != received_hash:
+    if not hmac.compare_digest(calc_hash, received_hash):
         logger.warning(f"Недействительный hash в initData")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Недействительный hash")
 
-    # TTL
-    try:
-        auth_date = int(data.get("auth_date", "0"))
-    except ValueError:
-        logger.warning("Некорректный auth_date в initData")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный auth_date")
-
-    if auth_date <= 0 or (time.time() - auth_date) > settings.webapp_auth_ttl_seconds:
-        logger.warning(f"Авторизационные данные истекли: auth_date={auth_date}")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Авторизационные данные истекли")
+    _check_auth_date(data)
 
     logger.debug("initData успешно валидирован")
     return data
@@ -114,7 +124,7 @@ def issue_jwt(*, telegram_id: int, user_id: int, role: int) -> str:
 
 
 @router.post("/auth", response_model=AuthResponse)
-async def webapp_auth(req: AuthRequest, session: AsyncSession = Depends(get_session)) -> AuthResponse:
+async def webapp_auth(req: AuthRequest, session: AsyncSession = Depends(get_db_session)) -> AuthResponse:
     logger.debug("Получен запрос авторизации Mini App")
     
     if not settings.telegram_bot_token:
@@ -122,7 +132,15 @@ async def webapp_auth(req: AuthRequest, session: AsyncSession = Depends(get_sess
         raise HTTPException(status_code=500, detail="TELEGRAM_BOT_TOKEN не задан")
 
     try:
-        data = verify_webapp_init_data(req.init_data, settings.telegram_bot_token)
+        # Повтор уже проверенного initData (перезапуск Mini App) не проверяется заново и не пишет
+        # профиль. Ключ — вся строка: поле hash само по себе не доказывает подлинность остальных полей.
+        data = init_data_cache.get(req.init_data)
+        replay = data is not None
+        if data is not None:
+            _check_auth_date(data)
+        else:
+            data = verify_webapp_init_data(req.init_data, settings.telegram_bot_token)
+            init_data_cache.set(req.init_data, data)
 
         # Поле user — JSON-строка
         try:
@@ -135,16 +153,19 @@ async def webapp_auth(req: AuthRequest, session: AsyncSession = Depends(get_sess
         logger.info(f"Авторизация Mini App: telegram_id={telegram_id}")
 
         svc = UserService(session)
-        user = await svc.get_or_create_by_telegram(
-            telegram_id=telegram_id,
-            name=user_json.get("first_name"),
-            username=user_json.get("username"),
-            first_name=user_json.get("first_name"),
-            last_name=user_json.get("last_name"),
-            is_bot=user_json.get("is_bot"),
-            language_code=user_json.get("language_code"),
-            is_premium=user_json.get("is_premium"),
-        )
+        if replay:
+            user = await svc.resolve_identity(telegram_id=telegram_id)
+        else:
+            user = await svc.upsert_from_telegram(
+                telegram_id=telegram_id,
+                name=user_json.get("first_name"),
+                username=user_json.get("username"),
+                first_name=user_json.get("first_name"),
+                last_name=user_json.get("last_name"),
+                is_bot=user_json.get("is_bot"),
+                language_code=user_json.get("language_code"),
+                is_premium=user_json.get("is_premium"),
+            )
 
         token = issue_jwt(telegram_id=user.telegram_id, user_id=user.id, role=user.role)
         logger.info(f"JWT выдан для telegram_id={telegram_id}, user_id={user.id}")
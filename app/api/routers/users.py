@@ -0,0 +1,32 @@
+"""Роуты администрирования пользователей."""
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_db_session, require_role_at_most
+from app.models.user import UserRole
+from app.schemas.user import UserOut, UserRoleUpdate
+from app.services.user_service import UserService
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+
+@router.put("/{telegram_id}/role", response_model=UserOut,
+            dependencies=[Depends(require_role_at_most(UserRole.ADMIN))])
+async def set_user_role(
+    telegram_id: int,
+    payload: UserRoleUpdate,
+    session: AsyncSession = Depends(get_db_session),
+) -> UserOut:
+    """Сменить роль пользователя (только ADMIN).
+
+    Кэш идентичности этого процесса сбрасывается сразу, остальные воркеры
+    увидят новую роль не позже чем через ``IDENTITY_CACHE_TTL_SECONDS``.
+    """
+    svc = UserService(session)
+    try:
+        user = await svc.set_role(telegram_id=telegram_id, role=payload.role)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return UserOut.model_validate(user)
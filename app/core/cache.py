@@ -0,0 +1,236 @@
+"""In-process кэши: версионированные снимки каталога и TTL-кэш по ключу.
+
+Снимок хранит готовый результат, заранее сериализованное JSON-тело ответа и его
+ETag. Любая запись в каталог помечает сессию (``mark_dirty``), и версия кэша
+увеличивается только после успешного commit этой сессии — так параллельная
+пересборка не закэширует данные, которые ещё не зафиксированы. Кэш локален для
+процесса: другие воркеры увидят изменения не позже чем через ``ttl_seconds``.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.db import pin_primary_after_commit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+
+_DIRTY_KEY = "dirty_snapshot_caches"
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot(Generic[T]):
+    """Неизменяемый снимок: версия, значение, сериализованное тело и его метаданные.
+
+    ``etag`` — сильный ETag по содержимому тела, одинаковый во всех воркерах.
+    ``last_modified`` — unix-время, когда содержимое под этим ключом последний раз изменилось.
+    """
+
+    version: int
+    value: T
+    body: bytes
+    etag: str
+    last_modified: float
+    built_at: float
+
+
+class SnapshotCache(Generic[T]):
+    """Версионированные снимки по ключам с однократной (single-flight) пересборкой при промахе."""
+
+    def __init__(self, name: str, ttl_seconds: int, max_entries: int = 512) -> None:
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = 0
+        self._snapshots: OrderedDict[Hashable, Snapshot[T]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future[Snapshot[T]]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.rebuild_seconds_total = 0.0
+        self.last_rebuild_seconds = 0.0
+
+    def _is_fresh(self, snapshot: Snapshot[T] | None) -> bool:
+        if snapshot is None or snapshot.version != self.version:
+            return False
+        return self.ttl_seconds <= 0 or time.monotonic() - snapshot.built_at < self.ttl_seconds
+
+    async def get(
+        self,
+        build: Callable[[], Awaitable[T]],
+        serialize: Callable[[T], bytes],
+        key: Hashable = None,
+    ) -> Snapshot[T]:
+        """Вернуть актуальный снимок по ключу, при необходимости пересобрав его.
+
+        Одновременные промахи по одному ключу ждут одну пересборку, а не идут в БД каждый сам.
+        """
+        snapshot = self._snapshots.get(key)
+        if self._is_fresh(snapshot):
+            self.hits += 1
+            self._snapshots.move_to_end(key)
+            return snapshot  # type: ignore[return-value]
+
+        self.misses += 1
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Отменили пересобиравший запрос, а не нас — пересобираем сами
+                task = asyncio.current_task()
+                if not inflight.cancelled() or (task is not None and task.cancelling()):
+                    raise
+
+        future: asyncio.Future[Snapshot[T]] = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            snapshot = await self._rebuild(key, build, serialize, previous=snapshot)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # ожидающих может не быть — не логировать «never retrieved»
+            raise
+        else:
+            future.set_result(snapshot)
+            return snapshot
+        finally:
+            del self._inflight[key]
+
+    async def _rebuild(
+        self,
+        key: Hashable,
+        build: Callable[[], Awaitable[T]],
+        serialize: Callable[[T], bytes],
+        previous: Snapshot[T] | None,
+    ) -> Snapshot[T]:
+        version = self.version
+        started = time.perf_counter()
+        value = await build()
+        body = serialize(value)
+        elapsed = time.perf_counter() - started
+
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        last_modified = previous.last_modified if previous is not None and previous.etag == etag else time.time()
+        snapshot = Snapshot(
+            version=version,
+            value=value,
+            body=body,
+            etag=etag,
+            last_modified=last_modified,
+            built_at=time.monotonic(),
+        )
+        self._snapshots[key] = snapshot
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+
+        self.rebuilds += 1
+        self.rebuild_seconds_total += elapsed
+        self.last_rebuild_seconds = elapsed
+        logger.debug(f"Снимок {self.name}[{key!r}] v{version} пересобран за {elapsed:.3f}s")
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Сделать все текущие снимки устаревшими."""
+        self.version += 1
+
+    def mark_dirty(self, session: AsyncSession | Session) -> None:
+        """Инвалидировать кэш после успешного commit этой сессии."""
+        session.info.setdefault(_DIRTY_KEY, set()).add(self)
+
+    def stats(self) -> dict[str, Any]:
+        """Счётчики попаданий, промахов и времени пересборки."""
+        return {
+            "version": self.version,
+            "entries": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "rebuild_seconds_total": round(self.rebuild_seconds_total, 6),
+            "last_rebuild_seconds": round(self.last_rebuild_seconds, 6),
+        }
+
+
+class TTLCache(Generic[K, T]):
+    """LRU-кэш значений по ключу с ограниченным временем жизни записи.
+
+    Подходит для данных, которые читаются на каждом запросе и меняются редко
+    (например, идентичность пользователя). Изменивший данные код вызывает ``discard``.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int, max_entries: int = 10_000) -> None:
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[K, tuple[float, T]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> T | None:
+        """Значение по ключу или None, если его нет или оно устарело."""
+        entry = self._entries.get(key)
+        if entry is None or (self.ttl_seconds > 0 and time.monotonic() - entry[0] >= self.ttl_seconds):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: K, value: T) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Счётчики попаданий и промахов."""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    dirty = session.info.pop(_DIRTY_KEY, ())
+    for cache in dirty:
+        cache.invalidate()
+    if dirty:
+        # Пересборка снимка не должна прочитать отстающую реплику
+        pin_primary_after_commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+
+
+catalog_cache: SnapshotCache[Any] = SnapshotCache("catalog", ttl_seconds=settings.catalog_cache_ttl_seconds)
+# telegram_id → UserMe; TTL ограничивает, как долго другие воркеры видят старую роль
+identity_cache: TTLCache[int, Any] = TTLCache("identity", ttl_seconds=settings.identity_cache_ttl_seconds)
+# initData → проверенные параметры; дольше TTL initData запись всё равно не принимается
+init_data_cache: TTLCache[str, dict[str, str]] = TTLCache(
+    "webapp_init_data", ttl_seconds=settings.webapp_auth_ttl_seconds, max_entries=50_000
+)
@@ -0,0 +1,82 @@
+"""Предохранитель (circuit breaker) для вызовов внешних сервисов.
+
+После ``failure_threshold`` ошибок подряд предохранитель размыкается: вызовы
+отклоняются сразу, не занимая воркеры ожиданием медленного сервиса. Через
+``reset_seconds`` пропускается один пробный вызов: успех замыкает
+предохранитель, ошибка снова размыкает его на ``reset_seconds``.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable
+
+from app.core.metrics import circuit_open
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Предохранитель разомкнут; повторить можно через ``retry_after`` секунд."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"{name}: предохранитель разомкнут, повтор через {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Состояния closed → open → half_open → closed/open; счётчик ошибок — подряд."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock  # источник времени в секундах; в тестах подменяется
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_started: float | None = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """Разрешить вызов или бросить CircuitOpenError."""
+        if self._opened_at is None:
+            return
+        now = self.clock()
+        reopen_at = self._opened_at + self.reset_seconds
+        if now < reopen_at:
+            raise CircuitOpenError(self.name, reopen_at - now)
+        # Один пробный вызов; если он не отчитался (отменён), через reset_seconds — следующий
+        if self._trial_started is not None and now - self._trial_started < self.reset_seconds:
+            raise CircuitOpenError(self.name, self._trial_started + self.reset_seconds - now)
+        self._trial_started = now
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"{self.name}: предохранитель замкнут")
+            circuit_open.labels(self.name).set(0)
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f"{self.name}: {self._failures} ошибок подряд, предохранитель разомкнут")
+            self._opened_at = self.clock()
+            self._trial_started = None
+            circuit_open.labels(self.name).set(1)
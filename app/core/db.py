@@ -1,23 +1,419 @@
-"""Инициализация асинхронного подключения к БД и декларативной базы моделей."""
+"""Инициализация асинхронного подключения к БД и декларативной базы моделей.
+
+Параметры пула и драйвера задаются через ``Settings`` (``DB_*``). Пул считает
+выдачи соединений и время ожидания свободного соединения (``pool_stats``),
+а ``warm_up_pool`` открывает соединения заранее, на старте приложения.
+
+HTTP-запросы получают сессию через ``request_session``: соединение берётся из пула
+при первом обращении к БД и возвращается сразу по окончании запроса. При
+``DB_LEAK_DETECTION`` соединения, пережившие свой запрос, логируются вместе с
+местом в коде, где они были взяты.
+
+Чтение, которому не нужны собственные только что сделанные записи (каталог),
+может идти на реплики (``DATABASE_REPLICA_URLS``) через ``replicas.read_factory()``.
+"""
 from __future__ import annotations
 
-from typing import AsyncIterator
+import asyncio
+import functools
+import itertools
+import logging
+import weakref
+import time
+import traceback
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+from uuid import uuid4
 
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+import greenlet
+from sqlalchemy import event, exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
-from .config import settings
+from .config import Settings, settings
+
+logger = logging.getLogger(__name__)
 
 
 class Base(DeclarativeBase):
     """База для всех ORM‑моделей."""
 
 
-engine: AsyncEngine = create_async_engine(settings.database_url, echo=False, pool_pre_ping=True)
+@dataclass(slots=True)
+class PoolMetrics:
+    """Накопительные счётчики пула соединений."""
+
+    checkouts: int = 0
+    checkins: int = 0
+    connects: int = 0
+    connect_errors: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, который считает выдачи и время ожидания соединения.
+
+    Время ожидания включает установку нового соединения, если пул ещё не заполнен.
+    """
+
+    # логировать под тем же именем, что и стандартный пул
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+    def __init__(self, *args: Any, metrics: PoolMetrics | None = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics if metrics is not None else PoolMetrics()
+        # Вызывается при ошибке установки соединения (драйвер может бросить и не-DBAPI исключение)
+        self.on_connect_error: Callable[[BaseException], None] | None = None
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except sa_exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.metrics.wait_seconds_total += waited
+            self.metrics.wait_seconds_max = max(self.metrics.wait_seconds_max, waited)
+        self.metrics.checkouts += 1
+        return record
+
+    def _do_return_conn(self, record: ConnectionPoolEntry) -> None:
+        self.metrics.checkins += 1
+        super()._do_return_conn(record)
+
+    def _create_connection(self) -> ConnectionPoolEntry:
+        self.metrics.connects += 1
+        try:
+            return super()._create_connection()
+        except Exception as e:
+            self.metrics.connect_errors += 1
+            if self.on_connect_error is not None:
+                self.on_connect_error(e)
+            raise
+
+    def recreate(self) -> MeteredAsyncQueuePool:
+        # engine.dispose() пересоздаёт пул — счётчики и обработчики переживают это
+        pool = super().recreate()
+        pool.metrics = self.metrics  # type: ignore[attr-defined]
+        pool.on_connect_error = self.on_connect_error  # type: ignore[attr-defined]
+        return pool  # type: ignore[return-value]
+
+
+def engine_options(s: Settings) -> dict[str, Any]:
+    """Аргументы create_async_engine из настроек.
+
+    В режиме PgBouncer (pool_mode=transaction) соседние запросы одной сессии могут
+    попасть на разные серверные соединения, поэтому кэши подготовленных выражений
+    asyncpg и SQLAlchemy выключаются, а имена выражений делаются уникальными.
+    """
+    connect_args: dict[str, Any] = {"prepared_statement_cache_size": s.db_statement_cache_size}
+    if s.db_pgbouncer:
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    if s.db_command_timeout_seconds:
+        connect_args["command_timeout"] = s.db_command_timeout_seconds
+    return {
+        "echo": False,
+        "poolclass": MeteredAsyncQueuePool,
+        "pool_size": s.db_pool_size,
+        "max_overflow": s.db_max_overflow,
+        "pool_timeout": s.db_pool_timeout_seconds,
+        "pool_recycle": s.db_pool_recycle_seconds,
+        "pool_pre_ping": s.db_pool_pre_ping,
+        "connect_args": connect_args,
+    }
+
+
+def make_engine(url: str, s: Settings = settings) -> AsyncEngine:
+    return create_async_engine(url, **engine_options(s))
+
+
+@dataclass(eq=False, slots=True)
+class LeakScope:
+    """Область (обычно HTTP-запрос), в которой взятые соединения должны быть возвращены."""
+
+    name: str
+
+
+@dataclass(slots=True)
+class _Checkout:
+    scope: LeakScope | None
+    opened_by: str
+    started: float = field(default_factory=time.monotonic)
+
+
+_THIS_FILE = str(Path(__file__).resolve())
+_PROJECT_ROOT = Path(_THIS_FILE).parents[2]
+_current_scope: ContextVar[LeakScope | None] = ContextVar("db_leak_scope", default=None)
+
+
+def _caller_location(depth: int = 4) -> str:
+    """Ближайшие кадры стека из кода проекта (без библиотек и этого модуля).
+
+    Синхронный код SQLAlchemy выполняется в дочернем greenlet, поэтому к его стеку
+    добавляются кадры родительских greenlet — там находится вызвавшая корутина.
+    """
+    stack = traceback.extract_stack()
+    parent = greenlet.getcurrent().parent
+    while parent is not None:
+        if parent.gr_frame is not None:
+            stack = traceback.extract_stack(parent.gr_frame) + stack
+        parent = parent.parent
+    frames = [
+        f for f in stack
+        if f.filename.startswith(str(_PROJECT_ROOT)) and "site-packages" not in f.filename and f.filename != _THIS_FILE
+    ]
+    return " <- ".join(
+        f"{Path(f.filename).relative_to(_PROJECT_ROOT)}:{f.lineno} in {f.name}"
+        for f in reversed(frames[-depth:])
+    ) or "<вне кода проекта>"
+
+
+class LeakDetector:
+    """Отладочный учёт выданных соединений: кто взял и в какой области.
+
+    Стек снимается на каждую выдачу соединения — включать только для отладки.
+    """
+
+    def __init__(self) -> None:
+        self._checkouts: dict[int, _Checkout] = {}
+        self.leaks = 0
+
+    def install(self, target: AsyncEngine) -> None:
+        event.listen(target.sync_engine, "checkout", self._on_checkout)
+        event.listen(target.sync_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection: Any, record: ConnectionPoolEntry, proxy: Any) -> None:
+        self._checkouts[id(record)] = _Checkout(scope=_current_scope.get(), opened_by=_caller_location())
+
+    def _on_checkin(self, dbapi_connection: Any, record: ConnectionPoolEntry) -> None:
+        self._checkouts.pop(id(record), None)
+
+    def report(self, scope: LeakScope) -> int:
+        """Залогировать соединения области, не возвращённые в пул; вернуть их число."""
+        now = time.monotonic()
+        leaked = [c for c in self._checkouts.values() if c.scope is scope]
+        for c in leaked:
+            logger.warning(
+                f"Соединение БД пережило запрос {scope.name}: взято {now - c.started:.3f}s назад в {c.opened_by}"
+            )
+        self.leaks += len(leaked)
+        return len(leaked)
+
+
+engine: AsyncEngine = make_engine(settings.database_url)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
+leak_detector: LeakDetector | None = None
+if settings.db_leak_detection:
+    leak_detector = LeakDetector()
+    leak_detector.install(engine)
+
+
+@dataclass(slots=True)
+class _Replica:
+    url: str
+    engine: AsyncEngine
+    factory: async_sessionmaker[AsyncSession]
+    ejected_until: float = 0.0
+    ejections: int = 0
+
+
+_routers: weakref.WeakSet[ReplicaRouter] = weakref.WeakSet()
+
+
+class ReplicaRouter:
+    """Выбор фабрики сессий для чтения: реплики по кругу, иначе primary.
+
+    Реплика, на которой случилась ошибка соединения, исключается на ``db_replica_eject_seconds``.
+    После commit, изменившего каталог (``catalog_cache.mark_dirty``), этот процесс
+    ``db_replica_max_lag_seconds`` читает только с primary — так пересобранный снимок
+    каталога не возьмёт данные из отстающей реплики. Прочие записи (корзина, заказы,
+    фоновые задачи) чтение с реплик не останавливают. Запросы, которым нужны свои записи (корзина, оформление заказа),
+    сессию для чтения не используют вовсе.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker[AsyncSession],
+        urls: list[str],
+        s: Settings = settings,
+        detector: LeakDetector | None = None,
+    ) -> None:
+        self.primary = primary
+        self.primary_engine: AsyncEngine = primary.kw["bind"]
+        self.eject_seconds = s.db_replica_eject_seconds
+        self.max_lag_seconds = s.db_replica_max_lag_seconds
+        self._pinned_until = 0.0
+        self._replicas: list[_Replica] = []
+        for url in urls:
+            replica_engine = make_engine(url, s)
+            replica = _Replica(
+                url=url,
+                engine=replica_engine,
+                factory=async_sessionmaker(replica_engine, expire_on_commit=False, class_=AsyncSession),
+            )
+            replica_engine.pool.on_connect_error = functools.partial(self.eject, replica)  # type: ignore[attr-defined]
+            event.listen(replica_engine.sync_engine, "handle_error", self._error_listener(replica))
+            if detector is not None:
+                detector.install(replica_engine)
+            self._replicas.append(replica)
+        self._order = itertools.cycle(range(len(self._replicas)))
+        _routers.add(self)
+
+    def _error_listener(self, replica: _Replica) -> Callable[[ExceptionContext], None]:
+        def _on_error(ctx: ExceptionContext) -> None:
+            # Обрыв соединения — реплика недоступна; ошибки в самом SQL — нет
+            if ctx.is_disconnect:
+                self.eject(replica, ctx.original_exception)
+
+        return _on_error
+
+    def eject(self, replica: _Replica, reason: BaseException | None = None) -> None:
+        replica.ejected_until = time.monotonic() + self.eject_seconds
+        replica.ejections += 1
+        logger.warning(f"Реплика {replica.engine.url!r} исключена на {self.eject_seconds}s: {reason}")
+
+    @property
+    def engines(self) -> list[AsyncEngine]:
+        return [r.engine for r in self._replicas]
+
+    def pin_primary(self) -> None:
+        self._pinned_until = time.monotonic() + self.max_lag_seconds
+
+    def read_factory(self) -> async_sessionmaker[AsyncSession]:
+        """Фабрика сессий для чтения: следующая доступная реплика или primary."""
+        now = time.monotonic()
+        if not self._replicas or now < self._pinned_until:
+            return self.primary
+        for _ in range(len(self._replicas)):
+            replica = self._replicas[next(self._order)]
+            if replica.ejected_until <= now:
+                return replica.factory
+        return self.primary
+
+    def stats(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "url": r.engine.url.render_as_string(hide_password=True),
+                "available": r.ejected_until <= now,
+                "ejections": r.ejections,
+                "pool": pool_stats(r.engine),
+            }
+            for r in self._replicas
+        ]
+
+    async def dispose(self) -> None:
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+
+def pin_primary_after_commit(session: Session) -> None:
+    """Читать с primary, пока реплики могут не догнать только что зафиксированный commit сессии."""
+    for router in _routers:
+        if session.bind is router.primary_engine.sync_engine:
+            router.pin_primary()
+
+
+replicas = ReplicaRouter(SessionLocal, settings.database_replica_urls, detector=leak_detector)
+
 
 async def get_session() -> AsyncIterator[AsyncSession]:
     """Зависимость FastAPI: выдаёт асинхронную сессию БД и закрывает её по завершению запроса."""
     async with SessionLocal() as session:
         yield session
+
+
+@asynccontextmanager
+async def request_session(
+    name: str,
+    factory: async_sessionmaker[AsyncSession] | None = None,
+    detector: LeakDetector | None = None,
+) -> AsyncIterator[AsyncSession]:
+    """Сессия на время одного запроса.
+
+    Сессия не держит соединение, пока не выполнен первый запрос к БД, и закрывается
+    (с возвратом соединения в пул) при выходе из блока. При включённом детекторе
+    утечек после закрытия проверяется, что все соединения, взятые в этой области, возвращены.
+    """
+    factory = factory or SessionLocal
+    detector = detector or leak_detector
+    scope = LeakScope(name)
+    _current_scope.set(scope)
+    try:
+        async with factory() as session:
+            yield session
+    finally:
+        _current_scope.set(None)
+        if detector is not None:
+            detector.report(scope)
+
+
+def read_session() -> AsyncSession:
+    """Сессия только для чтения (реплика, если настроена) — для сервисов и фоновых задач.
+
+    Используйте как ``async with read_session() as session: ...``.
+    """
+    return replicas.read_factory()()
+
+
+def pool_stats(target: AsyncEngine = engine) -> dict[str, Any]:
+    """Текущее состояние пула и накопительные счётчики выдач/ожидания."""
+    pool = target.pool
+    stats: dict[str, Any] = {
+        "size": pool.size(),  # type: ignore[attr-defined]
+        "checked_in": pool.checkedin(),  # type: ignore[attr-defined]
+        "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+        "overflow": pool.overflow(),  # type: ignore[attr-defined]
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(asdict(metrics))
+        stats["wait_seconds_total"] = round(metrics.wait_seconds_total, 6)
+        stats["wait_seconds_max"] = round(metrics.wait_seconds_max, 6)
+    return stats
+
+
+async def warm_up_pool(connections: int, target: AsyncEngine = engine) -> int:
+    """Заранее открыть до ``connections`` соединений (не больше pool_size) и вернуть их в пул.
+
+    Ошибки подключения только логируются: приложение стартует и без прогрева.
+    Возвращает число успешно открытых соединений.
+    """
+    count = min(connections, target.pool.size())  # type: ignore[attr-defined]
+    if count <= 0:
+        return 0
+
+    async def _open() -> AsyncConnection:
+        conn = await target.connect()
+        try:
+            await conn.exec_driver_sql("SELECT 1")
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_open() for _ in range(count)), return_exceptions=True)
+    opened = 0
+    for result in results:
+        if isinstance(result, AsyncConnection):
+            await result.close()
+            opened += 1
+        else:
+            logger.warning(f"Не удалось открыть соединение при прогреве пула: {result}")
+    logger.info(f"Пул БД прогрет: {opened}/{count} соединений за {time.perf_counter() - started:.3f}s")
+    return opened
@@ -0,0 +1,96 @@
+"""Выбор лидера среди процессов через advisory lock PostgreSQL.
+
+Задачи, которые должен выполнять ровно один процесс (polling бота, регистрация
+webhook), запускаются через ``LeaderElection.run``. Лидер — процесс, получивший
+``pg_try_advisory_lock`` на своём отдельном соединении; блокировка принадлежит
+сессии PostgreSQL, поэтому при падении процесса или обрыве соединения она
+снимается сама, и один из ведомых становится лидером при следующей попытке.
+
+Лидер периодически проверяет своё соединение: если оно потеряно, задача
+лидера отменяется, а процесс снова становится ведомым.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.db import engine_options
+from app.core.metrics import leader as leader_gauge
+
+logger = logging.getLogger(__name__)
+
+
+def lock_key(name: str) -> int:
+    """Ключ advisory lock (bigint) по имени роли."""
+    return int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+
+
+class LeaderElection:
+    """Выполняет задачу лидера, пока процесс держит advisory lock с именем ``name``."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        url: str | None = None,
+        retry_interval: float | None = None,
+        check_interval: float | None = None,
+    ) -> None:
+        self.name = name
+        self.key = lock_key(name)
+        self.retry_interval = settings.leader_retry_interval_seconds if retry_interval is None else retry_interval
+        self.check_interval = settings.leader_check_interval_seconds if check_interval is None else check_interval
+        # Без пула: закрытие соединения гарантированно снимает блокировку,
+        # и она не может остаться на соединении, вернувшемся в пул
+        self._engine = create_async_engine(
+            url or settings.leader_database_url or settings.database_url,
+            poolclass=NullPool,
+            connect_args=engine_options(settings)["connect_args"],
+        )
+        self.is_leader = False
+
+    async def run(self, lead: Callable[[], Awaitable[None]]) -> None:
+        """Бесконечный цикл: стать лидером и выполнять ``lead()``, пока блокировка удерживается.
+
+        Если ``lead()`` завершилась или упала, блокировка отпускается и цикл продолжается.
+        """
+        try:
+            while True:
+                try:
+                    async with self._engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})
+                        if acquired:
+                            await self._lead(conn, lead)
+                except Exception as e:
+                    logger.warning(f"Лидер {self.name}: ошибка, повтор через {self.retry_interval}s: {e}")
+                await asyncio.sleep(self.retry_interval)
+        finally:
+            await self._engine.dispose()
+
+    async def _lead(self, conn: AsyncConnection, lead: Callable[[], Awaitable[None]]) -> None:
+        logger.info(f"Процесс стал лидером: {self.name}")
+        self.is_leader = True
+        leader_gauge.labels(self.name).set(1)
+        task = asyncio.create_task(lead(), name=f"leader-{self.name}")
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.check_interval)
+                if not task.done():
+                    # Ошибка здесь — соединение (а с ним и блокировка) потеряно
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), self.check_interval)
+            task.result()
+            logger.warning(f"Лидер {self.name}: задача завершилась, блокировка отпущена")
+        finally:
+            self.is_leader = False
+            leader_gauge.labels(self.name).set(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            logger.info(f"Процесс больше не лидер: {self.name}")
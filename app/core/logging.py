@@ -1,24 +1,99 @@
-"""Централизованная настройка логирования для dev/prod окружений."""
+"""Централизованная настройка логирования для dev/prod окружений.
+
+Запись в консоль и файл выполняет отдельный поток ``QueueListener``: event loop
+только кладёт запись в очередь, поэтому медленный диск или stdout его не блокируют.
+"""
 from __future__ import annotations
 
+import atexit
+import copy
+import json
 import logging
+import queue
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+
+# id текущего HTTP-запроса; выставляет AccessLogMiddleware
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+_listener: QueueListener | None = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет в запись ``request_id`` текущего запроса (или "-")."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, логгер, сообщение, request_id, traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            payload["request_id"] = request_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class _LoopSafeQueueHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в потоке вызывающего.
+
+    Стандартный ``prepare`` склеивает сообщение с traceback своим форматтером, и
+    JSON-форматтер на стороне listener получил бы уже готовый текст. Здесь в очередь
+    уходит копия записи с подставленными аргументами и текстом traceback, а формат
+    выбирают хендлеры listener'а. Исходную запись не меняем: её ещё видят другие
+    хендлеры и вызывающий код.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def stop_logging() -> None:
+    """Дописать очередь и остановить поток записи логов."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 def setup_logging() -> None:
     """Настроить логирование в зависимости от окружения (dev/prod).
-    
+
     Dev: DEBUG/INFO в консоль, читаемый формат.
     Prod: WARNING/ERROR в файл с ротацией + минимальный вывод в консоль.
+    ``LOG_JSON=true`` — JSON-строки вместо текстового формата.
     """
     # Импорт settings внутри функции, чтобы избежать циклических зависимостей
     from app.core.config import settings
-    
+
+    global _listener
+    stop_logging()
+
     # Корневой логгер
     root_logger = logging.getLogger()
-    
+
     # Уровень логирования
     if settings.app_env == "prod":
         root_logger.setLevel(logging.WARNING)
@@ -26,33 +101,33 @@ def setup_logging() -> None:
     else:
         root_logger.setLevel(logging.DEBUG)
         log_level = logging.DEBUG
-    
+
     # Очистка существующих хендлеров
     root_logger.handlers.clear()
-    
+
     # Формат логов
-    if settings.app_env == "prod":
+    if settings.log_json:
+        formatter: logging.Formatter = JsonFormatter()
+    elif settings.app_env == "prod":
         # Prod: структурированный формат с временем
-        log_format = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
-        date_format = "%Y-%m-%d %H:%M:%S"
+        formatter = logging.Formatter(
+            "%(asctime)s | %(levelname)-8s | %(request_id)s | %(name)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+        )
     else:
         # Dev: читаемый формат
-        log_format = "%(levelname)-8s | %(name)-30s | %(message)s"
-        date_format = None
-    
-    formatter = logging.Formatter(log_format, datefmt=date_format)
-    
+        formatter = logging.Formatter("%(levelname)-8s | %(request_id)s | %(name)-30s | %(message)s")
+
     # Console handler (всегда)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
+    handlers: list[logging.Handler] = [console_handler]
+
     # File handler (только prod)
     if settings.app_env == "prod":
         log_dir = Path(settings.log_dir)
         log_dir.mkdir(parents=True, exist_ok=True)
-        
+
         file_handler = RotatingFileHandler(
             log_dir / "app.log",
             maxBytes=10 * 1024 * 1024,  # 10 MB
@@ -61,14 +136,25 @@ def setup_logging() -> None:
         )
         file_handler.setLevel(logging.WARNING)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
-    
+        handlers.append(file_handler)
+
+    # Event loop только кладёт записи в очередь; пишет в консоль и файл поток listener'а
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = _LoopSafeQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    root_logger.addHandler(queue_handler)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
     # Настройка сторонних библиотек
     logging.getLogger("uvicorn").setLevel(logging.INFO)
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING if settings.app_env == "prod" else logging.INFO)
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
     logging.getLogger("aiogram").setLevel(logging.INFO)
-    
+
     # Логирование старта
     logger = logging.getLogger(__name__)
     logger.info(f"Логирование настроено для окружения: {settings.app_env}")
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,256 @@
+"""Метрики в формате Prometheus (``prometheus_client``).
+
+Метрики на горячем пути обновляются напрямую (``.labels(...).inc()``,
+``.observe()``). Значения, которые ведутся в другом месте (пулы соединений,
+in-process кэши), переносятся в метрики колбэками ``refresh`` — перед выгрузкой
+и, в multiprocess-режиме, раз в ``METRICS_FLUSH_INTERVAL_SECONDS``.
+
+Несколько процессов (воркеры uvicorn, ``run_bot.py``): при ``METRICS_MULTIPROC_DIR``
+включается multiprocess-режим ``prometheus_client`` — каждый процесс пишет значения
+в mmap-файлы каталога, а ``/metrics`` в любом воркере складывает файлы всех
+процессов. Счётчики и гистограммы завершившихся процессов сохраняются, gauge
+учитываются только у живых (процесс снимает свои при остановке, ``stop_metrics``).
+Каталог нужно очищать при деплое.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable
+
+from app.core.config import settings
+
+# Режим prometheus_client выбирается по переменной окружения при его первом импорте
+if settings.metrics_multiproc_dir:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.metrics_multiproc_dir)
+    Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]).mkdir(parents=True, exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncEngine  # noqa: E402
+
+from app.core.cache import catalog_cache, identity_cache, init_data_cache  # noqa: E402
+from app.core.db import engine, pool_stats, replicas  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+disable_created_metrics()
+
+_collectors: list[Callable[[], None]] = []
+
+
+def collector(fn: Callable[[], None]) -> Callable[[], None]:
+    """Колбэк, переносящий в метрики значения из пулов и кэшей."""
+    _collectors.append(fn)
+    return fn
+
+
+def refresh() -> None:
+    for fn in _collectors:
+        try:
+            fn()
+        except Exception as e:  # метрики не должны ломать /metrics
+            logger.warning(f"Ошибка сбора метрик в {fn.__name__}: {e}")
+
+
+def exposition() -> bytes:
+    """Тело ответа /metrics: этот процесс или все процессы в multiprocess-режиме."""
+    refresh()
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+async def run_metrics_refresh(interval_seconds: float) -> None:
+    """Фоновая задача multiprocess-режима: /metrics другого процесса не вызывает колбэки этого."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        refresh()
+
+
+def stop_metrics() -> None:
+    """Убрать gauge этого процесса из общего каталога (при остановке)."""
+    if MULTIPROCESS:
+        refresh()  # последние значения счётчиков пулов и кэшей
+        multiprocess.mark_process_dead(os.getpid())
+
+
+# ===== HTTP =====
+http_requests = Counter(
+    "http_requests_total", "HTTP-запросы по шаблону маршрута и статусу.", ("method", "route", "status")
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса.", ("method", "route"), buckets=LATENCY_BUCKETS
+)
+http_in_flight = Gauge("http_requests_in_flight", "HTTP-запросы в обработке.", multiprocess_mode="livesum")
+
+# ===== БД =====
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "Число SQL-запросов за HTTP-запрос.", ("route",), buckets=COUNT_BUCKETS
+)
+db_time_per_request = Histogram(
+    "db_query_seconds_per_request", "Суммарное время SQL-запросов за HTTP-запрос.", ("route",), buckets=LATENCY_BUCKETS
+)
+db_query_duration = Histogram("db_query_duration_seconds", "Время одного SQL-запроса.", buckets=LATENCY_BUCKETS)
+
+# ===== Telegram =====
+bot_update_duration = Histogram(
+    "telegram_update_duration_seconds",
+    "Время обработки апдейта Telegram хендлером.",
+    ("event", "handler"),
+    buckets=LATENCY_BUCKETS,
+)
+bot_update_errors = Counter(
+    "telegram_update_errors_total", "Исключения в хендлерах Telegram.", ("event", "handler")
+)
+bot_queue_depth = Gauge(
+    "telegram_update_queue_depth", "Апдейты webhook в очереди на обработку.", multiprocess_mode="livesum"
+)
+bot_queue_wait = Histogram(
+    "telegram_update_queue_wait_seconds", "Время апдейта в очереди до начала обработки.", buckets=LATENCY_BUCKETS
+)
+bot_updates_dropped = Counter(
+    "telegram_updates_dropped_total", "Апдейты webhook, не поставленные в очередь.", ("reason",)
+)
+broadcast_messages = Counter(
+    "broadcast_messages_total", "Сообщения рассылок по результату отправки.", ("result",)
+)
+broadcast_retry_after = Counter(
+    "broadcast_retry_after_seconds_total", "Суммарная пауза рассылок по 429 retry_after."
+)
+notifications_sent = Counter(
+    "notifications_total", "Уведомления пользователям по результату отправки.", ("result",)
+)
+order_status_changes = Counter(
+    "order_status_changes_total", "Заказы, переведённые менеджером в статус.", ("status",)
+)
+# Сумма по живым процессам: больше 1 — два лидера одновременно
+leader = Gauge("leader", "1 — процесс сейчас лидер для роли.", ("role",), multiprocess_mode="livesum")
+
+# ===== Внешние сервисы =====
+gateway_request_duration = Histogram(
+    "gateway_request_duration_seconds",
+    "Время запроса к внешнему сервису.",
+    ("gateway", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+circuit_open = Gauge(
+    "circuit_breaker_open", "1 — предохранитель разомкнут.", ("name",), multiprocess_mode="livemax"
+)
+
+
+# ===== Пул соединений и кэши (переносятся колбэками) =====
+db_pool_size = Gauge("db_pool_size", "Размер пула соединений.", ("engine",), multiprocess_mode="livesum")
+db_pool_checked_out = Gauge("db_pool_checked_out", "Выданные соединения.", ("engine",), multiprocess_mode="livesum")
+db_pool_overflow = Gauge("db_pool_overflow", "Соединения сверх pool_size.", ("engine",), multiprocess_mode="livesum")
+db_pool_checkouts = Counter("db_pool_checkouts_total", "Выдачи соединений из пула.", ("engine",))
+db_pool_wait = Counter(
+    "db_pool_checkout_wait_seconds_total", "Суммарное ожидание соединения из пула.", ("engine",)
+)
+db_pool_timeouts = Counter("db_pool_timeouts_total", "Таймауты ожидания соединения.", ("engine",))
+cache_hits = Counter("cache_hits_total", "Попадания в in-process кэши.", ("cache",))
+cache_misses = Counter("cache_misses_total", "Промахи in-process кэшей.", ("cache",))
+
+_request_db: ContextVar[list[float] | None] = ContextVar("request_db_metrics", default=None)
+# Последние перенесённые значения внешних счётчиков: в Counter добавляется только прирост
+_synced: dict[tuple[Counter, str], float] = {}
+
+
+def _sync_counter(counter: Counter, label: str, total: float) -> None:
+    key = (counter, label)
+    child = counter.labels(label)  # серия видна и с нулевым значением
+    delta = total - _synced.get(key, 0.0)
+    if delta > 0:
+        child.inc(delta)
+    _synced[key] = total
+
+
+@collector
+def _collect_pools() -> None:
+    for label, target in [("primary", engine), *((f"replica{i}", e) for i, e in enumerate(replicas.engines))]:
+        stats = pool_stats(target)
+        db_pool_size.labels(label).set(stats["size"])
+        db_pool_checked_out.labels(label).set(stats["checked_out"])
+        db_pool_overflow.labels(label).set(max(stats["overflow"], 0))
+        _sync_counter(db_pool_checkouts, label, stats.get("checkouts", 0))
+        _sync_counter(db_pool_wait, label, stats.get("wait_seconds_total", 0.0))
+        _sync_counter(db_pool_timeouts, label, stats.get("timeouts", 0))
+
+
+@collector
+def _collect_caches() -> None:
+    for cache in (catalog_cache, identity_cache, init_data_cache):
+        _sync_counter(cache_hits, cache.name, cache.hits)
+        _sync_counter(cache_misses, cache.name, cache.misses)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001
+    # Время начала — в контексте выполнения: он живёт один запрос и не переживёт ошибку
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: ANN001
+    started = getattr(context, "_metrics_query_start", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_query_duration.observe(elapsed)
+    acc = _request_db.get()
+    if acc is not None:
+        acc[0] += 1
+        acc[1] += elapsed
+
+
+def install_db_metrics(target: AsyncEngine) -> None:
+    event.listen(target.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+for _engine in (engine, *replicas.engines):
+    install_db_metrics(_engine)
+
+
+class RequestTimer:
+    """Замер одного HTTP-запроса: задержка, in-flight и SQL-запросы, сделанные в его контексте."""
+
+    __slots__ = ("method", "started", "db")
+
+    def __init__(self, method: str) -> None:
+        self.method = method
+        self.started = time.perf_counter()
+        self.db = [0, 0.0]
+        _request_db.set(self.db)
+        http_in_flight.inc()
+
+    def finish(self, route: str, status: int) -> float:
+        elapsed = time.perf_counter() - self.started
+        http_in_flight.dec()
+        _request_db.set(None)
+        http_requests.labels(self.method, route, str(status)).inc()
+        http_request_duration.labels(self.method, route).observe(elapsed)
+        db_queries_per_request.labels(route).observe(self.db[0])
+        db_time_per_request.labels(route).observe(self.db[1])
+        return elapsed
@@ -7,20 +7,21 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import hmac
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from aiogram import Bot, Dispatcher
 from aiogram.types import Update
-from aiogram.client.default import DefaultBotProperties
+from pydantic import ValidationError
 
 # Настройка логирования ПЕРЕД всеми импортами
 from app.core.logging import setup_logging
 setup_logging()
 
+from app.api.http_cache import MediaFiles
 from app.api.routers import health as health_router
 from app.api.routers import orders as orders_router
 from app.api.routers import products as products_router
@@ -29,9 +30,22 @@ from app.api.routers import cart as cart_router
 from app.api.routers import payments as payments_router
 from app.api.routers import addresses as addresses_router
 from app.api.routers import tg_auth as tg_auth_router
+from app.api.routers import metrics as metrics_router
+from app.api.routers import broadcasts as broadcasts_router
+from app.api.routers import users as users_router
 from app.core.config import settings
-from app.core.middleware import log_requests_middleware
+from app.core.db import engine, replicas, warm_up_pool
+from app.core.metrics import MULTIPROCESS as METRICS_MULTIPROCESS, run_metrics_refresh, stop_metrics
+from app.core.middleware import AccessLogMiddleware
+from app.services.image_variants import shutdown_pool as shutdown_image_pool
+from app.services.payment_inbox import run_payment_event_worker
+from app.services.payments import close_client as close_payment_client
+from app.services.reservation_service import run_reservation_sweeper
+from app.telegram.bot import create_bot
 from app.telegram.handlers.start import router as start_router
+from app.telegram.lifecycle import bot_election, lead_bot
+from app.telegram.middlewares import install_metrics as install_bot_metrics
+from app.telegram.update_queue import Submit, UpdateQueue
 
 logger = logging.getLogger(__name__)
 
@@ -40,21 +54,33 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Lifespan-хуки вместо on_event.
 
-    - На старте: инициализация бота в режиме webhook или polling.
-    - На остановке: остановка фоновой задачи и закрытие сессии бота.
+    - На старте: прогрев пула БД, фоновое освобождение просроченных резервов,
+      применение уведомлений об оплате, инициализация бота (polling или
+      регистрацию webhook, рассылки и уведомления выполняет только процесс-лидер).
+    - На остановке: остановка фоновых задач, закрытие сессии бота и пула БД.
     """
     logger.info("Запуск приложения...")
     bot: Bot | None = None
     dp: Dispatcher | None = None
 
+    await warm_up_pool(settings.db_pool_warmup)
+
+    if METRICS_MULTIPROCESS:
+        app.state.metrics_task = asyncio.create_task(run_metrics_refresh(settings.metrics_flush_interval_seconds))
+
+    app.state.reservation_task = asyncio.create_task(
+        run_reservation_sweeper(settings.reservation_sweep_interval_seconds)
+    )
+    app.state.payment_events_task = asyncio.create_task(
+        run_payment_event_worker(settings.payment_event_poll_interval_seconds)
+    )
+
     if settings.telegram_bot_token:
         logger.info("Инициализация Telegram бота...")
-        bot = Bot(
-            settings.telegram_bot_token,
-            default=DefaultBotProperties(parse_mode="HTML")
-        )
+        bot = create_bot()
         dp = Dispatcher()
         dp.include_router(start_router)
+        install_bot_metrics(dp)
 
         # Делаем бота/диспетчер доступными в обработчиках
         app.state.bot = bot
@@ -65,25 +91,11 @@ async def lifespan(app: FastAPI):
                 raise RuntimeError(
                     "TELEGRAM_WEBHOOK_HOST/TELEGRAM_WEBHOOK_PATH не настроены для webhook режима"
                 )
-            logger.info(f"Установка webhook: {settings.telegram_webhook_url}")
-            await bot.set_webhook(
-                settings.telegram_webhook_url,
-                secret_token=settings.telegram_webhook_secret,
-                drop_pending_updates=True,
-            )
-            logger.info("Webhook установлен успешно")
-        else:
-            # Убедимся, что вебхук снят, и стартуем polling в фоновом таске
-            logger.info("Режим polling: удаление webhook...")
-            await bot.delete_webhook(drop_pending_updates=True)
-            logger.info("Запуск polling в фоновом режиме...")
-            app.state.bot_task = asyncio.create_task(
-                dp.start_polling(
-                    bot,
-                    allowed_updates=dp.resolve_used_update_types(),
-                )
-            )
-            logger.info("Polling запущен")
+            # Апдейты принимает любой воркер; webhook регистрирует только лидер
+            app.state.update_queue = UpdateQueue(dp, bot)
+            app.state.update_queue.start()
+        # Polling или регистрацию webhook, рассылки и уведомления выполняет один процесс из всех (воркеры, run_bot.py)
+        app.state.bot_task = asyncio.create_task(bot_election(bot).run(lambda: lead_bot(bot, dp)))
     else:
         logger.warning("TELEGRAM_BOT_TOKEN не задан, бот не запущен")
 
@@ -97,27 +109,51 @@ async def lifespan(app: FastAPI):
         logger.info("Остановка приложения...")
         task = getattr(app.state, "bot_task", None)
         if task:
-            logger.info("Остановка polling...")
+            logger.info("Остановка polling/выбора лидера...")
             task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await task
 
+        app.state.reservation_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await app.state.reservation_task
+
+        app.state.payment_events_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await app.state.payment_events_task
+
+        update_queue = getattr(app.state, "update_queue", None)
+        if update_queue:
+            logger.info("Обработка оставшихся апдейтов webhook...")
+            await update_queue.stop()
+
+        metrics_task = getattr(app.state, "metrics_task", None)
+        if metrics_task:
+            metrics_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await metrics_task
+        stop_metrics()
+
         if bot:
             logger.info("Закрытие сессии бота...")
             await bot.session.close()
-        
+
+        shutdown_image_pool()
+        await close_payment_client()
+        await replicas.dispose()
+        await engine.dispose()
         logger.info("Приложение остановлено")
 
 
 app = FastAPI(title="Овощной магазин", version="0.1.0", lifespan=lifespan)
 
-# Middleware для логирования запросов
-app.middleware("http")(log_requests_middleware)
+# Журнал доступа, метрики и X-Request-ID
+app.add_middleware(AccessLogMiddleware)
 
 # Раздача локальных медиа-файлов
 media_path = Path(settings.media_root)
 media_path.mkdir(parents=True, exist_ok=True)
-app.mount(settings.media_url_prefix, StaticFiles(directory=str(media_path)), name="media")
+app.mount(settings.media_url_prefix, MediaFiles(directory=str(media_path)), name="media")
 
 # Подключение REST-роутеров
 app.include_router(health_router.router)
@@ -128,6 +164,9 @@ app.include_router(orders_router.router)
 app.include_router(payments_router.router)
 app.include_router(addresses_router.router)
 app.include_router(tg_auth_router.router)
+app.include_router(metrics_router.router)
+app.include_router(broadcasts_router.router)
+app.include_router(users_router.router)
 
 logger.info("Роутеры подключены")
 
@@ -151,18 +190,26 @@ async def telegram_webhook(
     if settings.telegram_mode != "webhook":
         return {"ok": True}
 
-    if settings.telegram_webhook_secret and x_telegram_bot_api_secret_token != settings.telegram_webhook_secret:
+    if settings.telegram_webhook_secret and not hmac.compare_digest(
+        (x_telegram_bot_api_secret_token or "").encode(), settings.telegram_webhook_secret.encode()
+    ):
         logger.warning(f"Получен webhook с неверным секретом")
         raise HTTPException(status_code=403, detail="invalid secret")
 
-    bot: Bot | None = getattr(request.app.state, "bot", None)
-    dp: Dispatcher | None = getattr(request.app.state, "dp", None)
-    if not (bot and dp):
+    update_queue: UpdateQueue | None = getattr(request.app.state, "update_queue", None)
+    if update_queue is None:
         logger.error("Бот не инициализирован при получении webhook")
         raise HTTPException(status_code=503, detail="bot is not initialized")
 
-    payload = await request.json()
-    update = Update.model_validate(payload)
-    logger.debug(f"Получен webhook update: {update.update_id}")
-    await dp.feed_webhook_update(bot, update)
+    try:
+        update = Update.model_validate_json(await request.body(), context={"bot": update_queue.bot})
+    except ValidationError:
+        logger.warning("Получен некорректный webhook update")
+        raise HTTPException(status_code=400, detail="invalid update")
+
+    # Ответ не ждёт обработки: хендлеры выполняют воркеры очереди
+    result = update_queue.submit(update)
+    logger.debug(f"Получен webhook update: {update.update_id} ({result.value})")
+    if result is Submit.QUEUE_FULL:
+        raise HTTPException(status_code=503, detail="update queue is full", headers={"Retry-After": "1"})
     return {"ok": True}
@@ -4,5 +4,9 @@
 """
 from .user import Address, User, UserRole  # noqa: F401
 from .catalog import Category, Unit, Product, Price  # noqa: F401
-from .order import Order, OrderItem, OrderStatus  # noqa: F401
+from .order import Order, OrderItem, OrderStatus, ReservationStatus, StockReservation  # noqa: F401
 from .cart import Cart, CartItem  # noqa: F401
+from .broadcast import Broadcast, BroadcastStatus  # noqa: F401
+from .telegram import WebhookRegistration  # noqa: F401
+from .payment import PaymentEvent  # noqa: F401
+from .notification import Notification  # noqa: F401
@@ -0,0 +1,44 @@
+"""Модель рассылки подписчикам новостей."""
+from __future__ import annotations
+
+from datetime import datetime
+from enum import StrEnum
+
+from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class BroadcastStatus(StrEnum):
+    """Статус рассылки."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+
+class Broadcast(Base):
+    """Рассылка и её прогресс.
+
+    ``last_user_id`` — курсор: все подписчики с меньшим или равным id уже обработаны,
+    поэтому прерванная рассылка продолжается с него. ``lease_until`` — до какого момента
+    рассылку обрабатывает захвативший её процесс; просроченную аренду может забрать другой.
+    ``lease_owner`` — токен текущей аренды: прогресс сохраняет только её владелец.
+    """
+
+    __tablename__ = "broadcasts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), default=BroadcastStatus.PENDING.value, index=True)
+    last_user_id: Mapped[int] = mapped_column(Integer, default=0)
+    sent: Mapped[int] = mapped_column(Integer, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, default=0)  # пользователь заблокировал бота
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    lease_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    lease_owner: Mapped[str | None] = mapped_column(String(32), default=None)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
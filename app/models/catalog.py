@@ -3,7 +3,8 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Boolean, CheckConstraint, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
@@ -16,7 +17,7 @@ class Category(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(120), unique=True, index=True)
-    parent_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    parent_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True)
     description: Mapped[str | None] = mapped_column(Text, default=None)
 
     products: Mapped[list["Product"]] = relationship(back_populates="category")
@@ -40,6 +41,8 @@ class Product(Base):
     __tablename__ = "products"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Артикул поставщика: ключ сопоставления при импорте прайс-листа
+    sku: Mapped[str | None] = mapped_column(String(64), unique=True, default=None)
     name: Mapped[str] = mapped_column(String(255), index=True)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
     origin_country: Mapped[str | None] = mapped_column(String(120), default=None)
@@ -56,6 +59,14 @@ class Product(Base):
         order_by="ProductImage.sort_order",
     )
 
+    __table_args__ = (
+        CheckConstraint("qty >= 0", name="ck_products_qty_non_negative"),
+        # Фильтр каталога по категории с keyset-пагинацией по id
+        Index("ix_products_category_id_id", "category_id", "id"),
+        # Фильтр «в наличии»
+        Index("ix_products_in_stock_id", "id", postgresql_where=text("qty > 0")),
+    )
+
 
 class ProductImage(Base):
     """Изображение товара (локально хранимый файл)."""
@@ -65,24 +76,54 @@ class ProductImage(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), index=True)
     file_path: Mapped[str] = mapped_column(String(500), nullable=False)
-    is_primary: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
+    is_primary: Mapped[bool] = mapped_column(Boolean, default=False)
     sort_order: Mapped[int] = mapped_column(Integer, default=0)
+    # Ширины готовых вариантов (WebP/JPEG); None — варианты ещё не созданы
+    variant_widths: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
     product: Mapped["Product"] = relationship(back_populates="images")
 
+    __table_args__ = (
+        # Не больше одного главного изображения на товар; обслуживает join главного изображения
+        Index(
+            "uq_product_images_primary_product_id",
+            "product_id",
+            unique=True,
+            postgresql_where=text("is_primary IS TRUE"),
+        ),
+    )
+
+
+class MediaFile(Base):
+    """Файл в хранилище, адресуемом по содержимому, и число ссылающихся на него записей."""
+
+    __tablename__ = "media_files"
+
+    path: Mapped[str] = mapped_column(String(500), primary_key=True)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
 
 class Price(Base):
-    """Цена товара. Предполагается одна текущая цена на товар (is_current=True)."""
+    """Цена товара. Текущая цена (is_current=True) у товара одна — гарантируется уникальным индексом."""
 
     __tablename__ = "prices"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
     price: Mapped[float] = mapped_column(Numeric(12, 2))
-    is_current: Mapped[bool] = mapped_column(Boolean, default=True, index=True)
+    is_current: Mapped[bool] = mapped_column(Boolean, default=True)
     start_date: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
     end_date: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
     old_price: Mapped[float | None] = mapped_column(Numeric(12, 2), default=None)
 
     product: Mapped[Product] = relationship(back_populates="prices")
+
+    __table_args__ = (
+        # Не больше одной текущей цены на товар; обслуживает join текущей цены
+        Index("uq_prices_current_product_id", "product_id", unique=True, postgresql_where=text("is_current IS TRUE")),
+        # Диапазон цен и keyset-пагинация по (price, product_id) среди текущих цен
+        Index("ix_prices_current_price_product_id", "price", "product_id", postgresql_where=text("is_current IS TRUE")),
+    )
@@ -0,0 +1,37 @@
+"""Исходящие уведомления пользователям в Telegram (outbox)."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy import text as sql_text  # имя text занято столбцом
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class Notification(Base):
+    """Сообщение пользователю, записанное в одной транзакции с событием.
+
+    Отправляет его фоновый воркер процесса с ботом: ``next_attempt_at`` — когда
+    уведомление можно взять в работу (взявший сдвигает его вперёд как аренду),
+    ``sent_at`` и ``result`` (sent / blocked / failed) задаются после попытки отправки.
+    """
+
+    __tablename__ = "notifications"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    text: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    result: Mapped[str | None] = mapped_column(String(16), default=None)
+
+    __table_args__ = (
+        Index(
+            "ix_notifications_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=sql_text("sent_at IS NULL"),
+        ),
+    )
@@ -1,10 +1,10 @@
-"""Модели заказов: заголовок и позиции."""
+"""Модели заказов: заголовок, позиции и резервы остатков."""
 from __future__ import annotations
 
 from datetime import datetime
 from enum import StrEnum
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, Numeric, String
+from sqlalchemy import Boolean, DateTime, ForeignKey, Index, Integer, Numeric, String, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
@@ -20,6 +20,21 @@ class OrderStatus(StrEnum):
     CANCELLED = "cancelled"
 
 
+# Допустимые переходы статуса заказа; completed и cancelled — конечные
+ORDER_TRANSITIONS: dict[OrderStatus, frozenset[OrderStatus]] = {
+    OrderStatus.CREATED: frozenset({OrderStatus.ASSEMBLING, OrderStatus.CANCELLED}),
+    OrderStatus.ASSEMBLING: frozenset({OrderStatus.DELIVERING, OrderStatus.COMPLETED, OrderStatus.CANCELLED}),
+    OrderStatus.DELIVERING: frozenset({OrderStatus.COMPLETED}),
+    OrderStatus.COMPLETED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
+
+def allowed_from(target: OrderStatus) -> list[OrderStatus]:
+    """Статусы, из которых заказ можно перевести в ``target``."""
+    return [source for source, targets in ORDER_TRANSITIONS.items() if target in targets]
+
+
 class Order(Base):
     """Заказ пользователя."""
 
@@ -31,13 +46,22 @@ class Order(Base):
     status: Mapped[str] = mapped_column(String(32), default=OrderStatus.CREATED.value, index=True)
     is_paid: Mapped[bool] = mapped_column(Boolean, default=False)
     payment_method: Mapped[str | None] = mapped_column(String(32), default=None)
+    payment_id: Mapped[str | None] = mapped_column(String(64), default=None, unique=True)  # платёж ЮKassa
     delivery_type: Mapped[str] = mapped_column(String(32), default="delivery")  # delivery | pickup
     address_id: Mapped[int | None] = mapped_column(ForeignKey("addresses.id"), nullable=True)
     delivery_fee: Mapped[float | None] = mapped_column(Numeric(12, 2), default=None)
     total_amount: Mapped[float | None] = mapped_column(Numeric(12, 2), default=None)
 
     user: Mapped["User"] = relationship(back_populates="orders")
-    items: Mapped[list["OrderItem"]] = relationship(back_populates="order", cascade="all, delete-orphan")
+    # Позиции загружаются только явно (selectinload) — ленивая загрузка в AsyncSession недопустима
+    items: Mapped[list["OrderItem"]] = relationship(
+        back_populates="order", cascade="all, delete-orphan", lazy="raise"
+    )
+
+
+# Keyset-пагинация истории заказов: (order_date, id) по убыванию — своих и всех (для менеджеров)
+Index("ix_orders_user_id_order_date", Order.user_id, Order.order_date.desc(), Order.id.desc())
+Index("ix_orders_order_date_id", Order.order_date.desc(), Order.id.desc())
 
 
 class OrderItem(Base):
@@ -47,8 +71,43 @@ class OrderItem(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), index=True)
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
     quantity: Mapped[float] = mapped_column(Numeric(12, 3))
     price: Mapped[float] = mapped_column(Numeric(12, 2))
 
     order: Mapped[Order] = relationship(back_populates="items")
+
+
+class ReservationStatus(StrEnum):
+    """Статус резерва остатка."""
+
+    ACTIVE = "active"  # остаток списан с товара и удерживается под заказ
+    COMMITTED = "committed"  # заказ оплачен, резерв окончательный
+    RELEASED = "released"  # заказ отменён или не оплачен вовремя, остаток возвращён
+
+
+class StockReservation(Base):
+    """Резерв остатка товара под заказ.
+
+    Активный резерв уже вычтен из ``Product.qty``; при освобождении количество
+    возвращается на склад. ``expires_at`` задаётся для заказов с предоплатой:
+    неоплаченный к этому моменту заказ отменяется, а резерв освобождается.
+    """
+
+    __tablename__ = "stock_reservations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), index=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
+    quantity: Mapped[int] = mapped_column(Integer)  # граммы (int)
+    status: Mapped[str] = mapped_column(String(16), default=ReservationStatus.ACTIVE.value)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+    __table_args__ = (
+        Index(
+            "ix_stock_reservations_active_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'active' AND expires_at IS NOT NULL"),
+        ),
+    )
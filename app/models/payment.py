@@ -0,0 +1,40 @@
+"""Входящие уведомления платёжного шлюза (inbox)."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class PaymentEvent(Base):
+    """Уведомление ЮKassa, ожидающее или прошедшее обработку.
+
+    Первичный ключ — платёж и событие: повторная доставка того же уведомления
+    ничего не добавляет. ``next_attempt_at`` — когда событие можно взять в работу
+    (воркер, взявший событие, сдвигает его вперёд как аренду); ``processed_at``
+    задаётся после применения к заказу, ``result`` — что именно произошло.
+    """
+
+    __tablename__ = "payment_events"
+
+    payment_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    event: Mapped[str] = mapped_column(String(64), primary_key=True)
+    payload: Mapped[dict] = mapped_column(JSONB)
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), default=None)
+    result: Mapped[str | None] = mapped_column(String(32), default=None)
+    last_error: Mapped[str | None] = mapped_column(Text, default=None)
+
+    __table_args__ = (
+        Index(
+            "ix_payment_events_pending_next_attempt_at",
+            "next_attempt_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
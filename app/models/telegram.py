@@ -0,0 +1,24 @@
+"""Состояние бота, общее для всех процессов."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class WebhookRegistration(Base):
+    """Последний webhook, зарегистрированный в Telegram для бота.
+
+    Telegram не возвращает секрет webhook в ``getWebhookInfo``, поэтому хранится его
+    sha256: если URL и секрет не изменились, повторный ``setWebhook`` не нужен.
+    """
+
+    __tablename__ = "telegram_webhooks"
+
+    bot_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    url: Mapped[str] = mapped_column(String(512))
+    secret_sha256: Mapped[str | None] = mapped_column(String(64), default=None)
+    registered_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
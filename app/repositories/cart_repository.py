@@ -4,14 +4,12 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.cart import Cart, CartItem
-from app.models.catalog import Product, Unit
-from app.repositories.product_repository import ProductRepository
+from app.models.catalog import Price, Product, Unit
 
 
 class CartRepository:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
-        self.products = ProductRepository(session)
 
     async def get_or_create_cart(self, user_id: int) -> Cart:
         res = await self.session.execute(select(Cart).where(Cart.user_id == user_id))
@@ -66,23 +64,36 @@ class CartRepository:
         await self.session.flush()
 
     async def fetch_detailed(self, user_id: int) -> list[dict]:
-        cart = await self.get_or_create_cart(user_id)
-        res = await self.session.execute(select(CartItem).where(CartItem.cart_id == cart.id))
-        items = res.scalars().all()
+        """Позиции корзины с товаром, единицей и текущей ценой одним запросом.
+
+        Корзина не создаётся: если её нет, возвращается пустой список.
+        """
+        stmt = (
+            select(
+                CartItem.product_id,
+                CartItem.quantity,
+                Product.name,
+                Unit.symbol.label("unit_symbol"),
+                Price.price,
+            )
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .join(Product, Product.id == CartItem.product_id)
+            .outerjoin(Unit, Unit.id == Product.unit_id)
+            .outerjoin(Price, (Price.product_id == Product.id) & (Price.is_current.is_(True)))
+            .where(Cart.user_id == user_id)
+            .order_by(CartItem.id)
+        )
+        res = await self.session.execute(stmt)
 
         detailed = []
-        for it in items:
-            prod = (await self.session.execute(select(Product).where(Product.id == it.product_id))).scalar_one_or_none()
-            if not prod:
-                continue
-            unit = (await self.session.execute(select(Unit).where(Unit.id == prod.unit_id))).scalar_one_or_none()
-            price = await self.products.get_price_for_product(prod.id)
-            line_total = (price or 0) * it.quantity if price is not None else None
+        for r in res.mappings().all():
+            price = r["price"]
+            line_total = price * r["quantity"] if price is not None else None
             detailed.append({
-                "product_id": prod.id,
-                "quantity": it.quantity,
-                "name": prod.name,
-                "unit_symbol": unit.symbol if unit else "",
+                "product_id": r["product_id"],
+                "quantity": r["quantity"],
+                "name": r["name"],
+                "unit_symbol": r["unit_symbol"] or "",
                 "price": float(price) if price is not None else None,
                 "line_total": float(line_total) if line_total is not None else None,
             })
@@ -0,0 +1,151 @@
+"""Репозиторий импорта каталога: COPY в промежуточную таблицу и слияние с товарами и ценами."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    Text,
+    func,
+    literal_column,
+    or_,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.cache import catalog_cache
+from app.models.catalog import Category, Price, Product, Unit
+from .base import BaseRepository
+
+# Временная таблица живёт до конца транзакции (ON COMMIT DROP) и не входит в метаданные моделей
+_staging = Table(
+    "catalog_import",
+    MetaData(),
+    Column("sku", String(64), primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("category_id", Integer, nullable=False),
+    Column("unit_id", Integer, nullable=False),
+    Column("price", Numeric(12, 2), nullable=False),
+    Column("qty", Integer),
+    Column("origin_country", String(120)),
+    Column("description", Text),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+STAGING_COLUMNS = [c.name for c in _staging.columns]
+
+
+@dataclass(slots=True)
+class MergeResult:
+    created: int = 0
+    updated: int = 0
+    prices_changed: int = 0
+
+
+class CatalogImportRepository(BaseRepository):
+    """Справочники для проверки строк и пакетная запись товаров с ценами."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+
+    async def load_lookups(self) -> tuple[dict[str, int], dict[str, int]]:
+        """Категории и единицы одним запросом каждая: ``{ключ: id}``.
+
+        Ключ — id строкой и название в нижнем регистре; для единиц ещё и символ,
+        если он однозначен (один символ «кг» у нескольких единиц не подходит).
+        """
+        categories: dict[str, int] = {}
+        for cid, name in (await self.session.execute(select(Category.id, Category.name))).all():
+            categories[str(cid)] = cid
+            categories[name.strip().lower()] = cid
+
+        units: dict[str, int] = {}
+        symbols: dict[str, set[int]] = {}
+        for uid, name, symbol in (await self.session.execute(select(Unit.id, Unit.name, Unit.symbol))).all():
+            units[str(uid)] = uid
+            units[name.strip().lower()] = uid
+            symbols.setdefault(symbol.strip().lower(), set()).add(uid)
+        for symbol, ids in symbols.items():
+            if len(ids) == 1:
+                units.setdefault(symbol, next(iter(ids)))
+        return categories, units
+
+    async def merge(self, records: list[tuple]) -> MergeResult:
+        """Загрузить проверенные строки (порядок полей — ``STAGING_COLUMNS``) и слить с каталогом.
+
+        Строки копируются в промежуточную таблицу через COPY (asyncpg
+        ``copy_records_to_table``), затем тремя запросами независимо от числа строк:
+        upsert товаров по ``sku``, остатки (только где ``qty`` задан) и смена текущей
+        цены у товаров, где она отличается. Вызывать в транзакции, которую затем фиксирует вызывающий.
+        """
+        conn = await self.session.connection()
+        await conn.run_sync(lambda sync_conn: _staging.create(sync_conn))
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(_staging.name, records=records, columns=STAGING_COLUMNS)
+
+        s = _staging.c
+        stmt = insert(Product).from_select(
+            ["sku", "name", "category_id", "unit_id", "origin_country", "description", "qty"],
+            select(s.sku, s.name, s.category_id, s.unit_id, s.origin_country, s.description, func.coalesce(s.qty, 0)),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={
+                "name": stmt.excluded.name,
+                "category_id": stmt.excluded.category_id,
+                "unit_id": stmt.excluded.unit_id,
+                "origin_country": func.coalesce(stmt.excluded.origin_country, Product.origin_country),
+                "description": func.coalesce(stmt.excluded.description, Product.description),
+            },
+        ).returning(literal_column("xmax = 0"))  # true — строка вставлена, false — обновлена
+        inserted = (await self.session.execute(stmt)).scalars().all()
+        result = MergeResult(created=sum(inserted), updated=len(inserted) - sum(inserted))
+
+        await self.session.execute(
+            update(Product)
+            .where(Product.sku == s.sku, s.qty.is_not(None), Product.qty != s.qty)
+            .values(qty=s.qty)
+            .execution_options(synchronize_session=False)
+        )
+        result.prices_changed = await self._merge_prices()
+        catalog_cache.mark_dirty(self.session)
+        return result
+
+    async def _merge_prices(self) -> int:
+        """Закрыть отличающиеся текущие цены и вставить новые (старая цена — в ``old_price``)."""
+        s = _staging.c
+        current = aliased(Price)
+        changed = (
+            select(Product.id.label("product_id"), s.price)
+            .select_from(_staging)
+            .join(Product, Product.sku == s.sku)
+            .outerjoin(current, (current.product_id == Product.id) & current.is_current.is_(True))
+            .where(or_(current.id.is_(None), current.price != s.price))
+            .cte("changed")
+        )
+        closed = (
+            update(Price)
+            .where(Price.product_id == changed.c.product_id, Price.is_current.is_(True))
+            .values(is_current=False, end_date=func.now())
+            .returning(Price.product_id, Price.price)
+            .cte("closed")
+        )
+        stmt = (
+            insert(Price)
+            .from_select(
+                ["product_id", "price", "is_current", "start_date", "old_price"],
+                select(changed.c.product_id, changed.c.price, true(), func.now(), closed.c.price)
+                .select_from(changed.outerjoin(closed, closed.c.product_id == changed.c.product_id)),
+            )
+            .returning(Price.id)
+        )
+        return len((await self.session.execute(stmt)).all())
@@ -0,0 +1,45 @@
+"""Репозиторий счётчиков ссылок на медиа-файлы."""
+from __future__ import annotations
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.catalog import MediaFile
+from .base import BaseRepository
+
+
+class MediaFileRepository(BaseRepository):
+    """Учёт ссылок на файлы хранилища.
+
+    ``acquire`` и ``purge`` блокируют строку файла до конца транзакции: пока
+    удаляющий держит блокировку и стирает файл, загрузка того же содержимого ждёт
+    и затем публикует файл заново, а не ссылается на уже удалённый.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+
+    async def acquire(self, path: str, size: int) -> int:
+        """Добавить ссылку на файл (создав запись при первой загрузке) и вернуть число ссылок."""
+        stmt = insert(MediaFile).values(path=path, refcount=1, size=size)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MediaFile.path],
+            set_={"refcount": MediaFile.refcount + 1},
+        ).returning(MediaFile.refcount)
+        return (await self.session.execute(stmt)).scalar_one()
+
+    async def release(self, path: str) -> int | None:
+        """Убрать ссылку и вернуть оставшееся число ссылок; None — файл не учитывается (старый путь)."""
+        stmt = (
+            update(MediaFile)
+            .where(MediaFile.path == path)
+            .values(refcount=MediaFile.refcount - 1)
+            .returning(MediaFile.refcount)
+        )
+        return (await self.session.execute(stmt)).scalar_one_or_none()
+
+    async def purge(self, path: str) -> bool:
+        """Удалить запись файла, если на него больше никто не ссылается. True — файл можно стирать."""
+        stmt = delete(MediaFile).where(MediaFile.path == path, MediaFile.refcount <= 0).returning(MediaFile.path)
+        return (await self.session.execute(stmt)).scalar_one_or_none() is not None
@@ -0,0 +1,61 @@
+"""Репозиторий outbox уведомлений пользователям."""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.notification import Notification
+from app.models.user import User
+from .base import BaseRepository
+
+
+class NotificationRepository(BaseRepository):
+    """Запись уведомлений и выдача их отправителям с арендой."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+
+    async def add_many(self, messages: list[tuple[int, str]]) -> None:
+        """Записать уведомления ``(user_id, text)`` одним пакетным INSERT."""
+        if messages:
+            await self.session.execute(
+                insert(Notification), [{"user_id": user_id, "text": text} for user_id, text in messages]
+            )
+
+    async def claim(self, *, limit: int, lease: timedelta) -> list[tuple[int, int, str]]:
+        """Взять до ``limit`` неотправленных уведомлений: ``(id, telegram_id, text)``.
+
+        Строки, заблокированные другим процессом, пропускаются (SKIP LOCKED); взятые
+        сдвигаются на ``lease`` и, если процесс упадёт, снова станут доступны.
+        """
+        due = (
+            select(Notification.id)
+            .where(Notification.sent_at.is_(None), Notification.next_attempt_at <= func.now())
+            .order_by(Notification.next_attempt_at, Notification.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Notification)
+            .where(Notification.id.in_(due.scalar_subquery()), Notification.user_id == User.id)
+            .values(next_attempt_at=func.now() + lease)
+            .returning(Notification.id, User.telegram_id, Notification.text)
+            .execution_options(synchronize_session=False)
+        )
+        return [tuple(row) for row in (await self.session.execute(stmt)).all()]
+
+    async def mark_sent(self, results: dict[int, str]) -> None:
+        """Отметить уведомления отправленными: ``{id: результат}``, один UPDATE на результат."""
+        by_result: dict[str, list[int]] = defaultdict(list)
+        for notification_id, result in results.items():
+            by_result[result].append(notification_id)
+        for result, ids in by_result.items():
+            await self.session.execute(
+                update(Notification)
+                .where(Notification.id.in_(ids))
+                .values(sent_at=func.now(), result=result)
+                .execution_options(synchronize_session=False)
+            )
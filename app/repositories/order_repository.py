@@ -1,15 +1,19 @@
 """Репозиторий заказов."""
 from __future__ import annotations
 
+from collections import Counter
+from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import select
+from sqlalchemy import Integer, String, all_, any_, bindparam, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.models.catalog import Product
-from app.models.order import Order, OrderItem
+from app.models.catalog import Price, Product
+from app.models.order import Order, OrderItem, OrderStatus, allowed_from
 from .base import BaseRepository
-from .product_repository import ProductRepository
+from .reservation_repository import ReservationRepository
 
 
 class OrderRepository(BaseRepository):
@@ -17,7 +21,24 @@ class OrderRepository(BaseRepository):
 
     def __init__(self, session: AsyncSession) -> None:
         super().__init__(session)
-        self._product_repo = ProductRepository(session)
+        self._reservations = ReservationRepository(session)
+
+    async def _load_stock_and_prices(self, product_ids: list[int]) -> dict[int, tuple[int, Decimal | None]]:
+        """Остатки и текущие цены товаров одним запросом: {product_id: (qty, price)}.
+
+        Строки товаров блокируются (FOR UPDATE) в порядке id до конца транзакции:
+        параллельные заказы одних и тех же товаров выполняются по очереди и не
+        взаимоблокируются.
+        """
+        stmt = (
+            select(Product.id, Product.qty, Price.price)
+            .outerjoin(Price, (Price.product_id == Product.id) & (Price.is_current.is_(True)))
+            .where(Product.id.in_(product_ids))
+            .order_by(Product.id)
+            .with_for_update(of=Product)
+        )
+        res = await self.session.execute(stmt)
+        return {pid: (qty, price) for pid, qty, price in res.all()}
 
     async def create_order(
         self,
@@ -27,38 +48,38 @@ class OrderRepository(BaseRepository):
         delivery_type: str,
         address_id: int | None,
         payment_method: str | None,
+        reservation_expires_at: datetime | None = None,
     ) -> Order:
         """Создать заказ с позициями и зарезервировать остатки.
 
-        Бросает ValueError, если не хватает остатков или нет актуальной цены.
-        Количество трактуется как целое число граммов.
+        Бросает ValueError, если не хватает остатков или нет актуальной цены; в этом
+        случае транзакцию нужно откатить. Количество трактуется как целое число граммов.
         """
+        # Суммарная потребность по каждому товару (один товар может встречаться несколько раз)
+        demand: Counter[int] = Counter()
+        for product_id, qty in items:
+            demand[product_id] += int(qty)
+
+        stock = await self._load_stock_and_prices(list(demand))
+
         # Проверки и расчёт суммы
         total = Decimal("0.00")
-        product_cache: dict[int, Product] = {}
-
         for product_id, qty in items:
-            # Получаем товар
-            prod = product_cache.get(product_id)
-            if not prod:
-                res = await self.session.execute(select(Product).where(Product.id == product_id))
-                prod = res.scalar_one_or_none()
-                if not prod:
-                    raise ValueError(f"Товар id={product_id} не найден")
-                product_cache[product_id] = prod
+            if product_id not in stock:
+                raise ValueError(f"Товар id={product_id} не найден")
+            available, price = stock[product_id]
 
             # Проверяем остаток (qty в граммах)
-            if prod.qty is None or int(prod.qty) < int(qty):
+            if available is None or int(available) < demand[product_id]:
                 raise ValueError(f"Недостаточно остатков для товара id={product_id}")
 
             # Цена за единицу (за 1 товар/упаковку; итог считается как price * qty)
-            price = await self._product_repo.get_price_for_product(product_id)
             if price is None:
                 raise ValueError(f"Нет актуальной цены для товара id={product_id}")
 
             total += Decimal(str(price)) * Decimal(str(qty))
 
-        # Создаём заказ
+        # Заказ и позиции: позиции вставляются одним пакетным INSERT при flush
         order = Order(
             user_id=user_id,
             status="created",
@@ -66,19 +87,131 @@ class OrderRepository(BaseRepository):
             address_id=address_id,
             payment_method=payment_method,
             total_amount=float(total),
+            items=[
+                OrderItem(product_id=product_id, quantity=int(qty), price=stock[product_id][1])
+                for product_id, qty in items
+            ],
         )
         self.session.add(order)
         await self.session.flush()
 
-        # Создаём позиции и резервируем товар
-        for product_id, qty in items:
-            price = await self._product_repo.get_price_for_product(product_id)
-            item = OrderItem(order_id=order.id, product_id=product_id, quantity=int(qty), price=price)  # type: ignore[arg-type]
-            self.session.add(item)
+        # Резервирование — условно уменьшаем остатки (целые граммы) и пишем резервы
+        await self._reservations.reserve(order_id=order.id, demand=dict(demand), expires_at=reservation_expires_at)
+        return order
 
-            # Резервирование — уменьшаем остаток (целые граммы)
-            prod = product_cache[product_id]
-            prod.qty = int(prod.qty) - int(qty)  # type: ignore[assignment]
+    async def get_with_items(self, order_id: int, *, user_id: int | None = None) -> Order | None:
+        """Заказ с позициями (два запроса); ``user_id`` ограничивает поиск заказами пользователя."""
+        stmt = select(Order).options(selectinload(Order.items)).where(Order.id == order_id)
+        if user_id is not None:
+            stmt = stmt.where(Order.user_id == user_id)
+        return (await self.session.execute(stmt)).scalar_one_or_none()
 
-        await self.session.flush()
-        return order
+    async def list_page(
+        self,
+        *,
+        limit: int,
+        user_id: int | None = None,
+        status: OrderStatus | None = None,
+        after: tuple[datetime, int] | None = None,
+    ) -> list[Order]:
+        """Страница заказов с позициями, новые первыми, keyset-пагинация по (order_date, id).
+
+        ``after`` — ключ последнего заказа предыдущей страницы. Позиции всех заказов
+        страницы подгружаются одним запросом (selectinload), поэтому число запросов
+        не зависит от размера страницы.
+        """
+        stmt = select(Order).options(selectinload(Order.items))
+        if user_id is not None:
+            stmt = stmt.where(Order.user_id == user_id)
+        if status is not None:
+            stmt = stmt.where(Order.status == status.value)
+        if after is not None:
+            stmt = stmt.where(tuple_(Order.order_date, Order.id) < tuple_(*after))
+        stmt = stmt.order_by(Order.order_date.desc(), Order.id.desc()).limit(limit)
+        return list((await self.session.execute(stmt)).scalars().all())
+
+    async def get_for_update(self, order_id: int) -> Order | None:
+        """Заказ с блокировкой строки до конца транзакции."""
+        res = await self.session.execute(select(Order).where(Order.id == order_id).with_for_update())
+        return res.scalar_one_or_none()
+
+    async def mark_paid(self, order: Order, *, payment_id: str) -> None:
+        """Отметить заблокированный заказ оплаченным; его резервы становятся окончательными."""
+        order.is_paid = True
+        order.payment_id = payment_id
+        await self._reservations.commit_for_orders([order.id])
+
+    async def cancel_locked(self, order: Order) -> None:
+        """Отменить заблокированный неоплаченный заказ и освободить его резервы."""
+        order.status = OrderStatus.CANCELLED.value
+        await self._reservations.release_for_orders([order.id])
+
+    async def cancel(self, *, order_id: int, user_id: int) -> bool:
+        """Отменить неоплаченный заказ пользователя в статусе created и освободить резервы.
+
+        Возвращает False, если заказ не найден или уже не может быть отменён.
+        """
+        stmt = (
+            update(Order)
+            .where(
+                Order.id == order_id,
+                Order.user_id == user_id,
+                Order.status == OrderStatus.CREATED.value,
+                Order.is_paid.is_(False),
+            )
+            .values(status=OrderStatus.CANCELLED.value)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+        if (await self.session.execute(stmt)).scalar_one_or_none() is None:
+            return False
+        await self._reservations.release_for_orders([order_id])
+        return True
+
+    async def transition(
+        self, order_ids: list[int], *, target: OrderStatus, prepaid_methods: list[str]
+    ) -> list[tuple[int, int]]:
+        """Перевести заказы в ``target`` одним UPDATE и вернуть ``(id, user_id)`` изменённых.
+
+        Меняются только заказы в статусах, из которых переход допустим (``allowed_from``);
+        остальные не затрагиваются. Неоплаченный заказ с предоплатой не уходит дальше
+        ``created`` (его резерв ещё может истечь), а отменить можно только неоплаченный.
+        Параметры передаются массивами, поэтому запрос один и тот же при любом размере пачки.
+        При отмене резервы освобождаются, при завершении — становятся окончательными.
+        """
+        sources = [s.value for s in allowed_from(target)]
+        stmt = update(Order).where(
+            Order.id == any_(bindparam("order_ids", order_ids, type_=ARRAY(Integer))),
+            Order.status == any_(bindparam("sources", sources, type_=ARRAY(String))),
+        )
+        if target == OrderStatus.CANCELLED:
+            stmt = stmt.where(Order.is_paid.is_(False))
+        else:
+            stmt = stmt.where(
+                or_(
+                    Order.is_paid.is_(True),
+                    Order.payment_method.is_(None),
+                    Order.payment_method != all_(bindparam("prepaid", prepaid_methods, type_=ARRAY(String))),
+                )
+            )
+        stmt = (
+            stmt.values(status=target.value)
+            .returning(Order.id, Order.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        changed = [(order_id, user_id) for order_id, user_id in (await self.session.execute(stmt)).all()]
+        ids = [order_id for order_id, _ in changed]
+        if ids and target == OrderStatus.CANCELLED:
+            await self._reservations.release_for_orders(ids)
+        elif ids and target == OrderStatus.COMPLETED:
+            await self._reservations.commit_for_orders(ids)
+        return changed
+
+    async def get_statuses(self, order_ids: list[int]) -> dict[int, str]:
+        """Текущие статусы заказов: ``{id: status}`` (несуществующих id в ответе нет)."""
+        res = await self.session.execute(
+            select(Order.id, Order.status).where(
+                Order.id == any_(bindparam("order_ids", order_ids, type_=ARRAY(Integer)))
+            )
+        )
+        return dict(res.all())
@@ -0,0 +1,67 @@
+"""Репозиторий inbox уведомлений платёжного шлюза."""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.payment import PaymentEvent
+from .base import BaseRepository
+
+
+class PaymentEventRepository(BaseRepository):
+    """Запись уведомлений без дублей и выдача их воркерам с арендой."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+
+    async def add(self, *, payment_id: str, event: str, payload: dict[str, Any]) -> bool:
+        """Сохранить уведомление. False — такое уже есть (повторная доставка)."""
+        stmt = (
+            insert(PaymentEvent)
+            .values(payment_id=payment_id, event=event, payload=payload)
+            .on_conflict_do_nothing(index_elements=[PaymentEvent.payment_id, PaymentEvent.event])
+            .returning(PaymentEvent.payment_id)
+        )
+        return (await self.session.execute(stmt)).scalar_one_or_none() is not None
+
+    async def claim(self, *, limit: int, lease: timedelta) -> list[PaymentEvent]:
+        """Взять до ``limit`` готовых к обработке событий и сдвинуть их ``next_attempt_at`` на ``lease``.
+
+        Строки, уже заблокированные другим воркером, пропускаются (SKIP LOCKED);
+        если воркер упадёт, событие снова станет доступно после аренды.
+        """
+        due = (
+            select(PaymentEvent.payment_id, PaymentEvent.event)
+            .where(PaymentEvent.processed_at.is_(None), PaymentEvent.next_attempt_at <= func.now())
+            .order_by(PaymentEvent.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(PaymentEvent)
+            .where(tuple_(PaymentEvent.payment_id, PaymentEvent.event).in_(due))
+            .values(next_attempt_at=func.now() + lease, attempts=PaymentEvent.attempts + 1)
+            .returning(PaymentEvent)
+            .execution_options(synchronize_session=False)
+        )
+        return list((await self.session.execute(stmt)).scalars().all())
+
+    async def mark_processed(self, event: PaymentEvent, result: str, error: str | None = None) -> None:
+        await self.session.execute(
+            update(PaymentEvent)
+            .where(PaymentEvent.payment_id == event.payment_id, PaymentEvent.event == event.event)
+            .values(processed_at=func.now(), result=result, last_error=error[:1000] if error else None)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def retry_later(self, event: PaymentEvent, *, delay: timedelta, error: str) -> None:
+        await self.session.execute(
+            update(PaymentEvent)
+            .where(PaymentEvent.payment_id == event.payment_id, PaymentEvent.event == event.event)
+            .values(next_attempt_at=func.now() + delay, last_error=error[:1000])
+            .execution_options(synchronize_session=False)
+        )
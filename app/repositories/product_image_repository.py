@@ -4,6 +4,7 @@ from __future__ import annotations
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import catalog_cache
 from app.models.catalog import ProductImage
 from .base import BaseRepository
 
@@ -14,14 +15,28 @@ class ProductImageRepository(BaseRepository):
     def __init__(self, session: AsyncSession) -> None:
         super().__init__(session)
 
-    async def create(self, product_id: int, file_path: str, is_primary: bool = False, sort_order: int = 0) -> ProductImage:
+    async def create(
+        self,
+        product_id: int,
+        file_path: str,
+        is_primary: bool = False,
+        sort_order: int = 0,
+        variant_widths: list[int] | None = None,
+    ) -> ProductImage:
         if is_primary:
             await self.session.execute(
                 update(ProductImage).where(ProductImage.product_id == product_id).values(is_primary=False)
             )
-        img = ProductImage(product_id=product_id, file_path=file_path, is_primary=is_primary, sort_order=sort_order)
+        img = ProductImage(
+            product_id=product_id,
+            file_path=file_path,
+            is_primary=is_primary,
+            sort_order=sort_order,
+            variant_widths=variant_widths,
+        )
         self.session.add(img)
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
         return img
 
     async def get(self, image_id: int) -> ProductImage | None:
@@ -45,8 +60,10 @@ class ProductImageRepository(BaseRepository):
         )
         img.is_primary = True
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
         return img
 
     async def delete(self, image: ProductImage) -> None:
         await self.session.delete(image)
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
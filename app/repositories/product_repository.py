@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 from datetime import datetime
+from decimal import Decimal
 
-from sqlalchemy import Select, select
+from sqlalchemy import Select, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
+from app.core.cache import catalog_cache
 from app.models.catalog import Price, Product, Unit, Category, ProductImage
 from .base import BaseRepository
 
@@ -17,9 +19,9 @@ class ProductRepository(BaseRepository):
     def __init__(self, session: AsyncSession) -> None:
         super().__init__(session)
 
-    def _select_with_current_price(self) -> Select:
+    def _select_with_current_price(self, pr: type[Price] | None = None) -> Select:
         p = aliased(Product)
-        pr = aliased(Price)
+        pr = pr if pr is not None else aliased(Price)
         u = aliased(Unit)
         img = aliased(ProductImage)
         return (
@@ -32,12 +34,12 @@ class ProductRepository(BaseRepository):
                 pr.old_price.label("old_price"),
                 p.qty,
                 img.file_path.label("primary_image"),
+                img.variant_widths.label("primary_image_variant_widths"),
             )
             .join(pr, pr.product_id == p.id)
             .join(u, u.id == p.unit_id)
             .outerjoin(img, (img.product_id == p.id) & (img.is_primary.is_(True)))
             .where(pr.is_current.is_(True))
-            .order_by(p.id)
         )
 
     async def list_with_price(self) -> list[dict]:
@@ -46,10 +48,56 @@ class ProductRepository(BaseRepository):
         Возвращает словари, удобные для последующей валидации схемой ProductOut.
         """
         stmt = self._select_with_current_price()
+        stmt = stmt.order_by(stmt.selected_columns.id)
         res = await self.session.execute(stmt)
         rows = res.mappings().all()
         return [dict(r) for r in rows]
 
+    async def list_page(
+        self,
+        *,
+        limit: int,
+        sort: str = "id",
+        after_id: int | None = None,
+        after_price: Decimal | None = None,
+        category_id: int | None = None,
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None,
+        in_stock: bool = False,
+    ) -> list[dict]:
+        """Страница каталога с keyset-пагинацией по (id) или (price, id).
+
+        ``after_id``/``after_price`` — ключ последней строки предыдущей страницы.
+        Фильтр по категории включает все вложенные категории (parent_id).
+        """
+        pr = aliased(Price)
+        stmt = self._select_with_current_price(pr)
+        c = stmt.selected_columns
+
+        if category_id is not None:
+            tree = select(Category.id).where(Category.id == category_id).cte("category_tree", recursive=True)
+            tree = tree.union_all(select(Category.id).where(Category.parent_id == tree.c.id))
+            stmt = stmt.where(c.category_id.in_(select(tree.c.id)))
+        if price_min is not None:
+            stmt = stmt.where(pr.price >= price_min)
+        if price_max is not None:
+            stmt = stmt.where(pr.price <= price_max)
+        if in_stock:
+            stmt = stmt.where(c.qty > 0)
+
+        if sort == "price":
+            # Ключ целиком из prices, чтобы сравнение шло по индексу (price, product_id)
+            if after_id is not None and after_price is not None:
+                stmt = stmt.where(tuple_(pr.price, pr.product_id) > tuple_(after_price, after_id))
+            stmt = stmt.order_by(pr.price, pr.product_id)
+        else:
+            if after_id is not None:
+                stmt = stmt.where(c.id > after_id)
+            stmt = stmt.order_by(c.id)
+
+        res = await self.session.execute(stmt.limit(limit))
+        return [dict(r) for r in res.mappings().all()]
+
     async def get_price_for_product(self, product_id: int) -> float | None:
         """Получить текущую цену товара по id, если есть."""
         stmt = (
@@ -67,9 +115,11 @@ class ProductRepository(BaseRepository):
             raise ValueError("Категория не найдена")
         if not (await self.session.execute(select(Unit).where(Unit.id == data["unit_id"]))).scalar_one_or_none():
             raise ValueError("Единица измерения не найдена")
+        await self._check_sku_free(data.get("sku"))
         p = Product(**data)
         self.session.add(p)
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
         return p
 
     async def update(self, product: Product, data: dict) -> Product:
@@ -79,14 +129,27 @@ class ProductRepository(BaseRepository):
         if "unit_id" in data:
             if not (await self.session.execute(select(Unit).where(Unit.id == data["unit_id"]))).scalar_one_or_none():
                 raise ValueError("Единица измерения не найдена")
+        await self._check_sku_free(data.get("sku"), product.id)
         for k, v in data.items():
             setattr(product, k, v)
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
         return product
 
+    async def _check_sku_free(self, sku: str | None, product_id: int | None = None) -> None:
+        """Бросить ValueError, если артикул уже занят другим товаром."""
+        if sku is None:
+            return
+        stmt = select(Product.id).where(Product.sku == sku)
+        if product_id is not None:
+            stmt = stmt.where(Product.id != product_id)
+        if (await self.session.execute(stmt.limit(1))).scalar_one_or_none() is not None:
+            raise ValueError(f"Товар с артикулом {sku} уже существует")
+
     async def delete(self, product: Product) -> None:
         await self.session.delete(product)
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
 
     # --- Управление ценой ---
     async def set_current_price(self, product_id: int, new_price: float) -> Price:
@@ -114,4 +177,5 @@ class ProductRepository(BaseRepository):
         )
         self.session.add(price)
         await self.session.flush()
+        catalog_cache.mark_dirty(self.session)
         return price
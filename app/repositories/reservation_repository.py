@@ -0,0 +1,126 @@
+"""Репозиторий резервов остатков.
+
+Все изменения остатков выполняются условными set-based запросами, поэтому
+параллельные заказы не могут увести ``Product.qty`` в минус, а повторное
+освобождение одного и того же резерва ничего не возвращает на склад дважды.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Integer, column, func, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.catalog import Product
+from app.models.order import Order, OrderStatus, ReservationStatus, StockReservation
+from .base import BaseRepository
+
+
+class ReservationRepository(BaseRepository):
+    """Резервирование, подтверждение и освобождение остатков под заказы."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+
+    async def reserve(self, *, order_id: int, demand: dict[int, int], expires_at: datetime | None) -> None:
+        """Списать остатки под заказ и записать резервы.
+
+        Списание условное (``qty >= n``): если хотя бы по одному товару остатка не хватает,
+        бросает ValueError. Вызывающий код должен откатить транзакцию.
+        """
+        if not demand:
+            # VALUES без строк — некорректный SQL
+            raise ValueError("Заказ должен содержать хотя бы одну позицию")
+        v = values(column("product_id", Integer), column("qty", Integer), name="v").data(sorted(demand.items()))
+        stmt = (
+            update(Product)
+            .where(Product.id == v.c.product_id, Product.qty >= v.c.qty)
+            .values(qty=Product.qty - v.c.qty)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        reserved = set((await self.session.execute(stmt)).scalars().all())
+        missing = sorted(set(demand) - reserved)
+        if missing:
+            raise ValueError(f"Недостаточно остатков для товара id={missing[0]}")
+
+        await self.session.execute(
+            insert(StockReservation),
+            [
+                {"order_id": order_id, "product_id": pid, "quantity": qty, "expires_at": expires_at}
+                for pid, qty in sorted(demand.items())
+            ],
+        )
+
+    async def commit_for_orders(self, order_ids: list[int]) -> None:
+        """Сделать активные резервы заказов окончательными (например, после оплаты)."""
+        await self.session.execute(
+            update(StockReservation)
+            .where(
+                StockReservation.order_id.in_(order_ids),
+                StockReservation.status == ReservationStatus.ACTIVE.value,
+            )
+            .values(status=ReservationStatus.COMMITTED.value)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def release_for_orders(self, order_ids: list[int]) -> None:
+        """Освободить активные резервы заказов и вернуть остатки на склад.
+
+        Смена статуса резерва и возврат остатка выполняются одним запросом;
+        уже освобождённые или подтверждённые резервы не затрагиваются.
+        """
+        released = (
+            update(StockReservation)
+            .where(
+                StockReservation.order_id.in_(order_ids),
+                StockReservation.status == ReservationStatus.ACTIVE.value,
+            )
+            .values(status=ReservationStatus.RELEASED.value)
+            .returning(StockReservation.product_id, StockReservation.quantity)
+            .cte("released")
+        )
+        totals = (
+            select(released.c.product_id, func.sum(released.c.quantity).label("qty"))
+            .group_by(released.c.product_id)
+            .subquery("totals")
+        )
+        stmt = (
+            update(Product)
+            .where(Product.id == totals.c.product_id)
+            .values(qty=Product.qty + totals.c.qty)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.execute(stmt)
+
+    async def cancel_expired_orders(self, *, now: datetime, limit: int) -> list[int]:
+        """Отменить неоплаченные заказы с просроченными резервами и вернуть их id.
+
+        Заказ отменяется только из статуса ``created`` и только если он не оплачен,
+        поэтому одновременная оплата и повторный запуск не приводят к двойной отмене.
+        """
+        expired = (
+            select(StockReservation.order_id)
+            .join(Order, Order.id == StockReservation.order_id)
+            .where(
+                StockReservation.status == ReservationStatus.ACTIVE.value,
+                StockReservation.expires_at.is_not(None),
+                StockReservation.expires_at < now,
+                Order.status == OrderStatus.CREATED.value,
+                Order.is_paid.is_(False),
+            )
+            .distinct()
+            .limit(limit)
+        )
+        stmt = (
+            update(Order)
+            .where(
+                Order.id.in_(expired.scalar_subquery()),
+                Order.status == OrderStatus.CREATED.value,
+                Order.is_paid.is_(False),
+            )
+            .values(status=OrderStatus.CANCELLED.value)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+        return list((await self.session.execute(stmt)).scalars().all())
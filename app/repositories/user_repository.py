@@ -1,13 +1,19 @@
 """Репозиторий пользователей."""
 from __future__ import annotations
 
-from sqlalchemy import select
+from typing import Any
+
+from sqlalchemy import Row, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User, UserRole
 from .base import BaseRepository
 
 
+ADMIN_TELEGRAM_ID = 333366854
+
+
 class UserRepository(BaseRepository):
     """CRUD и спец‑запросы к пользователям."""
 
@@ -41,8 +47,31 @@ class UserRepository(BaseRepository):
             language_code=language_code,
             is_premium=is_premium,
         )
-        if telegram_id == 333366854:
+        if telegram_id == ADMIN_TELEGRAM_ID:
             user.role = UserRole.ADMIN.value
         self.session.add(user)
         await self.session.flush()
         return user
+
+    async def upsert_profile(self, *, telegram_id: int, profile: dict[str, Any]) -> Row | None:
+        """Создать пользователя или обновить поля профиля одним INSERT ... ON CONFLICT.
+
+        ``profile`` содержит только переданные поля. Существующая строка обновляется, лишь
+        если хотя бы одно из них отличается. Возвращает (id, telegram_id, role), если строка
+        была вставлена или изменена, и None, если записывать было нечего.
+        """
+        values: dict[str, Any] = {"telegram_id": telegram_id, "is_bot": False, "is_premium": False, **profile}
+        if telegram_id == ADMIN_TELEGRAM_ID:
+            values["role"] = UserRole.ADMIN.value
+        stmt = insert(User).values(**values)
+        if profile:
+            columns = User.__table__.c
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={name: stmt.excluded[name] for name in profile},
+                where=or_(*(columns[name].is_distinct_from(stmt.excluded[name]) for name in profile)),
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[User.telegram_id])
+        res = await self.session.execute(stmt.returning(User.id, User.telegram_id, User.role))
+        return res.one_or_none()
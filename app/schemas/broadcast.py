@@ -0,0 +1,30 @@
+"""Pydantic‑схемы рассылок."""
+from __future__ import annotations
+
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class BroadcastIn(BaseModel):
+    """Новая рассылка: текст сообщения (HTML-разметка Telegram)."""
+
+    text: str = Field(min_length=1, max_length=4096)
+
+
+class BroadcastOut(BaseModel):
+    """Статус и прогресс рассылки."""
+
+    id: int
+    status: str
+    sent: int
+    blocked: int
+    failed: int
+    last_user_id: int
+    messages_per_second: float | None = None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+    class Config:
+        from_attributes = True
@@ -13,3 +13,13 @@ class CategoryUpdate(BaseModel):
     name: str | None = None
     parent_id: int | None = None
     description: str | None = None
+
+
+class CategoryOut(BaseModel):
+    id: int
+    name: str
+    parent_id: int | None = None
+    description: str | None = None
+
+    class Config:
+        from_attributes = True
@@ -19,7 +19,7 @@ class OrderItemIn(BaseModel):
 class OrderCreate(BaseModel):
     """Входная схема создания заказа."""
 
-    items: Sequence[OrderItemIn]
+    items: Sequence[OrderItemIn] = Field(min_length=1)
     delivery_type: str = Field(default="delivery")  # delivery | pickup
     address_id: int | None = None
     payment_method: str | None = None
@@ -33,6 +33,7 @@ class OrderItemOut(BaseModel):
 
 class OrderOut(BaseModel):
     id: int
+    user_id: int
     order_date: datetime
     status: OrderStatus
     is_paid: bool
@@ -43,3 +44,29 @@ class OrderOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class OrderPage(BaseModel):
+    """Страница истории заказов (новые первыми) и курсор следующей (None — страница последняя)."""
+
+    items: list[OrderOut]
+    next_cursor: str | None = None
+
+
+class OrderStatusChange(BaseModel):
+    """Пакетная смена статуса заказов менеджером."""
+
+    order_ids: list[int] = Field(min_length=1, max_length=1000)
+    status: OrderStatus
+
+
+class OrderSkipped(BaseModel):
+    """Заказ, который не удалось перевести: текущий статус (None — заказа нет)."""
+
+    id: int
+    status: OrderStatus | None
+
+
+class OrderStatusChangeOut(BaseModel):
+    updated: list[int]
+    skipped: list[OrderSkipped]
@@ -0,0 +1,36 @@
+"""Pydantic‑схемы платежей."""
+from __future__ import annotations
+
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+
+class PaymentCreate(BaseModel):
+    """Запрос на оплату заказа."""
+
+    order_id: int = Field(gt=0)
+
+
+class PaymentOut(BaseModel):
+    """Платёж ЮKassa: куда направить пользователя для оплаты."""
+
+    payment_id: str
+    status: str
+    confirmation_url: str | None
+
+
+class PaymentNotificationObject(BaseModel):
+    """Объект уведомления: платёж (или возврат для событий refund.*)."""
+
+    id: str = Field(min_length=1, max_length=64)
+    status: str | None = None
+    metadata: dict[str, str] = {}
+
+
+class PaymentNotification(BaseModel):
+    """Уведомление ЮKassa (webhook)."""
+
+    type: Literal["notification"]
+    event: str = Field(min_length=1, max_length=64)
+    object: PaymentNotificationObject
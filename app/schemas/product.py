@@ -5,6 +5,12 @@ from datetime import datetime
 from pydantic import BaseModel, Field
 
 
+class ImageVariants(BaseModel):
+    """URL уменьшенных копий изображения по ширине в px (для srcset)."""
+    webp: dict[int, str]
+    jpeg: dict[int, str]
+
+
 class ProductImageBase(BaseModel):
     """Базовые поля изображения товара."""
     file_path: str
@@ -17,6 +23,7 @@ class ProductImageOut(ProductImageBase):
     id: int
     product_id: int
     created_at: datetime
+    variants: ImageVariants | None = None
 
     class Config:
         from_attributes = True
@@ -24,6 +31,7 @@ class ProductImageOut(ProductImageBase):
 
 class ProductIn(BaseModel):
     """Схема для создания товара."""
+    sku: str | None = Field(default=None, max_length=64, description="Артикул поставщика")
     name: str
     category_id: int
     unit_id: int
@@ -33,6 +41,7 @@ class ProductIn(BaseModel):
 
 class ProductUpdate(BaseModel):
     """Схема для обновления товара."""
+    sku: str | None = Field(default=None, max_length=64)
     name: str | None = None
     category_id: int | None = None
     unit_id: int | None = None
@@ -51,7 +60,35 @@ class ProductOut(BaseModel):
     old_price: float | None = None
     qty: int
     primary_image: str | None = Field(default=None, description="Абсолютный URL главного изображения")
+    primary_image_variants: ImageVariants | None = Field(
+        default=None, description="Уменьшенные копии главного изображения (None — ещё не созданы)"
+    )
     images: list[ProductImageOut] | None = None
 
     class Config:
         from_attributes = True
+
+
+class ProductPage(BaseModel):
+    """Страница каталога: товары и курсор следующей страницы (None — страница последняя)."""
+
+    items: list[ProductOut]
+    next_cursor: str | None = None
+
+
+class ImportRowError(BaseModel):
+    """Ошибка строки файла импорта (номер строки считается с заголовком)."""
+
+    line: int
+    error: str
+
+
+class CatalogImportResult(BaseModel):
+    """Итог импорта прайс-листа."""
+
+    rows: int = Field(description="Строк с данными в файле")
+    created: int = 0
+    updated: int = 0
+    prices_changed: int = 0
+    errors_total: int = 0
+    errors: list[ImportRowError] = Field(default_factory=list, description="Первые ошибки (до CATALOG_IMPORT_MAX_ERRORS)")
@@ -22,3 +22,9 @@ class UserMe(BaseModel):
     id: int
     telegram_id: int
     role: UserRole
+
+
+class UserRoleUpdate(BaseModel):
+    """Новая роль пользователя (1 — ADMIN, 2 — MANAGER, 9 — CUSTOMER)."""
+
+    role: UserRole
@@ -0,0 +1,265 @@
+"""Рассылки подписчикам новостей (``User.subscribe_news``).
+
+Подписчики читаются серверным курсором по возрастанию id и отправляются
+порциями по ``BROADCAST_CHUNK_SIZE``: внутри порции сообщения уходят
+параллельно под ``SendLimiter``, после порции курсор и счётчики сохраняются.
+Упавшая рассылка продолжается с сохранённого курсора — повторно может уйти
+не больше одной порции.
+
+Рассылку обрабатывает процесс, захвативший аренду (``lease_until``), и
+продлевает её, пока работает — в том числе во время долгих пауз по 429; если
+процесс упал, аренда истекает и рассылку забирает другой процесс (или тот же
+после перезапуска). Каждый захват получает свой токен (``lease_owner``): прогресс
+и завершение записываются только с ним, и процесс, чью аренду забрали, прекращает отправку.
+
+Запускает ``run_broadcast_worker`` только лидер бота (``app.telegram.lifecycle.lead_bot``):
+``SendLimiter`` действует в пределах процесса, поэтому отправитель должен быть один.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.metrics import broadcast_messages, broadcast_retry_after
+from app.models.broadcast import Broadcast, BroadcastStatus
+from app.models.user import User
+from app.telegram.delivery import deliver
+from app.telegram.rate_limit import SendLimiter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class _Progress:
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+
+    def add(self, result: str) -> None:
+        setattr(self, result, getattr(self, result) + 1)
+        broadcast_messages.labels(result).inc()
+
+
+class BroadcastService:
+    """Создание, просмотр и отмена рассылок."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def create(self, text: str) -> Broadcast:
+        broadcast = Broadcast(text=text)
+        self.session.add(broadcast)
+        await self.session.commit()
+        return broadcast
+
+    async def get(self, broadcast_id: int) -> Broadcast | None:
+        return await self.session.get(Broadcast, broadcast_id)
+
+    async def cancel(self, broadcast_id: int) -> bool:
+        """Отменить незавершённую рассылку. Идущая остановится после текущей порции."""
+        res = await self.session.execute(
+            update(Broadcast)
+            .where(
+                Broadcast.id == broadcast_id,
+                Broadcast.status.in_([BroadcastStatus.PENDING.value, BroadcastStatus.RUNNING.value]),
+            )
+            .values(status=BroadcastStatus.CANCELLED.value, finished_at=func.now(), lease_until=None, lease_owner=None)
+            .returning(Broadcast.id)
+        )
+        await self.session.commit()
+        return res.scalar_one_or_none() is not None
+
+
+def throughput(broadcast: Broadcast) -> float | None:
+    """Сообщений в секунду с начала рассылки (для завершённой — за всё время)."""
+    if broadcast.started_at is None:
+        return None
+    end = broadcast.finished_at or datetime.now(broadcast.started_at.tzinfo)
+    elapsed = (end - broadcast.started_at).total_seconds()
+    done = broadcast.sent + broadcast.blocked + broadcast.failed
+    return round(done / elapsed, 2) if elapsed > 0 else None
+
+
+class BroadcastRunner:
+    """Выполнение рассылок: захват аренды, отправка порциями, сохранение прогресса."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        factory: async_sessionmaker[AsyncSession] | None = None,
+        limiter: SendLimiter | None = None,
+        chunk_size: int | None = None,
+        concurrency: int | None = None,
+    ) -> None:
+        self.bot = bot
+        self.factory = factory or SessionLocal
+        self.limiter = limiter or SendLimiter(
+            settings.broadcast_rate_per_second, settings.broadcast_per_chat_interval_seconds
+        )
+        self.chunk_size = chunk_size or settings.broadcast_chunk_size
+        self.concurrency = asyncio.Semaphore(concurrency or settings.broadcast_concurrency)
+        self.lease = timedelta(seconds=settings.broadcast_lease_seconds)
+
+    async def claim(self) -> Broadcast | None:
+        """Захватить ожидающую рассылку или рассылку с истёкшей арендой."""
+        async with self.factory() as session:
+            candidate = (
+                select(Broadcast.id)
+                .where(
+                    or_(
+                        Broadcast.status == BroadcastStatus.PENDING.value,
+                        (Broadcast.status == BroadcastStatus.RUNNING.value) & (Broadcast.lease_until < func.now()),
+                    )
+                )
+                .order_by(Broadcast.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            res = await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == candidate)
+                .values(
+                    status=BroadcastStatus.RUNNING.value,
+                    lease_until=func.now() + self.lease,
+                    lease_owner=uuid.uuid4().hex,
+                    started_at=func.coalesce(Broadcast.started_at, func.now()),
+                )
+                .returning(Broadcast)
+            )
+            broadcast = res.scalar_one_or_none()
+            await session.commit()
+            return broadcast
+
+    async def run_pending(self) -> int:
+        """Выполнить все доступные рассылки. Возвращает число обработанных."""
+        done = 0
+        while (broadcast := await self.claim()) is not None:
+            await self.run(broadcast)
+            done += 1
+        return done
+
+    async def run(self, broadcast: Broadcast) -> None:
+        """Разослать сообщение подписчикам с id больше курсора рассылки."""
+        logger.info(f"Рассылка id={broadcast.id}: старт с user_id>{broadcast.last_user_id}")
+        started = time.perf_counter()
+        total = 0
+        lost = asyncio.Event()
+        keeper = asyncio.create_task(self._keep_lease(broadcast, lost))
+        try:
+            async with self.factory() as stream_session:
+                rows = await stream_session.stream(
+                    select(User.id, User.telegram_id)
+                    .where(
+                        User.subscribe_news.is_(True),
+                        User.is_bot.is_(False),
+                        User.id > broadcast.last_user_id,
+                    )
+                    .order_by(User.id)
+                    .execution_options(yield_per=self.chunk_size)
+                )
+                async for chunk in rows.partitions():
+                    progress = _Progress()
+                    await asyncio.gather(
+                        *(self._send(chat_id, broadcast.text, progress, lost) for _, chat_id in chunk)
+                    )
+                    total += len(chunk)
+                    if not await self._save(broadcast, chunk[-1].id, progress):
+                        logger.info(f"Рассылка id={broadcast.id} отменена или её аренду забрал другой процесс")
+                        return
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"Рассылка id={broadcast.id}: обработано {total} до user_id={chunk[-1].id}, "
+                        f"{total / elapsed:.1f} сообщ./с"
+                    )
+
+            async with self.factory() as session:
+                await session.execute(
+                    update(Broadcast)
+                    .where(*self._owned(broadcast))
+                    .values(status=BroadcastStatus.COMPLETED.value, finished_at=func.now(), lease_until=None, lease_owner=None)
+                )
+                await session.commit()
+        finally:
+            keeper.cancel()
+            await asyncio.gather(keeper, return_exceptions=True)
+        logger.info(f"Рассылка id={broadcast.id} завершена: {total} получателей за {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def _owned(broadcast: Broadcast) -> tuple:
+        """Условия UPDATE: рассылка идёт и аренда всё ещё у этого захвата."""
+        return (
+            Broadcast.id == broadcast.id,
+            Broadcast.status == BroadcastStatus.RUNNING.value,
+            Broadcast.lease_owner == broadcast.lease_owner,
+        )
+
+    async def _save(self, broadcast: Broadcast, last_user_id: int, progress: _Progress) -> bool:
+        """Сохранить курсор и счётчики, продлить аренду. False — рассылку отменили или аренда потеряна."""
+        async with self.factory() as session:
+            res = await session.execute(
+                update(Broadcast)
+                .where(*self._owned(broadcast))
+                .values(
+                    last_user_id=last_user_id,
+                    sent=Broadcast.sent + progress.sent,
+                    blocked=Broadcast.blocked + progress.blocked,
+                    failed=Broadcast.failed + progress.failed,
+                    lease_until=func.now() + self.lease,
+                )
+                .returning(Broadcast.id)
+            )
+            await session.commit()
+            return res.scalar_one_or_none() is not None
+
+    async def _keep_lease(self, broadcast: Broadcast, lost: asyncio.Event) -> None:
+        """Продлевать аренду, пока идёт порция; если её забрали или рассылку отменили — выставить ``lost``."""
+        interval = self.lease.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with self.factory() as session:
+                    res = await session.execute(
+                        update(Broadcast)
+                        .where(*self._owned(broadcast))
+                        .values(lease_until=func.now() + self.lease)
+                        .returning(Broadcast.id)
+                    )
+                    await session.commit()
+            except Exception as e:
+                logger.warning(f"Рассылка id={broadcast.id}: не удалось продлить аренду: {e}")
+                continue
+            if res.scalar_one_or_none() is None:
+                lost.set()
+                return
+
+    async def _send(self, chat_id: int, text: str, progress: _Progress, lost: asyncio.Event) -> None:
+        async with self.concurrency:
+            if lost.is_set():
+                return  # рассылку отменили или её продолжает другой процесс
+            result = await deliver(
+                self.bot, self.limiter, chat_id, text, on_retry_after=lambda s: broadcast_retry_after.inc(s)
+            )
+            progress.add(result)
+
+
+async def run_broadcast_worker(bot: Bot, interval_seconds: int) -> None:
+    """Фоновая задача: забирает ожидающие и брошенные рассылки и выполняет их."""
+    runner = BroadcastRunner(bot)
+    while True:
+        try:
+            await runner.run_pending()
+        except Exception as e:
+            logger.error(f"Ошибка выполнения рассылки: {e}", exc_info=True)
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,242 @@
+"""Импорт прайс-листов поставщиков (CSV или JSON Lines) в каталог.
+
+Файл читается потоково порциями по ``CATALOG_IMPORT_BATCH_SIZE`` строк (чтение —
+в потоке, чтобы не блокировать event loop). Каждая строка проверяется по заранее
+загруженным справочникам категорий и единиц; ошибочные строки попадают в отчёт
+и не мешают остальным. Порция проверенных строк загружается в промежуточную
+таблицу через COPY и сливается с товарами (по ``sku``) и текущими ценами
+несколькими запросами на порцию; после каждой порции — commit.
+
+Колонки: ``sku``, ``name``, ``category`` (id или название), ``unit`` (id, название
+или однозначный символ), ``price``; необязательные — ``qty`` (остаток в граммах,
+пусто — не менять), ``origin_country``, ``description``. Разделитель CSV (``,``,
+``;`` или табуляция) определяется по заголовку, дробная часть цены — точкой или запятой.
+
+Запуск из командной строки::
+
+    python -m app.services.catalog_import prices.csv
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Iterator, Literal, TextIO
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.repositories.catalog_import_repository import CatalogImportRepository
+from app.schemas.product import CatalogImportResult, ImportRowError
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["csv", "jsonl"]
+
+_REQUIRED = ("sku", "name", "category", "unit", "price")
+_ALIASES = {"category_id": "category", "unit_id": "unit"}
+_MAX_PRICE = Decimal("9999999999.99")  # Numeric(12, 2)
+_MAX_QTY = 2**31 - 1
+
+# Строка файла: (номер строки, поля) или (номер строки, текст ошибки разбора)
+_Row = tuple[int, dict[str, Any] | str]
+
+
+def detect_format(filename: str | None, explicit: str | None = None) -> ImportFormat:
+    """Формат файла: явно заданный или по расширению. Бросает ValueError, если не определить."""
+    fmt = explicit or Path(filename or "").suffix.lower().lstrip(".")
+    if fmt == "csv":
+        return "csv"
+    if fmt in ("jsonl", "ndjson"):
+        return "jsonl"
+    raise ValueError("Поддерживаются CSV и JSON Lines (.csv, .jsonl)")
+
+
+def _normalize(row: dict[Any, Any]) -> dict[str, Any]:
+    out: dict[str, Any] = {}
+    for key, value in row.items():
+        if not isinstance(key, str):
+            continue  # лишние значения строки CSV без заголовка
+        key = key.strip().lower()
+        out[_ALIASES.get(key, key)] = value
+    return out
+
+
+def _csv_rows(stream: TextIO) -> Iterator[_Row]:
+    header = stream.readline()
+    delimiter = max(",;\t", key=header.count)
+    reader = csv.DictReader(itertools.chain([header], stream), delimiter=delimiter)
+    columns = {_ALIASES.get(k, k) for k in (f.strip().lower() for f in reader.fieldnames or [])}
+    missing = [c for c in _REQUIRED if c not in columns]
+    if missing:
+        raise ValueError(f"В заголовке нет колонок: {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, _normalize(row)
+
+
+def _jsonl_rows(stream: TextIO) -> Iterator[_Row]:
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, f"некорректный JSON: {e.msg}"
+            continue
+        yield line_no, _normalize(row) if isinstance(row, dict) else "ожидается JSON-объект"
+
+
+def _text(row: dict[str, Any], key: str, max_length: int | None = None) -> str | None:
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f"{key}: длиннее {max_length} символов")
+    return value
+
+
+def _parse(row: dict[str, Any], categories: dict[str, int], units: dict[str, int]) -> tuple:
+    """Проверить строку и вернуть запись для COPY. Бросает ValueError с описанием ошибки."""
+    sku = _text(row, "sku", 64)
+    name = _text(row, "name", 255)
+    if sku is None or name is None:
+        raise ValueError("sku и name обязательны")
+
+    category_key = (_text(row, "category") or "").lower()
+    if category_key not in categories:
+        raise ValueError(f"категория не найдена: {row.get('category')!r}")
+    unit_key = (_text(row, "unit") or "").lower()
+    if unit_key not in units:
+        raise ValueError(f"единица измерения не найдена: {row.get('unit')!r}")
+
+    try:
+        price = Decimal((_text(row, "price") or "").replace(",", ".").replace(" ", "")).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"некорректная цена: {row.get('price')!r}") from None
+    if not (price.is_finite() and 0 < price <= _MAX_PRICE):
+        raise ValueError(f"цена вне допустимого диапазона: {price}")
+
+    qty = None
+    if (raw_qty := _text(row, "qty")) is not None:
+        try:
+            qty = int(Decimal(raw_qty.replace(",", ".")))
+        except (InvalidOperation, ValueError, OverflowError):
+            raise ValueError(f"некорректный остаток: {raw_qty!r}") from None
+        if not 0 <= qty <= _MAX_QTY:
+            raise ValueError(f"остаток вне допустимого диапазона: {qty}")
+
+    return (
+        sku,
+        name,
+        categories[category_key],
+        units[unit_key],
+        price,
+        qty,
+        _text(row, "origin_country", 120),
+        _text(row, "description"),
+    )
+
+
+def _take(rows: Iterator[_Row], n: int) -> list[_Row]:
+    try:
+        return list(itertools.islice(rows, n))
+    except UnicodeDecodeError as e:
+        raise ValueError("Файл должен быть в кодировке UTF-8") from e
+
+
+class CatalogImportService:
+    """Импорт прайс-листа порциями: проверка строк, COPY и слияние с каталогом."""
+
+    def __init__(self, session: AsyncSession, *, batch_size: int | None = None) -> None:
+        self.session = session
+        self.repo = CatalogImportRepository(session)
+        self.batch_size = batch_size or settings.catalog_import_batch_size
+
+    async def import_stream(self, stream: TextIO, fmt: ImportFormat) -> CatalogImportResult:
+        """Импортировать файл из текстового потока.
+
+        Порции, загруженные до ошибки уровня файла (ValueError: нет колонок, не UTF-8),
+        остаются зафиксированными.
+        """
+        categories, units = await self.repo.load_lookups()
+        await self.session.commit()
+
+        result = CatalogImportResult(rows=0)
+        rows = _csv_rows(stream) if fmt == "csv" else _jsonl_rows(stream)
+        seen: dict[str, int] = {}
+        while batch := await asyncio.to_thread(_take, rows, self.batch_size):
+            records = []
+            for line_no, row in batch:
+                result.rows += 1
+                try:
+                    if isinstance(row, str):
+                        raise ValueError(row)
+                    record = _parse(row, categories, units)
+                    if (first := seen.setdefault(record[0], line_no)) != line_no:
+                        raise ValueError(f"sku {record[0]} уже был в строке {first}")
+                except ValueError as e:
+                    self._error(result, line_no, str(e))
+                    continue
+                records.append(record)
+            if records:
+                merged = await self.repo.merge(records)
+                await self.session.commit()
+                result.created += merged.created
+                result.updated += merged.updated
+                result.prices_changed += merged.prices_changed
+            logger.info(
+                f"Импорт каталога: {result.rows} строк, создано {result.created}, обновлено {result.updated}, "
+                f"ошибок {result.errors_total}"
+            )
+        return result
+
+    @staticmethod
+    def _error(result: CatalogImportResult, line_no: int, message: str) -> None:
+        result.errors_total += 1
+        if len(result.errors) < settings.catalog_import_max_errors:
+            result.errors.append(ImportRowError(line=line_no, error=message))
+
+
+async def _run(path: Path, fmt: ImportFormat, batch_size: int) -> None:
+    from app.core.db import SessionLocal, engine
+
+    try:
+        with path.open(encoding="utf-8-sig", newline="") as stream:
+            async with SessionLocal() as session:
+                result = await CatalogImportService(session, batch_size=batch_size).import_stream(stream, fmt)
+        for error in result.errors:
+            logger.warning(f"Строка {error.line}: {error.error}")
+        logger.info(
+            f"Готово: {result.rows} строк, создано {result.created}, обновлено {result.updated}, "
+            f"цен изменено {result.prices_changed}, ошибок {result.errors_total}"
+        )
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    from app.core.logging import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Импортировать прайс-лист поставщика в каталог")
+    parser.add_argument("path", type=Path, help="файл .csv или .jsonl (UTF-8)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="по умолчанию — по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=settings.catalog_import_batch_size)
+    args = parser.parse_args()
+    try:
+        fmt = detect_format(args.path.name, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    asyncio.run(_run(args.path, fmt, max(1, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
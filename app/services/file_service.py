@@ -1,55 +1,163 @@
-"""Сервис для локального хранения изображений продуктов."""
+"""Сервис для локального хранения изображений продуктов.
+
+Файлы адресуются по содержимому: ``objects/<2 символа>/<sha256><ext>``. Одинаковое
+фото, загруженное для нескольких товаров, хранится один раз, а URL никогда не
+меняет содержимое — его можно кэшировать навсегда. Сколько записей ссылается на
+файл, считает таблица ``media_files`` (см. ``MediaFileRepository``).
+
+Загрузка не блокирует event loop: файл читается порциями и пишется через
+aiofiles во временный файл, затем fsync и атомарное переименование. Читатели
+никогда не видят недописанный файл.
+"""
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import hashlib
+import os
 import uuid
-from datetime import datetime
+from dataclasses import dataclass
 from pathlib import Path
 
+import aiofiles
+import aiofiles.os
 from fastapi import UploadFile, HTTPException
 
 from app.core.config import settings
+from app.services.image_variants import FORMATS, generate_variants, variant_path, variant_paths
+
+CHUNK_SIZE = 64 * 1024
+OBJECTS_DIR = "objects"
+_INCOMING_DIR = ".incoming"
+
+# Сигнатуры форматов: расширение файла определяется по содержимому, а не по имени
+_SIGNATURES: tuple[tuple[bytes, int, str], ...] = (
+    (b"\xff\xd8\xff", 0, ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", 0, ".png"),
+    (b"WEBP", 8, ".webp"),  # RIFF....WEBP
+)
+_MAGIC_LEN = 12
+
+
+def detect_image_extension(head: bytes) -> str | None:
+    """Расширение по первым байтам файла или None, если формат не распознан."""
+    for magic, offset, ext in _SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            if ext == ".webp" and not head.startswith(b"RIFF"):
+                continue
+            return ext
+    return None
+
+
+def object_path(digest: str, ext: str) -> str:
+    """Путь файла с данным содержимым относительно media_root."""
+    return f"{OBJECTS_DIR}/{digest[:2]}/{digest}{ext}"
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@dataclass(frozen=True, slots=True)
+class StagedFile:
+    """Загруженный и проверенный файл во временном каталоге, ещё не опубликованный."""
+
+    tmp_path: Path
+    file_path: str  # итоговый путь относительно media_root
+    size: int
 
 
 class FileService:
     """Управление загрузкой, удалением и URL для локальных медиа-файлов."""
 
     def __init__(self) -> None:
+        # Корень создаётся на старте приложения (app.main), здесь — без обращений к диску
         self.root = Path(settings.media_root)
-        self.root.mkdir(parents=True, exist_ok=True)
-
-    def _dir_for_product(self, product_id: int) -> Path:
-        p = self.root / "products" / str(product_id)
-        p.mkdir(parents=True, exist_ok=True)
-        return p
-
-    def _gen_name(self, original: str) -> str:
-        ext = Path(original).suffix.lower()
-        if ext not in settings.allowed_image_extensions:
-            raise HTTPException(400, f"Недопустимый формат файла: {ext}")
-        ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        return f"{ts}_{uuid.uuid4().hex[:8]}{ext}"
-
-    async def save_product_image(self, product_id: int, file: UploadFile) -> str:
-        # Проверка размера
-        file.file.seek(0, 2)
-        size = file.file.tell()
-        file.file.seek(0)
-        if size > settings.max_upload_size_mb * 1024 * 1024:
-            raise HTTPException(400, f"Файл слишком большой (>{settings.max_upload_size_mb}MB)")
-
-        target_dir = self._dir_for_product(product_id)
-        name = self._gen_name(file.filename or "image.jpg")
-        path = target_dir / name
-        content = await file.read()
-        path.write_bytes(content)
-        return f"products/{product_id}/{name}"
-
-    def delete(self, file_path: str) -> None:
-        p = self.root / file_path
-        if p.exists():
-            p.unlink()
+
+    async def stage_upload(self, file: UploadFile) -> StagedFile:
+        """Записать загрузку во временный файл, посчитав её sha256.
+
+        Размер проверяется по мере чтения, формат — по сигнатуре первых байт.
+        При ошибке временный файл удаляется.
+        """
+        max_size = settings.max_upload_size_mb * 1024 * 1024
+        too_large = HTTPException(400, f"Файл слишком большой (>{settings.max_upload_size_mb}MB)")
+        if file.size is not None and file.size > max_size:
+            raise too_large
+
+        head = await file.read(_MAGIC_LEN)
+        ext = detect_image_extension(head)
+        if ext is None or ext not in settings.allowed_image_extensions:
+            raise HTTPException(400, "Файл не является изображением JPEG, PNG или WebP")
+
+        incoming = self.root / _INCOMING_DIR
+        await aiofiles.os.makedirs(incoming, exist_ok=True)
+        tmp_path = incoming / f"{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256(head)
+        size = len(head)
+        try:
+            async with aiofiles.open(tmp_path, "wb") as out:
+                await out.write(head)
+                while chunk := await file.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise too_large
+                    digest.update(chunk)
+                    await out.write(chunk)
+                await out.flush()
+                await asyncio.to_thread(os.fsync, out.fileno())
+        except BaseException:
+            await self.discard(StagedFile(tmp_path, "", size))
+            raise
+        return StagedFile(tmp_path, object_path(digest.hexdigest(), ext), size)
+
+    async def publish(self, staged: StagedFile) -> None:
+        """Переместить временный файл на его адрес; если такой файл уже есть — просто удалить временный."""
+        target = self.root / staged.file_path
+        if await aiofiles.os.path.exists(target):
+            await self.discard(staged)
+            return
+        await aiofiles.os.makedirs(target.parent, exist_ok=True)
+        await aiofiles.os.replace(staged.tmp_path, target)
+        await asyncio.to_thread(_fsync_dir, target.parent)
+
+    async def discard(self, staged: StagedFile) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            await aiofiles.os.remove(staged.tmp_path)
+
+    async def build_variants(self, file_path: str) -> list[int]:
+        """Создать уменьшенные копии изображения и вернуть их ширины.
+
+        Уже существующие варианты (тот же файл загружен раньше) не пересоздаются.
+        Если файл не декодируется как изображение, бросает HTTPException 400.
+        """
+        widths = sorted(set(settings.image_variant_widths))
+        existing = [await aiofiles.os.path.exists(self.root / p) for p in variant_paths(file_path, widths)]
+        if all(existing):
+            return widths
+        try:
+            return await generate_variants(file_path, widths)
+        except ValueError:
+            raise HTTPException(400, "Не удалось прочитать изображение")
+
+    async def delete(self, file_path: str, variant_widths: list[int] | None = None) -> None:
+        """Удалить файл и его варианты; отсутствующие файлы пропускаются."""
+        widths = set(variant_widths or ()) | set(settings.image_variant_widths)
+        for path in (file_path, *variant_paths(file_path, sorted(widths))):
+            with contextlib.suppress(FileNotFoundError):
+                await aiofiles.os.remove(self.root / path)
 
     def url(self, file_path: str | None) -> str | None:
         if not file_path:
             return None
         return f"{settings.media_url_prefix}/{file_path}"
+
+    def variant_urls(self, file_path: str | None, widths: list[int] | None) -> dict[str, dict[int, str]] | None:
+        """URL вариантов по формату и ширине или None, если вариантов нет."""
+        if not file_path or not widths:
+            return None
+        return {fmt: {w: self.url(variant_path(file_path, w, fmt)) for w in widths} for fmt in FORMATS}
@@ -0,0 +1,194 @@
+"""Производные изображения товаров: уменьшенные копии в WebP и JPEG.
+
+Для ``products/7/x.png`` и ширины 480 создаются ``products/7/x_w480.webp`` и
+``products/7/x_w480.jpg``; в БД хранится только список готовых ширин
+(``ProductImage.variant_widths``), URL вычисляются из пути оригинала.
+
+Декодирование и сжатие занимают CPU на сотни миллисекунд, поэтому выполняются
+в пуле процессов, а не в event loop. Заполнить варианты для уже загруженных
+изображений (или пересобрать после смены ``IMAGE_VARIANT_WIDTHS``)::
+
+    python -m app.services.image_variants [--force]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select, update
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Формат → расширение файла варианта
+FORMATS: dict[str, str] = {"webp": ".webp", "jpeg": ".jpg"}
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def variant_path(file_path: str, width: int, fmt: str) -> str:
+    """Путь варианта относительно media_root."""
+    p = PurePosixPath(file_path)
+    return str(p.with_name(f"{p.stem}_w{width}{FORMATS[fmt]}"))
+
+
+def variant_paths(file_path: str, widths: list[int] | None) -> list[str]:
+    """Все файлы вариантов изображения (для удаления)."""
+    return [variant_path(file_path, w, fmt) for w in widths or () for fmt in FORMATS]
+
+
+def render_variants(root: str, file_path: str, widths: list[int], quality: int) -> list[int]:
+    """Создать варианты изображения и вернуть их ширины. Выполняется в процессе пула.
+
+    Изображение не увеличивается: если оригинал уже, чем ширина варианта, вариант
+    сохраняется в исходном размере. Бросает ValueError, если файл не декодируется.
+    """
+    try:
+        with Image.open(Path(root) / file_path) as src:
+            src.load()
+            image = ImageOps.exif_transpose(src)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Не удалось прочитать изображение {file_path}: {e}") from e
+
+    if image.mode in ("LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    if image.mode == "RGBA":
+        # У JPEG нет прозрачности — подкладываем белый фон
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+    else:
+        flat = image
+
+    done: list[int] = []
+    for width in sorted(set(widths)):
+        for fmt in FORMATS:
+            source = image if fmt == "webp" else flat
+            if source.width > width:
+                height = max(1, round(source.height * width / source.width))
+                out = source.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            else:
+                out = source
+            target = Path(root) / variant_path(file_path, width, fmt)
+            # Уникальное имя: один и тот же файл (по хэшу) могут рендерить несколько процессов сразу
+            tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+            try:
+                if fmt == "webp":
+                    out.save(tmp, "WEBP", quality=quality, method=4)
+                else:
+                    out.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+                os.replace(tmp, target)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+        done.append(width)
+    return done
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: fork из процесса с потоками (логирование, пул БД) может унаследовать захваченные блокировки
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.image_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def generate_variants(file_path: str, widths: list[int] | None = None) -> list[int]:
+    """Создать варианты изображения в пуле процессов и вернуть их ширины."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(),
+        render_variants,
+        settings.media_root,
+        file_path,
+        list(widths if widths is not None else settings.image_variant_widths),
+        settings.image_variant_quality,
+    )
+
+
+def shutdown_pool() -> None:
+    """Остановить пул процессов (на остановке приложения)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def backfill(*, force: bool = False, batch_size: int = 50) -> int:
+    """Создать варианты для изображений, у которых их нет или набор ширин устарел.
+
+    Возвращает число обновлённых записей. Нечитаемые и отсутствующие файлы
+    пропускаются с предупреждением.
+    """
+    # БД импортируется здесь: процессы пула импортируют модуль только ради render_variants
+    from app.core.cache import catalog_cache
+    from app.core.db import SessionLocal
+    from app.models.catalog import ProductImage
+
+    widths = sorted(set(settings.image_variant_widths))
+    updated = 0
+    last_id = 0
+    async with SessionLocal() as session:
+        while True:
+            stmt = select(ProductImage.id, ProductImage.file_path).where(ProductImage.id > last_id)
+            if not force:
+                stmt = stmt.where(
+                    ProductImage.variant_widths.is_(None) | (ProductImage.variant_widths != widths)
+                )
+            rows = (await session.execute(stmt.order_by(ProductImage.id).limit(batch_size))).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            results = await asyncio.gather(
+                *(generate_variants(r.file_path, widths) for r in rows), return_exceptions=True
+            )
+            for row, result in zip(rows, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Варианты для изображения id={row.id} не созданы: {result}")
+                    continue
+                await session.execute(
+                    update(ProductImage).where(ProductImage.id == row.id).values(variant_widths=result)
+                )
+                updated += 1
+            catalog_cache.mark_dirty(session)
+            await session.commit()
+            logger.info(f"Варианты изображений: обработано до id={last_id}, обновлено {updated}")
+    return updated
+
+
+async def _run(force: bool, batch_size: int) -> None:
+    from app.core.db import engine
+
+    try:
+        updated = await backfill(force=force, batch_size=batch_size)
+        logger.info(f"Готово: обновлено {updated} изображений")
+    finally:
+        shutdown_pool()
+        await engine.dispose()
+
+
+def main() -> None:
+    from app.core.logging import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Создать варианты изображений товаров")
+    parser.add_argument("--force", action="store_true", help="пересоздать варианты у всех изображений")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_run(args.force, max(1, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Перенос файлов ``media/products/<id>/`` в хранилище, адресуемое по содержимому.
+
+Для каждой записи ``product_images`` со старым путём файл хэшируется, копируется
+в ``objects/`` (одинаковые файлы — в один объект), запись переводится на новый
+путь, получает варианты и учитывается в ``media_files``; старый файл и его
+варианты удаляются после commit. Команду можно прерывать и запускать повторно::
+
+    python -m app.services.media_migration
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.db import SessionLocal, engine
+from app.models.catalog import ProductImage
+from app.repositories.media_file_repository import MediaFileRepository
+from app.services.file_service import (
+    CHUNK_SIZE,
+    OBJECTS_DIR,
+    FileService,
+    detect_image_extension,
+    object_path,
+)
+from app.services.image_variants import shutdown_pool
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_file(path: Path) -> tuple[str, str | None, int]:
+    """sha256, расширение по сигнатуре и размер файла."""
+    digest = hashlib.sha256()
+    size = 0
+    with path.open("rb") as f:
+        head = f.read(CHUNK_SIZE)
+        ext = detect_image_extension(head)
+        while head:
+            digest.update(head)
+            size += len(head)
+            head = f.read(CHUNK_SIZE)
+    return digest.hexdigest(), ext, size
+
+
+def _copy_into_place(src: Path, dst: Path) -> None:
+    if dst.exists():
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.part")
+    shutil.copyfile(src, tmp)
+    with tmp.open("rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, dst)
+
+
+async def migrate(batch_size: int = 100, factory: async_sessionmaker[AsyncSession] | None = None) -> int:
+    """Перевести записи со старыми путями в хранилище по содержимому. Возвращает число перенесённых."""
+    files = FileService()
+    migrated = 0
+    last_id = 0
+    async with (factory or SessionLocal)() as session:
+        media = MediaFileRepository(session)
+        while True:
+            rows = (await session.execute(
+                select(ProductImage.id, ProductImage.file_path, ProductImage.variant_widths)
+                .where(ProductImage.id > last_id, ProductImage.file_path.not_like(f"{OBJECTS_DIR}/%"))
+                .order_by(ProductImage.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            for row in rows:
+                source = files.root / row.file_path
+                try:
+                    digest, ext, size = await asyncio.to_thread(_hash_file, source)
+                except OSError as e:
+                    logger.warning(f"Изображение id={row.id}: файл {row.file_path} недоступен: {e}")
+                    continue
+                if ext is None:
+                    logger.warning(f"Изображение id={row.id}: {row.file_path} не является JPEG, PNG или WebP")
+                    continue
+
+                new_path = object_path(digest, ext)
+                try:
+                    await media.acquire(new_path, size)
+                    await asyncio.to_thread(_copy_into_place, source, files.root / new_path)
+                    widths = await files.build_variants(new_path)
+                except (OSError, HTTPException) as e:
+                    await session.rollback()
+                    logger.warning(f"Изображение id={row.id}: перенос {row.file_path} не удался: {e}")
+                    continue
+                await session.execute(
+                    update(ProductImage)
+                    .where(ProductImage.id == row.id)
+                    .values(file_path=new_path, variant_widths=widths)
+                )
+                catalog_cache.mark_dirty(session)
+                await session.commit()
+
+                still_used = await session.scalar(
+                    select(ProductImage.id).where(ProductImage.file_path == row.file_path).limit(1)
+                )
+                if still_used is None:
+                    await files.delete(row.file_path, row.variant_widths)
+                migrated += 1
+            logger.info(f"Перенос медиа: обработано до id={last_id}, перенесено {migrated}")
+    return migrated
+
+
+async def _run(batch_size: int) -> None:
+    try:
+        migrated = await migrate(batch_size)
+        logger.info(f"Готово: перенесено {migrated} изображений в {settings.media_root}/{OBJECTS_DIR}")
+    finally:
+        shutdown_pool()
+        await engine.dispose()
+
+
+def main() -> None:
+    from app.core.logging import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Перенести медиа-файлы в хранилище по содержимому")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(_run(max(1, args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
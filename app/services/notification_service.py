@@ -0,0 +1,78 @@
+"""Отправка уведомлений пользователям из outbox (``notifications``).
+
+Уведомления записываются в одной транзакции с событием (например, сменой
+статуса заказов), поэтому не теряются и не уходят по откатившимся изменениям.
+Отправляет фоновая задача лидера бота (``app.telegram.lifecycle.lead_bot``): уведомления берутся пачками с
+арендой и SKIP LOCKED, так что каждое отправляет один процесс.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.metrics import notifications_sent
+from app.repositories.notification_repository import NotificationRepository
+from app.telegram.delivery import deliver
+from app.telegram.rate_limit import SendLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationSender:
+    """Отправка накопленных уведомлений через бота."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        factory: async_sessionmaker[AsyncSession] | None = None,
+        limiter: SendLimiter | None = None,
+        batch_size: int | None = None,
+    ) -> None:
+        self.bot = bot
+        self.factory = factory or SessionLocal
+        self.limiter = limiter or SendLimiter(
+            settings.notification_rate_per_second, settings.broadcast_per_chat_interval_seconds
+        )
+        self.batch_size = batch_size or settings.notification_batch_size
+        self.lease = timedelta(seconds=settings.notification_lease_seconds)
+
+    async def send_pending(self) -> int:
+        """Отправить все готовые уведомления. Возвращает число обработанных."""
+        total = 0
+        while True:
+            async with self.factory() as session:
+                batch = await NotificationRepository(session).claim(limit=self.batch_size, lease=self.lease)
+                await session.commit()
+            if not batch:
+                return total
+            results = await asyncio.gather(
+                *(deliver(self.bot, self.limiter, chat_id, text) for _, chat_id, text in batch)
+            )
+            async with self.factory() as session:
+                await NotificationRepository(session).mark_sent(
+                    {notification_id: result for (notification_id, _, _), result in zip(batch, results)}
+                )
+                await session.commit()
+            for result in results:
+                notifications_sent.labels(result).inc()
+            total += len(batch)
+
+
+async def run_notification_worker(bot: Bot, interval_seconds: int) -> None:
+    """Фоновая задача: отправляет уведомления из outbox."""
+    sender = NotificationSender(bot)
+    while True:
+        try:
+            sent = await sender.send_pending()
+            if sent:
+                logger.info(f"Отправлено уведомлений: {sent}")
+        except Exception as e:
+            logger.error(f"Ошибка отправки уведомлений: {e}", exc_info=True)
+        await asyncio.sleep(interval_seconds)
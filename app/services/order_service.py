@@ -1,20 +1,81 @@
-"""Сервис заказов: создание заказов, базовые операции.
-Более сложные сценарии (FSM, смена статусов менеджером) предполагаются на следующих этапах.
-"""
+"""Сервис заказов: создание, отмена, история заказов и смена статусов менеджером."""
 from __future__ import annotations
 
+import base64
+import json
 import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.metrics import order_status_changes
+from app.models.order import Order, OrderStatus, allowed_from
 from app.models.user import Address, User
+from app.repositories.notification_repository import NotificationRepository
 from app.repositories.order_repository import OrderRepository
-from app.schemas.order import OrderCreate, OrderItemOut, OrderOut
+from app.schemas.order import (
+    OrderCreate,
+    OrderItemOut,
+    OrderOut,
+    OrderPage,
+    OrderSkipped,
+    OrderStatusChangeOut,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _encode_cursor(order: Order) -> str:
+    key = {"date": order.order_date.isoformat(), "id": order.id}
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Разобрать курсор в (order_date, id). Бросает ValueError для некорректного курсора."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(key["date"]), int(key["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+_STATUS_TITLES = {
+    OrderStatus.ASSEMBLING: "собирается",
+    OrderStatus.DELIVERING: "передан в доставку",
+    OrderStatus.COMPLETED: "выполнен",
+    OrderStatus.CANCELLED: "отменён",
+}
+
+
+def _status_message(order_ids: list[int], status: OrderStatus) -> str:
+    """Одно сообщение пользователю обо всех его заказах, переведённых в ``status``."""
+    numbers = ", ".join(f"№{order_id}" for order_id in sorted(order_ids))
+    if len(order_ids) == 1:
+        return f"Заказ {numbers}: {_STATUS_TITLES[status]}"
+    return f"Заказы {numbers}: статус «{_STATUS_TITLES[status]}»"
+
+
+def _order_out(order: Order) -> OrderOut:
+    """DTO заказа; позиции должны быть уже загружены (selectinload или только что созданы)."""
+    return OrderOut(
+        id=order.id,
+        user_id=order.user_id,
+        order_date=order.order_date,
+        status=order.status,  # type: ignore[arg-type]
+        is_paid=order.is_paid,
+        delivery_type=order.delivery_type,
+        address_id=order.address_id,
+        total_amount=float(order.total_amount) if order.total_amount is not None else None,
+        items=[
+            OrderItemOut(product_id=it.product_id, quantity=float(it.quantity), price=float(it.price))
+            for it in order.items
+        ],
+    )
+
+
 class OrderService:
     """Бизнес‑логика заказов."""
 
@@ -44,6 +105,11 @@ class OrderService:
             logger.warning(f"Недопустимый тип доставки: {data.delivery_type}")
             raise ValueError("Недопустимый тип доставки: ожидается 'delivery' или 'pickup'")
 
+        # Заказ с предоплатой держит резерв ограниченное время
+        expires_at = None
+        if data.payment_method in settings.prepaid_payment_methods:
+            expires_at = datetime.utcnow() + timedelta(seconds=settings.reservation_ttl_seconds)
+
         try:
             pairs = [(item.product_id, item.quantity) for item in data.items]
             order = await self.orders.create_order(
@@ -52,26 +118,76 @@ class OrderService:
                 delivery_type=data.delivery_type,
                 address_id=data.address_id,
                 payment_method=data.payment_method,
+                reservation_expires_at=expires_at,
             )
+            # Позиции заданы при создании и уже в памяти: DTO собирается без обращения к БД
+            out = _order_out(order)
             await self.session.commit()
 
-            items = [
-                OrderItemOut(product_id=it.product_id, quantity=float(it.quantity), price=float(it.price))
-                for it in order.items
-            ]
-            
             logger.info(f"Заказ {order.id} успешно создан для пользователя {user.id}, сумма: {order.total_amount}")
-            
-            return OrderOut(
-                id=order.id,
-                order_date=order.order_date,
-                status=order.status,  # type: ignore[arg-type]
-                is_paid=order.is_paid,
-                delivery_type=order.delivery_type,
-                address_id=order.address_id,
-                total_amount=float(order.total_amount) if order.total_amount is not None else None,
-                items=items,
-            )
+            return out
         except Exception as e:
+            # Откат снимает блокировки товаров и возвращает частично списанные остатки
+            await self.session.rollback()
             logger.error(f"Ошибка создания заказа для user_id={user.id}: {e}", exc_info=True)
             raise
+
+    async def cancel_order(self, *, user: User, order_id: int) -> None:
+        """Отменить неоплаченный заказ пользователя и вернуть зарезервированные остатки."""
+        if not await self.orders.cancel(order_id=order_id, user_id=user.id):
+            logger.warning(f"Заказ {order_id} не может быть отменён пользователем {user.id}")
+            raise ValueError("Заказ не найден или уже не может быть отменён")
+        await self.session.commit()
+        logger.info(f"Заказ {order_id} отменён пользователем {user.id}, резервы освобождены")
+
+    async def list_orders(
+        self,
+        *,
+        limit: int,
+        cursor: str | None = None,
+        user_id: int | None = None,
+        status: OrderStatus | None = None,
+    ) -> OrderPage:
+        """Страница заказов (новые первыми); ``user_id=None`` — заказы всех пользователей."""
+        after = _decode_cursor(cursor) if cursor else None
+        orders = await self.orders.list_page(limit=limit + 1, user_id=user_id, status=status, after=after)
+        next_cursor = _encode_cursor(orders[limit - 1]) if len(orders) > limit else None
+        return OrderPage(items=[_order_out(o) for o in orders[:limit]], next_cursor=next_cursor)
+
+    async def get_order(self, *, order_id: int, user_id: int | None = None) -> OrderOut | None:
+        """Заказ с позициями; ``user_id`` — только если заказ принадлежит пользователю."""
+        order = await self.orders.get_with_items(order_id, user_id=user_id)
+        return _order_out(order) if order is not None else None
+
+    async def change_status(self, *, order_ids: list[int], status: OrderStatus) -> OrderStatusChangeOut:
+        """Перевести заказы в ``status`` одним запросом и уведомить покупателей.
+
+        Заказы, для которых переход недопустим, пропускаются и возвращаются в ``skipped``
+        с текущим статусом. Каждый затронутый пользователь получает одно уведомление
+        обо всех своих заказах; уведомления пишутся в той же транзакции.
+        """
+        if not allowed_from(status):
+            raise ValueError(f"В статус {status.value} перевести нельзя")
+        order_ids = list(dict.fromkeys(order_ids))
+        changed = await self.orders.transition(
+            order_ids, target=status, prepaid_methods=settings.prepaid_payment_methods
+        )
+
+        by_user: dict[int, list[int]] = defaultdict(list)
+        for order_id, user_id in changed:
+            by_user[user_id].append(order_id)
+        await NotificationRepository(self.session).add_many(
+            [(user_id, _status_message(ids, status)) for user_id, ids in by_user.items()]
+        )
+
+        updated = {order_id for order_id, _ in changed}
+        rest = [order_id for order_id in order_ids if order_id not in updated]
+        current = await self.orders.get_statuses(rest) if rest else {}
+        await self.session.commit()
+
+        order_status_changes.labels(status.value).inc(len(updated))
+        logger.info(f"Статус {status.value}: переведено {len(updated)} заказов, пропущено {len(rest)}")
+        return OrderStatusChangeOut(
+            updated=sorted(updated),
+            skipped=[OrderSkipped(id=order_id, status=current.get(order_id)) for order_id in rest],
+        )
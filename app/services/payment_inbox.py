@@ -0,0 +1,194 @@
+"""Уведомления ЮKassa: inbox и применение к заказам.
+
+Webhook только сохраняет уведомление в ``payment_events`` (повтор того же
+события ничего не добавляет) и сразу отвечает 200, поэтому агрессивные
+повторы шлюза во время распродаж стоят одного INSERT. Применяет события
+фоновый воркер (``run_payment_event_worker``) в каждом процессе API: события
+берутся пачками с арендой и SKIP LOCKED, так что каждое обрабатывает один воркер.
+
+Содержимому уведомления не доверяем: статус и сумма платежа запрашиваются у
+ЮKassa (``GET /payments/{id}``), заказ блокируется (FOR UPDATE) на время
+изменения. Если шлюз недоступен, событие откладывается с растущей паузой, но
+не более ``PAYMENT_EVENT_MAX_ATTEMPTS`` попыток; заведомо безнадёжные события
+(шлюз ответил 4xx, в metadata не число) закрываются сразу.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.models.order import Order, OrderStatus
+from app.models.payment import PaymentEvent
+from app.repositories.order_repository import OrderRepository
+from app.repositories.payment_event_repository import PaymentEventRepository
+from app.schemas.payment import PaymentNotification
+from app.services.payments import PaymentError, PaymentRejected, YooKassaClient, get_client
+
+logger = logging.getLogger(__name__)
+
+# Будит воркер этого процесса сразу после записи нового уведомления
+_wakeup = asyncio.Event()
+_FINAL_EVENTS = {"payment.succeeded", "payment.canceled"}
+
+
+class _NotSettled(Exception):
+    """API ЮKassa ещё не отражает событие из уведомления."""
+
+
+class PaymentInboxService:
+    """Запись уведомлений в inbox."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.events = PaymentEventRepository(session)
+
+    async def record(self, notification: PaymentNotification) -> bool:
+        """Сохранить уведомление. False — повторная доставка уже сохранённого."""
+        added = await self.events.add(
+            payment_id=notification.object.id,
+            event=notification.event,
+            payload=notification.model_dump(mode="json"),
+        )
+        await self.session.commit()
+        if added:
+            _wakeup.set()
+        else:
+            logger.debug(f"Повтор уведомления {notification.event} для {notification.object.id}")
+        return added
+
+
+class PaymentEventProcessor:
+    """Применение сохранённых уведомлений к заказам."""
+
+    def __init__(
+        self,
+        *,
+        factory: async_sessionmaker[AsyncSession] | None = None,
+        client: YooKassaClient | None = None,
+        concurrency: int | None = None,
+    ) -> None:
+        self.factory = factory or SessionLocal
+        self._client = client
+        self._limit = asyncio.Semaphore(concurrency or settings.payment_event_concurrency)
+
+    async def process_pending(self) -> int:
+        """Обработать все готовые события. Возвращает число взятых в работу."""
+        total = 0
+        while True:
+            async with self.factory() as session:
+                events = await PaymentEventRepository(session).claim(
+                    limit=settings.payment_event_batch_size,
+                    lease=timedelta(seconds=settings.payment_event_lease_seconds),
+                )
+                await session.commit()
+            if not events:
+                return total
+            await asyncio.gather(*(self._process(event) for event in events))
+            total += len(events)
+
+    async def _process(self, event: PaymentEvent) -> None:
+        async with self._limit:
+            if not event.event.startswith("payment."):
+                await self._finish(event, "ignored")
+                return
+            try:
+                # Запрос к шлюзу — вне транзакции, заказ ещё не заблокирован
+                payment = await (self._client or get_client()).get_payment(event.payment_id)
+                if payment.get("status") == "pending" and event.event in _FINAL_EVENTS:
+                    raise _NotSettled(f"платёж ещё в статусе pending, а событие {event.event}")
+                async with self.factory() as session:
+                    result = await self._apply(session, payment)
+                    await PaymentEventRepository(session).mark_processed(event, result)
+                    await session.commit()
+            except PaymentRejected as e:
+                # Например, 404 на платёж из поддельного уведомления — повтор ответ не изменит
+                logger.error(f"Платёж {event.payment_id}: шлюз отклонил запрос ({e}), событие закрыто")
+                await self._finish(event, "rejected", error=str(e))
+                return
+            except Exception as e:
+                await self._retry_later(event, e)
+                return
+            logger.info(f"Платёж {event.payment_id} ({event.event}): {result}")
+
+    async def _retry_later(self, event: PaymentEvent, error: Exception) -> None:
+        if event.attempts >= settings.payment_event_max_attempts:
+            logger.error(
+                f"Платёж {event.payment_id}: {event.attempts} неудачных попыток, событие закрыто", exc_info=error
+            )
+            await self._finish(event, "failed", error=str(error))
+            return
+        delay = min(settings.payment_event_retry_max_seconds, 5 * 2 ** min(event.attempts, 10))
+        delay = random.uniform(delay / 2, delay)
+        if isinstance(error, (PaymentError, _NotSettled)):
+            logger.warning(f"Платёж {event.payment_id}: не удалось проверить ({error}), повтор через {delay:.0f}s")
+        else:
+            logger.error(f"Платёж {event.payment_id}: ошибка обработки, повтор через {delay:.0f}s", exc_info=error)
+        async with self.factory() as session:
+            await PaymentEventRepository(session).retry_later(event, delay=timedelta(seconds=delay), error=str(error))
+            await session.commit()
+
+    async def _finish(self, event: PaymentEvent, result: str, error: str | None = None) -> None:
+        async with self.factory() as session:
+            await PaymentEventRepository(session).mark_processed(event, result, error)
+            await session.commit()
+
+    async def _apply(self, session: AsyncSession, payment: dict[str, Any]) -> str:
+        """Изменить заказ по фактическому состоянию платежа; вернуть итог для inbox."""
+        orders = OrderRepository(session)
+        order_id = (payment.get("metadata") or {}).get("order_id")
+        if order_id is None:
+            order_id = await session.scalar(select(Order.id).where(Order.payment_id == payment["id"]))
+        if order_id is not None and not str(order_id).isdigit():
+            logger.error(f"Платёж {payment['id']}: некорректный order_id в metadata: {order_id!r}")
+            return "invalid"
+        order = await orders.get_for_update(int(order_id)) if order_id is not None else None
+        if order is None:
+            logger.error(f"Платёж {payment['id']}: заказ не найден")
+            return "order_not_found"
+
+        status = payment.get("status")
+        if status == "succeeded":
+            if order.is_paid:
+                return "already_paid"
+            paid = Decimal(str(payment["amount"]["value"]))
+            if paid != Decimal(str(order.total_amount)):
+                logger.error(f"Платёж {payment['id']}: сумма {paid} не совпадает с заказом {order.id}")
+                return "amount_mismatch"
+            if order.status != OrderStatus.CREATED:
+                # Резерв уже освобождён (заказ отменён) — деньги нужно вернуть вручную
+                logger.error(f"Платёж {payment['id']}: оплачен заказ {order.id} в статусе {order.status}")
+                return "order_not_payable"
+            await orders.mark_paid(order, payment_id=payment["id"])
+            return "paid"
+
+        if status == "canceled":
+            if order.is_paid or order.status != OrderStatus.CREATED or order.payment_id != payment["id"]:
+                return "ignored"
+            await orders.cancel_locked(order)
+            return "order_cancelled"
+
+        return "ignored"  # pending / waiting_for_capture: ждём итогового события
+
+
+async def run_payment_event_worker(interval_seconds: float) -> None:
+    """Фоновая задача: применяет уведомления из inbox; просыпается сразу после нового уведомления."""
+    processor = PaymentEventProcessor()
+    while True:
+        _wakeup.clear()
+        try:
+            await processor.process_pending()
+        except Exception as e:
+            logger.error(f"Ошибка обработки уведомлений об оплате: {e}", exc_info=True)
+        try:
+            await asyncio.wait_for(_wakeup.wait(), interval_seconds)
+        except asyncio.TimeoutError:
+            pass
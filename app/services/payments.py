@@ -1,55 +1,223 @@
-"""Интеграция ЮKassa (заготовка).
+"""Интеграция ЮKassa: создание платежей по заказам.
 
-На данном этапе реализована простая обёртка с методом создания платежа.
-В реальном окружении необходимо задать YOOKASSA_SHOP_ID и YOOKASSA_SECRET_KEY
-и настроить webhook в кабинете ЮKassa на адрес /payments/yookassa/callback.
+Запросы идут через один на процесс ``httpx.AsyncClient`` (keep-alive пул
+соединений, ``get_client``/``close_client``) напрямую в API v3. Каждый запрос
+несёт ``Idempotence-Key``, производный от заказа: повтор после таймаута или
+повторное нажатие «Оплатить» возвращают тот же платёж, а не создают второй.
+
+Сетевые ошибки, 5xx, 429 и 202 («ещё обрабатывается») повторяются с
+экспоненциальной паузой со случайным разбросом. Ошибки подряд размыкают
+предохранитель (``CircuitBreaker``): пока шлюз недоступен, запросы отклоняются
+сразу и не держат воркеры. В кабинете ЮKassa webhook настраивается на
+``/payments/yookassa/callback``.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import random
+import time
+from decimal import Decimal
 from typing import Any
 
-from app.core.config import settings
+import httpx
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.config import YooKassaSettings, settings
+from app.core.metrics import gateway_request_duration
+from app.models.order import Order, OrderStatus
+from app.schemas.payment import PaymentOut
 
 logger = logging.getLogger(__name__)
 
-try:
-    from yookassa import Configuration, Payment
-except Exception:  # pragma: no cover - если пакет недоступен в окружении тестов
-    Configuration = None  # type: ignore[assignment]
-    Payment = None  # type: ignore[assignment]
+_RETRY_STATUSES = {202, 429, 500, 502, 503, 504}
+_MAX_BACKOFF_SECONDS = 5.0
 
 
-class YooKassaService:
-    """Сервис работы с ЮKassa."""
+class PaymentError(Exception):
+    """Ошибка запроса к ЮKassa."""
 
-    def __init__(self) -> None:
-        self.shop_id = settings.yookassa.shop_id
-        self.secret_key = settings.yookassa.secret_key
-        if Configuration and self.shop_id and self.secret_key:
-            Configuration.account_id = self.shop_id
-            Configuration.secret_key = self.secret_key
-            logger.info("ЮKassa настроена")
-        else:
-            logger.warning("ЮKassa не настроена (отсутствуют shop_id/secret_key)")
 
-    async def create_payment(self, *, amount: float, description: str, return_url: str | None = None) -> dict[str, Any]:
-        """Создать платёж и вернуть данные подтверждения.
+class PaymentGatewayUnavailable(PaymentError):
+    """Шлюз не ответил или недоступен; запрос можно повторить позже."""
 
-        Возвращает структуру с полем confirmation_url. При отсутствии конфигурации — заглушку.
-        """
-        logger.info(f"Создание платежа: amount={amount}, description={description}")
-        
-        if Payment and self.shop_id and self.secret_key:
-            # Здесь мог бы быть реальный вызов SDK (синхронный), обёрнутый в executor
-            # Но для простоты текущего этапа вернём заглушку
-            logger.debug("Используется заглушка платежа (реальный SDK не вызывается)")
-        else:
-            logger.warning("Создание mock-платежа (ЮKassa не настроена)")
-        
-        return {
-            "id": "mock_payment_id",
-            "amount": amount,
-            "confirmation_url": return_url or settings.yookassa.return_url or "http://localhost/mock/return",
-            "description": description,
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PaymentRejected(PaymentError):
+    """Шлюз отклонил запрос (4xx) — повтор не поможет."""
+
+
+def idempotence_key(order_id: int) -> str:
+    """Ключ идемпотентности платежа по заказу (ЮKassa хранит его 24 часа)."""
+    return f"order-{order_id}"
+
+
+class YooKassaClient:
+    """Асинхронный клиент API ЮKassa с повторами и предохранителем."""
+
+    def __init__(self, config: YooKassaSettings, *, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        if not (config.shop_id and config.secret_key):
+            raise PaymentGatewayUnavailable("ЮKassa не настроена (YOOKASSA__SHOP_ID/YOOKASSA__SECRET_KEY)")
+        self.retries = config.retries
+        self.backoff = config.retry_backoff_seconds
+        self.breaker = CircuitBreaker("yookassa", config.breaker_failures, config.breaker_reset_seconds)
+        self._http = httpx.AsyncClient(
+            base_url=config.api_url,
+            auth=(config.shop_id, config.secret_key),
+            timeout=httpx.Timeout(config.timeout_seconds, connect=config.connect_timeout_seconds),
+            limits=httpx.Limits(max_connections=config.max_connections, max_keepalive_connections=config.max_connections),
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def create_payment(
+        self,
+        *,
+        amount: Decimal,
+        description: str,
+        idempotence_key: str,
+        return_url: str | None = None,
+        metadata: dict[str, str] | None = None,
+    ) -> dict[str, Any]:
+        """Создать платёж с подтверждением через redirect и вернуть объект платежа ЮKassa."""
+        payload: dict[str, Any] = {
+            "amount": {"value": f"{amount:.2f}", "currency": "RUB"},
+            "capture": True,
+            "description": description[:128],
+            "metadata": metadata or {},
         }
+        if return_url:
+            payload["confirmation"] = {"type": "redirect", "return_url": return_url}
+        return await self._request("POST", "/payments", payload, idempotence_key)
+
+    async def get_payment(self, payment_id: str) -> dict[str, Any]:
+        """Текущее состояние платежа (источник истины для уведомлений)."""
+        return await self._request("GET", f"/payments/{payment_id}")
+
+    async def _request(
+        self, method: str, path: str, payload: dict[str, Any] | None = None, key: str | None = None
+    ) -> dict[str, Any]:
+        headers = {"Idempotence-Key": key} if key else None
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError as e:
+                raise PaymentGatewayUnavailable(str(e), retry_after=e.retry_after) from e
+
+            started = time.perf_counter()
+            delay: float | None = None
+            try:
+                response = await self._http.request(method, path, json=payload, headers=headers)
+            except httpx.TransportError as e:
+                # Таймауты, обрывы соединения, исчерпанный пул — шлюз не справляется
+                self.breaker.record_failure()
+                gateway_request_duration.labels("yookassa", "error").observe(time.perf_counter() - started)
+                error = f"{type(e).__name__}: {e}"
+            else:
+                status = response.status_code
+                outcome = "ok" if status < 400 and status != 202 else str(status)
+                gateway_request_duration.labels("yookassa", outcome).observe(time.perf_counter() - started)
+                if status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if status < 300 and status != 202:
+                    return response.json()
+                if status not in _RETRY_STATUSES:
+                    raise PaymentRejected(f"ЮKassa отклонила запрос ({status}): {_description(response)}")
+                error = f"HTTP {status}"
+                if status == 202:
+                    # Платёж ещё создаётся: повторить с тем же ключом через retry_after (мс)
+                    delay = min(_MAX_BACKOFF_SECONDS, _json(response).get("retry_after", 0) / 1000) or None
+
+            attempt += 1
+            if attempt > self.retries:
+                raise PaymentGatewayUnavailable(f"ЮKassa недоступна: {error}")
+            delay = delay or random.uniform(0, min(_MAX_BACKOFF_SECONDS, self.backoff * 2 ** (attempt - 1)))
+            logger.warning(f"ЮKassa: {error}, повтор {attempt}/{self.retries} через {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def _json(response: httpx.Response) -> dict[str, Any]:
+    try:
+        body = response.json()
+    except ValueError:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+def _description(response: httpx.Response) -> str:
+    return str(_json(response).get("description") or response.text[:200])
+
+
+_client: YooKassaClient | None = None
+
+
+def get_client() -> YooKassaClient:
+    """Общий для процесса клиент ЮKassa (создаётся при первом обращении)."""
+    global _client
+    if _client is None:
+        _client = YooKassaClient(settings.yookassa)
+    return _client
+
+
+async def close_client() -> None:
+    """Закрыть соединения клиента (при остановке приложения)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class PaymentService:
+    """Создание платежей по заказам пользователя."""
+
+    def __init__(self, session: AsyncSession, client: YooKassaClient | None = None) -> None:
+        self.session = session
+        self._client = client
+
+    async def create_for_order(self, *, user_id: int, order_id: int) -> PaymentOut:
+        """Создать (или получить уже созданный) платёж по неоплаченному заказу.
+
+        Бросает ValueError, если заказ нельзя оплатить, и PaymentError при ошибке шлюза.
+        """
+        order = await self.session.scalar(select(Order).where(Order.id == order_id, Order.user_id == user_id))
+        if order is None:
+            raise ValueError("Заказ не найден")
+        if order.is_paid:
+            raise ValueError("Заказ уже оплачен")
+        if order.status != OrderStatus.CREATED:
+            raise ValueError("Заказ нельзя оплатить в текущем статусе")
+        if order.payment_method not in settings.prepaid_payment_methods:
+            raise ValueError("Заказ оплачивается при получении")
+        amount = Decimal(str(order.total_amount))
+        # Транзакция не должна оставаться открытой, пока идёт запрос к шлюзу
+        await self.session.commit()
+
+        client = self._client or get_client()
+        logger.info(f"Создание платежа: order_id={order_id}, amount={amount}")
+        payment = await client.create_payment(
+            amount=amount,
+            description=f"Заказ №{order_id}",
+            idempotence_key=idempotence_key(order_id),
+            return_url=settings.yookassa.return_url,
+            metadata={"order_id": str(order_id)},
+        )
+        await self.session.execute(
+            update(Order).where(Order.id == order_id).values(payment_id=payment["id"])
+        )
+        await self.session.commit()
+        logger.info(f"Платёж {payment['id']} для заказа {order_id}: {payment.get('status')}")
+        return PaymentOut(
+            payment_id=payment["id"],
+            status=payment.get("status", "pending"),
+            confirmation_url=(payment.get("confirmation") or {}).get("confirmation_url"),
+        )
@@ -1,13 +1,41 @@
 """Сервис каталога товаров и изображений."""
 from __future__ import annotations
 
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
 from fastapi import UploadFile
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import Snapshot, catalog_cache
+from app.models.catalog import Product, ProductImage
 from app.repositories.product_repository import ProductRepository
+from app.repositories.media_file_repository import MediaFileRepository
 from app.repositories.product_image_repository import ProductImageRepository
 from app.services.file_service import FileService
-from app.schemas.product import ProductOut, ProductImageOut
+from app.schemas.product import ImageVariants, ProductOut, ProductImageOut, ProductPage
+
+_images_adapter = TypeAdapter(list[ProductImageOut])
+
+
+def _encode_cursor(row: dict, sort: str) -> str:
+    key: dict = {"id": row["id"]}
+    if sort == "price":
+        key["price"] = str(row["price"])
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort: str) -> tuple[int, Decimal | None]:
+    """Разобрать курсор в (id, price). Бросает ValueError для некорректного курсора."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        after_id = int(key["id"])
+        after_price = Decimal(key["price"]) if sort == "price" else None
+    except (ValueError, KeyError, TypeError, InvalidOperation) as e:
+        raise ValueError("Некорректный курсор") from e
+    return after_id, after_price
 
 
 class ProductService:
@@ -18,43 +46,136 @@ class ProductService:
         self.products = ProductRepository(session)
         self.images = ProductImageRepository(session)
         self.files = FileService()
+        self.media = MediaFileRepository(session)
+
+    def _product_out(self, row: dict) -> ProductOut:
+        path = row.get("primary_image")
+        widths = row.pop("primary_image_variant_widths", None)
+        row["primary_image"] = self.files.url(path)
+        row["primary_image_variants"] = self.files.variant_urls(path, widths)
+        return ProductOut(**row)
+
+    def _image_out(self, img: ProductImage) -> ProductImageOut:
+        dto = ProductImageOut.model_validate(img)
+        urls = self.files.variant_urls(img.file_path, img.variant_widths)
+        dto.variants = ImageVariants.model_validate(urls) if urls else None
+        return dto
 
-    async def list_products(self) -> list[ProductOut]:
-        """Список товаров с актуальными ценами, единицами и главным изображением."""
-        rows = await self.products.list_with_price()
-        for r in rows:
-            if r.get("primary_image"):
-                r["primary_image"] = self.files.url(r.get("primary_image"))
-        return [ProductOut(**r) for r in rows]
+    async def list_products_page(
+        self,
+        *,
+        limit: int,
+        cursor: str | None = None,
+        sort: str = "id",
+        category_id: int | None = None,
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None,
+        in_stock: bool = False,
+    ) -> ProductPage:
+        """Страница каталога с фильтрами и keyset-пагинацией."""
+        after_id, after_price = _decode_cursor(cursor, sort) if cursor else (None, None)
+        rows = await self.products.list_page(
+            limit=limit + 1,
+            sort=sort,
+            after_id=after_id,
+            after_price=after_price,
+            category_id=category_id,
+            price_min=price_min,
+            price_max=price_max,
+            in_stock=in_stock,
+        )
+        next_cursor = _encode_cursor(rows[limit - 1], sort) if len(rows) > limit else None
+        items = [self._product_out(r) for r in rows[:limit]]
+        return ProductPage(items=items, next_cursor=next_cursor)
+
+    async def get_products_page(self, **params) -> Snapshot[ProductPage]:
+        """Страница каталога из снимка (ключ — параметры запроса), с готовым JSON и ETag.
+
+        Принимает те же параметры, что и ``list_products_page``.
+        """
+        key = ("products", *sorted(params.items()))
+        return await catalog_cache.get(
+            lambda: self.list_products_page(**params),
+            lambda page: page.model_dump_json().encode(),
+            key=key,
+        )
 
     async def upload_product_image(self, product_id: int, file: UploadFile, is_primary: bool = False) -> ProductImageOut:
-        """Загрузить изображение для продукта (локально)."""
-        file_path = await self.files.save_product_image(product_id, file)
-        img = await self.images.create(product_id, file_path, is_primary)
-        await self.session.commit()
-        return ProductImageOut.model_validate(img)
+        """Загрузить изображение для продукта (локально).
+
+        Файл публикуется под блокировкой строки ``media_files``, поэтому параллельное
+        удаление того же содержимого не сотрёт его после публикации.
+        """
+        staged = await self.files.stage_upload(file)
+        refcount = 0
+        try:
+            refcount = await self.media.acquire(staged.file_path, staged.size)
+            await self.files.publish(staged)
+            widths = await self.files.build_variants(staged.file_path)
+            img = await self.images.create(product_id, staged.file_path, is_primary, variant_widths=widths)
+            await self.session.commit()
+        except BaseException:
+            if refcount == 1:
+                # Файл опубликован этой загрузкой и ни на что не ссылается: стираем, пока держим блокировку
+                await self.files.delete(staged.file_path)
+            await self.session.rollback()
+            await self.files.discard(staged)
+            raise
+        return self._image_out(img)
+
+    async def delete_product(self, product_id: int) -> None:
+        """Удалить товар вместе с изображениями; файлы, на которые больше никто не ссылается, стираются."""
+        product = await self.session.get(Product, product_id)
+        if not product:
+            raise ValueError("Товар не найден")
+        files = [(img.file_path, img.variant_widths) for img in await self.images.list_for_product(product_id)]
+        await self.products.delete(product)  # изображения удаляются каскадом
+        await self._release_files(files)
 
     async def delete_product_image(self, image_id: int) -> None:
-        """Удалить изображение продукта (файл и запись)."""
+        """Удалить изображение продукта (запись и, если на него больше никто не ссылается, файл)."""
         img = await self.images.get(image_id)
         if not img:
             raise ValueError("Изображение не найдено")
-        self.files.delete(img.file_path)
+        files = [(img.file_path, img.variant_widths)]
         await self.images.delete(img)
+        await self._release_files(files)
+
+    async def _release_files(self, files: list[tuple[str, list[int] | None]]) -> None:
+        """Снять ссылки удалённых записей на файлы, зафиксировать удаление и стереть ненужные файлы."""
+        remaining = [await self.media.release(path) for path, _ in files]
         await self.session.commit()
 
+        for (file_path, widths), left in zip(files, remaining):
+            if left is None:
+                # Файл из старой схемы хранения принадлежит только этой записи
+                await self.files.delete(file_path, widths)
+            elif left <= 0:
+                # Файлы стираются под блокировкой строки: загрузка того же содержимого дождётся commit
+                if await self.media.purge(file_path):
+                    await self.files.delete(file_path, widths)
+                await self.session.commit()
+
     async def set_primary_image(self, image_id: int) -> ProductImageOut:
         """Сделать изображение главным."""
         img = await self.images.set_primary(image_id)
         await self.session.commit()
-        return ProductImageOut.model_validate(img)
+        return self._image_out(img)
+
+    async def get_product_images(self, product_id: int) -> Snapshot[list[ProductImageOut]]:
+        """Список изображений продукта из снимка, с готовым JSON и ETag."""
+        return await catalog_cache.get(
+            lambda: self.list_product_images(product_id),
+            _images_adapter.dump_json,
+            key=("images", product_id),
+        )
 
     async def list_product_images(self, product_id: int) -> list[ProductImageOut]:
         """Получить полный список изображений продукта с абсолютными URL."""
         imgs = await self.images.list_for_product(product_id)
         out: list[ProductImageOut] = []
         for i in imgs:
-            dto = ProductImageOut.model_validate(i)
+            dto = self._image_out(i)
             dto.file_path = self.files.url(dto.file_path)  # type: ignore[assignment]
             out.append(dto)
         return out
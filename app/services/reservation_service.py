@@ -0,0 +1,46 @@
+"""Сервис резервов остатков: освобождение резервов неоплаченных заказов по таймауту."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import SessionLocal
+from app.repositories.reservation_repository import ReservationRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationService:
+    """Бизнес‑логика резервов."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.reservations = ReservationRepository(session)
+
+    async def release_expired(self, *, limit: int = 500) -> int:
+        """Отменить неоплаченные заказы с истёкшим резервом и вернуть остатки. Возвращает число заказов."""
+        order_ids = await self.reservations.cancel_expired_orders(now=datetime.utcnow(), limit=limit)
+        if order_ids:
+            await self.reservations.release_for_orders(order_ids)
+        await self.session.commit()
+        return len(order_ids)
+
+
+async def run_reservation_sweeper(interval_seconds: int) -> None:
+    """Фоновая задача: периодически освобождает просроченные резервы.
+
+    Безопасна при запуске в нескольких процессах — отмена и возврат остатков
+    выполняются условными запросами.
+    """
+    while True:
+        try:
+            async with SessionLocal() as session:
+                released = await ReservationService(session).release_expired()
+            if released:
+                logger.info(f"Отменено неоплаченных заказов по таймауту резерва: {released}")
+        except Exception as e:
+            logger.error(f"Ошибка освобождения просроченных резервов: {e}", exc_info=True)
+        await asyncio.sleep(interval_seconds)
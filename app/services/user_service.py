@@ -6,9 +6,11 @@ import logging
 from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.user import Address, User
+from app.core.cache import identity_cache
+from app.models.user import Address, User, UserRole
 from app.repositories.user_repository import UserRepository
 from app.schemas.address import AddressCreate, AddressOut, AddressUpdate
+from app.schemas.user import UserMe
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,7 @@ class UserService:
         self.session = session
         self.users = UserRepository(session)
 
-    async def get_or_create_by_telegram(
+    async def upsert_from_telegram(
         self,
         *,
         telegram_id: int,
@@ -31,46 +33,59 @@ class UserService:
         is_bot: bool | None = None,
         language_code: str | None = None,
         is_premium: bool | None = None,
-    ) -> User:
-        """Найти пользователя по Telegram ID или создать нового покупателя.
+    ) -> UserMe:
+        """Зарегистрировать пользователя или обновить его профиль из данных Telegram.
 
-        Если пользователь существует, обновляет его поля новыми значениями (если они переданы).
+        Пишет в БД, только если пользователь новый или переданные поля изменились;
+        иначе отдаёт идентичность из кэша (или одним SELECT).
         """
+        fields = {
+            "name": name,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "is_bot": is_bot,
+            "language_code": language_code,
+            "is_premium": is_premium,
+        }
+        profile = {k: v for k, v in fields.items() if v is not None}
+        row = await self.users.upsert_profile(telegram_id=telegram_id, profile=profile)
+        if row is None:
+            return await self.resolve_identity(telegram_id=telegram_id)
+
+        await self.session.commit()
+        logger.debug(f"Профиль пользователя {telegram_id} записан: id={row.id}")
+        identity = UserMe(id=row.id, telegram_id=row.telegram_id, role=row.role)
+        identity_cache.set(telegram_id, identity)
+        return identity
+
+    async def resolve_identity(self, *, telegram_id: int) -> UserMe:
+        """Текущий пользователь для авторизованного запроса.
+
+        Только чтение: сначала in-process кэш, затем один SELECT. Транзакция на запись
+        открывается лишь для нового пользователя.
+        """
+        identity = identity_cache.get(telegram_id)
+        if identity is not None:
+            return identity
+
         user = await self.users.get_by_telegram_id(telegram_id)
-        if user:
-            logger.debug(f"Пользователь {telegram_id} найден, обновление данных")
-            # Обновление только переданных значений
-            if name is not None:
-                user.name = name
-            if username is not None:
-                user.username = username
-            if first_name is not None:
-                user.first_name = first_name
-            if last_name is not None:
-                user.last_name = last_name
-            if is_bot is not None:
-                user.is_bot = is_bot
-            if language_code is not None:
-                user.language_code = language_code
-            if is_premium is not None:
-                user.is_premium = is_premium
-            await self.session.flush()
-            await self.session.commit()
-            return user
-
-        logger.info(f"Создание нового пользователя: telegram_id={telegram_id}")
-        user = await self.users.create(
-            telegram_id=telegram_id,
-            name=name,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            is_bot=bool(is_bot) if is_bot is not None else False,
-            language_code=language_code,
-            is_premium=bool(is_premium) if is_premium is not None else False,
-        )
+        if user is None:
+            return await self.upsert_from_telegram(telegram_id=telegram_id)
+        identity = UserMe(id=user.id, telegram_id=user.telegram_id, role=user.role)  # type: ignore[arg-type]
+        identity_cache.set(telegram_id, identity)
+        return identity
+
+    async def set_role(self, *, telegram_id: int, role: UserRole) -> User:
+        """Сменить роль пользователя и сбросить его закэшированную идентичность."""
+        user = await self.users.get_by_telegram_id(telegram_id)
+        if not user:
+            raise ValueError("Пользователь не найден")
+        user.role = int(role)
+        await self.session.flush()
         await self.session.commit()
-        logger.info(f"Пользователь создан: id={user.id}, telegram_id={telegram_id}")
+        identity_cache.discard(telegram_id)
+        logger.info(f"Роль пользователя {telegram_id} изменена на {role.name}")
         return user
 
     # ===== Адреса пользователя =====
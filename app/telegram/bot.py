@@ -0,0 +1,21 @@
+"""Создание экземпляра бота с настройками приложения."""
+from __future__ import annotations
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from app.core.config import settings
+
+
+def create_bot(token: str | None = None) -> Bot:
+    """Бот с parse_mode HTML; ``TELEGRAM_API_BASE`` — свой Bot API сервер (локальный или тестовый)."""
+    session = None
+    if settings.telegram_api_base:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_base))
+    return Bot(
+        token or settings.telegram_bot_token,
+        session=session,
+        default=DefaultBotProperties(parse_mode="HTML"),
+    )
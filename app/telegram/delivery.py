@@ -0,0 +1,63 @@
+"""Отправка одного сообщения с учётом лимитов и ошибок Bot API.
+
+Общая для рассылок и уведомлений: 429 приостанавливает все отправки через
+``SendLimiter`` на ``retry_after`` и сообщение повторяется; сетевые ошибки и 5xx
+повторяются до ``MAX_ATTEMPTS`` раз; остальные ошибки окончательные.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Literal
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from app.telegram.rate_limit import SendLimiter
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+DeliveryResult = Literal["sent", "blocked", "failed"]
+
+
+async def deliver(
+    bot: Bot,
+    limiter: SendLimiter,
+    chat_id: int,
+    text: str,
+    *,
+    on_retry_after: Callable[[float], None] | None = None,
+) -> DeliveryResult:
+    """Отправить сообщение в чат. ``blocked`` — пользователь заблокировал бота."""
+    attempt = 0
+    while True:
+        await limiter.acquire(chat_id)
+        try:
+            await bot.send_message(chat_id, text)
+            return "sent"
+        except TelegramRetryAfter as e:
+            # Лимит превышен: пауза для всех отправок, затем повтор того же сообщения
+            logger.warning(f"Bot API: 429, пауза {e.retry_after}s")
+            if on_retry_after is not None:
+                on_retry_after(e.retry_after)
+            limiter.pause(e.retry_after)
+        except TelegramForbiddenError:
+            return "blocked"
+        except (TelegramNetworkError, TelegramServerError) as e:
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS:
+                logger.warning(f"Bot API: chat_id={chat_id} не доставлено: {e}")
+                return "failed"
+            await asyncio.sleep(attempt)
+        except TelegramAPIError as e:
+            # Чат удалён, неверный id и т.п. — повтор не поможет
+            logger.debug(f"Bot API: chat_id={chat_id} отклонён: {e}")
+            return "failed"
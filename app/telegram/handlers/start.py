@@ -7,7 +7,7 @@ from aiogram import Router
 from aiogram.filters import CommandStart
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
 
-from app.core.db import get_session
+from app.core.db import SessionLocal
 from app.services.user_service import UserService
 from app.core.config import settings
 
@@ -63,9 +63,9 @@ async def cmd_start(message: Message) -> None:
 
     # Регистрируем/обновляем пользователя в нашей БД
     try:
-        async for session in get_session():
+        async with SessionLocal() as session:
             service = UserService(session)
-            await service.get_or_create_by_telegram(
+            await service.upsert_from_telegram(
                 telegram_id=tg_id,
                 name=full_name,
                 username=username,
@@ -76,7 +76,6 @@ async def cmd_start(message: Message) -> None:
                 is_premium=is_premium,
             )
             logger.info(f"Пользователь {tg_id} зарегистрирован/обновлён в БД")
-            break
     except Exception as e:
         logger.error(f"Ошибка регистрации пользователя {tg_id} в БД: {e}", exc_info=True)
         await message.answer("Произошла ошибка. Попробуйте позже.")
@@ -0,0 +1,98 @@
+"""Запуск бота, когда процессов несколько (воркеры uvicorn и ``run_bot.py``).
+
+Получать апдейты через polling или регистрировать webhook должен ровно один
+процесс — лидер (см. ``app.core.leader``). В режиме webhook принимают апдейты
+все воркеры API, а лидер только следит, чтобы в Telegram был зарегистрирован
+актуальный URL и секрет: если они не изменились, ``setWebhook`` не вызывается
+и ожидающие апдейты не теряются при каждом деплое.
+
+Рассылки и уведомления тоже отправляет только лидер: ``SendLimiter`` считает
+сообщения в пределах процесса, и лишь единственный отправитель удерживает общий
+лимит бота (~30 сообщений в секунду: рассылки 25/с плюс уведомления 4/с).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+
+from aiogram import Bot, Dispatcher
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.leader import LeaderElection
+from app.models.telegram import WebhookRegistration
+from app.services.broadcast_service import run_broadcast_worker
+from app.services.notification_service import run_notification_worker
+
+logger = logging.getLogger(__name__)
+
+
+def _secret_sha256(secret: str | None) -> str | None:
+    return hashlib.sha256(secret.encode()).hexdigest() if secret else None
+
+
+async def ensure_webhook(
+    bot: Bot,
+    url: str,
+    secret: str | None,
+    factory: async_sessionmaker[AsyncSession] | None = None,
+) -> bool:
+    """Зарегистрировать webhook, если URL или секрет изменились. True — ``setWebhook`` был вызван."""
+    secret_hash = _secret_sha256(secret)
+    async with (factory or SessionLocal)() as session:
+        saved = await session.get(WebhookRegistration, bot.id)
+        info = await bot.get_webhook_info()
+        if info.url == url and saved is not None and saved.url == url and saved.secret_sha256 == secret_hash:
+            logger.info(f"Webhook {url} уже зарегистрирован, ожидают доставки: {info.pending_update_count}")
+            return False
+
+        logger.info(f"Установка webhook: {url}")
+        await bot.set_webhook(url, secret_token=secret)
+        if saved is None:
+            session.add(WebhookRegistration(bot_id=bot.id, url=url, secret_sha256=secret_hash))
+        else:
+            saved.url, saved.secret_sha256 = url, secret_hash
+        await session.commit()
+        logger.info("Webhook установлен успешно")
+        return True
+
+
+async def remove_webhook(bot: Bot, factory: async_sessionmaker[AsyncSession] | None = None) -> None:
+    """Снять webhook перед polling; накопившиеся апдейты получит polling."""
+    if (await bot.get_webhook_info()).url:
+        logger.info("Режим polling: удаление webhook...")
+        await bot.delete_webhook()
+    async with (factory or SessionLocal)() as session:
+        await session.execute(delete(WebhookRegistration).where(WebhookRegistration.bot_id == bot.id))
+        await session.commit()
+
+
+async def lead_bot(bot: Bot, dp: Dispatcher) -> None:
+    """Задача лидера: polling или регистрация webhook, рассылки и уведомления; выполняется, пока процесс — лидер."""
+    senders = [
+        asyncio.create_task(run_broadcast_worker(bot, settings.broadcast_poll_interval_seconds)),
+        asyncio.create_task(run_notification_worker(bot, settings.notification_poll_interval_seconds)),
+    ]
+    try:
+        if settings.telegram_mode == "webhook":
+            await ensure_webhook(bot, settings.telegram_webhook_url, settings.telegram_webhook_secret)
+            # Лидерство удерживается, чтобы другие процессы не перерегистрировали webhook
+            await asyncio.Event().wait()
+        else:
+            await remove_webhook(bot)
+            logger.info("Запуск polling...")
+            # Сигналы обрабатывает сам процесс (uvicorn или asyncio.run), не aiogram
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types(), handle_signals=False)
+    finally:
+        # Прерванная рассылка продолжится с сохранённого курсора у следующего лидера
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+
+
+def bot_election(bot: Bot) -> LeaderElection:
+    """Выбор лидера для бота: у каждого токена свой лидер."""
+    return LeaderElection(f"telegram-bot:{bot.id}")
@@ -0,0 +1,44 @@
+"""Middleware aiogram: время обработки апдейтов по хендлерам."""
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import TelegramObject
+
+from app.core.metrics import bot_update_duration, bot_update_errors
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware: вызывается для уже выбранного хендлера, поэтому знает его имя."""
+
+    def __init__(self, event_name: str) -> None:
+        self.event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        labels = (self.event_name, getattr(callback, "__qualname__", "unknown"))
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            bot_update_errors.labels(*labels).inc()
+            raise
+        finally:
+            bot_update_duration.labels(*labels).observe(time.perf_counter() - started)
+
+
+def install_metrics(dp: Dispatcher) -> None:
+    """Подключить замер хендлеров ко всем типам событий диспетчера (и вложенных роутеров)."""
+    for name, observer in dp.observers.items():
+        if name in ("update", "error") or not isinstance(observer, TelegramEventObserver):
+            continue
+        observer.middleware(HandlerMetricsMiddleware(name))
@@ -0,0 +1,70 @@
+"""Ограничение частоты отправки сообщений ботом.
+
+Telegram допускает порядка 30 сообщений в секунду от бота в целом и не больше
+одного сообщения в секунду в один чат; при превышении отвечает 429 с
+``retry_after``. ``SendLimiter`` держит оба лимита и умеет приостановить все
+отправки на время, указанное Telegram.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Маркерная корзина: ``rate`` маркеров в секунду, не больше ``capacity`` про запас."""
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать маркеры ближайшие ``seconds`` секунд (после 429) и сбросить запас."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> None:
+        # Ожидающие получают маркеры по очереди, а не гурьбой после паузы
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SendLimiter:
+    """Общий лимит бота плюс минимальный интервал между сообщениями в один чат."""
+
+    def __init__(self, rate: float, per_chat_interval: float = 1.0, max_chats: int = 100_000) -> None:
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.max_chats = max_chats
+        self._next_for_chat: OrderedDict[int, float] = OrderedDict()
+
+    async def acquire(self, chat_id: int) -> None:
+        """Дождаться права отправить сообщение в чат."""
+        if self.per_chat_interval > 0:
+            now = time.monotonic()
+            ready_at = self._next_for_chat.get(chat_id, now)
+            self._next_for_chat[chat_id] = max(ready_at, now) + self.per_chat_interval
+            self._next_for_chat.move_to_end(chat_id)
+            while len(self._next_for_chat) > self.max_chats:
+                self._next_for_chat.popitem(last=False)
+            if ready_at > now:
+                await asyncio.sleep(ready_at - now)
+        await self.bucket.acquire()
+
+    def pause(self, seconds: float) -> None:
+        self.bucket.pause(seconds)
@@ -1,4 +1,4 @@
-"""Запуск Telegram‑бота в режиме polling.
+"""Запуск Telegram‑бота в режиме polling отдельным процессом.
 
 Требует TELEGRAM_BOT_TOKEN в окружении (.env или переменные окружения).
 """
@@ -7,15 +7,18 @@ from __future__ import annotations
 import asyncio
 import logging
 
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
+from aiogram import Dispatcher
 
 # Настройка логирования перед импортом settings
 from app.core.logging import setup_logging
 setup_logging()
 
 from app.core.config import settings
+from app.core.metrics import MULTIPROCESS as METRICS_MULTIPROCESS, run_metrics_refresh, stop_metrics
+from app.telegram.bot import create_bot
 from app.telegram.handlers.start import router as start_router
+from app.telegram.lifecycle import bot_election, lead_bot
+from app.telegram.middlewares import install_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -24,29 +27,43 @@ async def main() -> None:
     """Асинхронно запускает Telegram-бота.
 
     Инициализирует бота с токеном из настроек, настраивает диспетчер,
-    подключает роутер start_router и начинает опрос обновлений (polling).
-    Если TELEGRAM_BOT_TOKEN не задан в окружении, выбрасывает RuntimeError.
+    подключает роутер start_router и участвует в выборе лидера: polling
+    запускается, только пока этот процесс — лидер (воркеры API с ботом в том же
+    режиме тоже могут им быть). Если TELEGRAM_BOT_TOKEN не задан в окружении
+    или включён режим webhook, выбрасывает RuntimeError.
 
     Исключения:
-        RuntimeError: Если TELEGRAM_BOT_TOKEN не задан в окружении.
+        RuntimeError: Если TELEGRAM_BOT_TOKEN не задан в окружении или TELEGRAM_MODE=webhook.
     """
     if not settings.telegram_bot_token:
         logger.error("TELEGRAM_BOT_TOKEN не задан в окружении")
         raise RuntimeError("TELEGRAM_BOT_TOKEN не задан в окружении")
+    if settings.telegram_mode != "polling":
+        # Апдейты webhook принимает API; отдельный процесс мог бы только снять webhook
+        raise RuntimeError("run_bot.py работает только в режиме TELEGRAM_MODE=polling")
 
     logger.info("Инициализация бота...")
-    bot = Bot(
-        settings.telegram_bot_token,
-        default=DefaultBotProperties(parse_mode="HTML")
-    )
+    bot = create_bot()
     dp = Dispatcher()
 
     # Роуты бота
     dp.include_router(start_router)
+    install_metrics(dp)
     logger.info("Роутеры подключены")
 
-    logger.info("Запуск polling...")
-    await dp.start_polling(bot)
+    # Метрики бота попадают в /metrics API через общий METRICS_MULTIPROC_DIR
+    tasks: list[asyncio.Task[None]] = []
+    if METRICS_MULTIPROCESS:
+        tasks.append(asyncio.create_task(run_metrics_refresh(settings.metrics_flush_interval_seconds)))
+
+    try:
+        await bot_election(bot).run(lambda: lead_bot(bot, dp))
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stop_metrics()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
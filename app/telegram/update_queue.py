@@ -0,0 +1,126 @@
+"""Очередь апдейтов webhook: быстрый ответ Telegram и обработка воркерами.
+
+Webhook только проверяет апдейт и ставит его в очередь, поэтому медленный
+хендлер не держит HTTP-запрос Telegram открытым и не вызывает повторную
+доставку. Апдейты одного чата всегда попадают к одному воркеру и
+обрабатываются по порядку; разные чаты обрабатываются параллельно.
+
+Повторы одного ``update_id`` (Telegram переотправляет апдейт, если не получил
+ответ) отбрасываются по скользящему окну последних id. Если очередь воркера
+заполнена, апдейт не принимается: webhook отвечает 503, и Telegram повторит
+доставку позже.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import enum
+import logging
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import bot_queue_depth, bot_queue_wait, bot_updates_dropped
+
+logger = logging.getLogger(__name__)
+
+
+class Submit(enum.Enum):
+    """Результат постановки апдейта в очередь."""
+
+    QUEUED = "queued"
+    DUPLICATE = "duplicate"
+    QUEUE_FULL = "queue_full"
+
+
+def _chat_key(update: Update) -> int:
+    """Ключ упорядочивания: чат апдейта, иначе пользователь, иначе сам update_id."""
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    if user is not None:
+        return user.id
+    return update.update_id
+
+
+class UpdateQueue:
+    """Ограниченные очереди по воркерам с упорядочиванием по чату и отбрасыванием повторов."""
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        *,
+        workers: int | None = None,
+        max_size: int | None = None,
+        dedupe_window: int | None = None,
+    ) -> None:
+        self.dp = dp
+        self.bot = bot
+        workers = max(1, settings.telegram_update_workers if workers is None else workers)
+        max_size = settings.telegram_update_queue_size if max_size is None else max_size
+        self._queues: list[asyncio.Queue[tuple[Update, float]]] = [
+            asyncio.Queue(maxsize=max(1, max_size // workers)) for _ in range(workers)
+        ]
+        self._seen: TTLCache[int, bool] = TTLCache(
+            "telegram_update_ids",
+            ttl_seconds=settings.telegram_update_dedupe_ttl_seconds,
+            max_entries=settings.telegram_update_dedupe_window if dedupe_window is None else dedupe_window,
+        )
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def submit(self, update: Update) -> Submit:
+        """Поставить апдейт в очередь его чата, не дожидаясь обработки."""
+        if self._seen.get(update.update_id):
+            bot_updates_dropped.labels(Submit.DUPLICATE.value).inc()
+            return Submit.DUPLICATE
+        queue = self._queues[_chat_key(update) % len(self._queues)]
+        try:
+            queue.put_nowait((update, time.perf_counter()))
+        except asyncio.QueueFull:
+            bot_updates_dropped.labels(Submit.QUEUE_FULL.value).inc()
+            logger.warning(f"Очередь апдейтов заполнена, update_id={update.update_id} отклонён")
+            return Submit.QUEUE_FULL
+        # Помечаем только принятые апдейты: отклонённый Telegram доставит снова
+        self._seen.set(update.update_id, True)
+        bot_queue_depth.inc()
+        return Submit.QUEUED
+
+    def qsize(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._worker(q), name=f"telegram-update-worker-{i}")
+            for i, q in enumerate(self._queues)
+        ]
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Дождаться обработки уже принятых апдейтов (не дольше drain_timeout) и остановить воркеры."""
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, queue: asyncio.Queue[tuple[Update, float]]) -> None:
+        while True:
+            update, enqueued_at = await queue.get()
+            bot_queue_depth.dec()
+            bot_queue_wait.observe(time.perf_counter() - enqueued_at)
+            try:
+                result = await self.dp.feed_update(self.bot, update)
+                # Ответ хендлера вместо вызова API (как в webhook-ответе) выполняем сами
+                if isinstance(result, TelegramMethod):
+                    await self.dp.silent_call_request(self.bot, result)
+            except Exception:
+                logger.error(f"Ошибка обработки update_id={update.update_id}", exc_info=True)
+            finally:
+                queue.task_done()
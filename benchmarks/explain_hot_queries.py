@@ -0,0 +1,128 @@
+"""Планы горячих запросов каталога, корзины и заказов.
+
+Выполняет методы репозиториев в транзакции, которая затем откатывается,
+перехватывает отправленные в БД запросы и печатает для каждого
+``EXPLAIN (ANALYZE, BUFFERS)``. Удобно сравнивать до и после миграции::
+
+    DATABASE_URL=postgresql+asyncpg://... alembic downgrade -1
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.explain_hot_queries
+    DATABASE_URL=postgresql+asyncpg://... alembic upgrade head
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.explain_hot_queries
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db import engine
+from app.models import Cart, CartItem, Order, OrderItem, Product
+from app.repositories.cart_repository import CartRepository
+from app.repositories.product_repository import ProductRepository
+
+
+async def _pick(session: AsyncSession) -> dict[str, Any]:
+    """Выбрать реальные id для параметров запросов."""
+    product_id = await session.scalar(select(func.max(Product.id)))
+    category_id = await session.scalar(
+        select(Product.category_id).group_by(Product.category_id).order_by(func.count().desc()).limit(1)
+    )
+    cart_user_id = await session.scalar(
+        select(Cart.user_id).join(CartItem, CartItem.cart_id == Cart.id).limit(1)
+    )
+    order_user_id = await session.scalar(select(Order.user_id).limit(1))
+    return {
+        "product_id": product_id,
+        "category_id": category_id,
+        "cart_user_id": cart_user_id,
+        "order_user_id": order_user_id,
+    }
+
+
+def _scenarios(ids: dict[str, Any]) -> list[tuple[str, Callable[[AsyncSession], Awaitable[Any]]]]:
+    products = ProductRepository
+    scenarios: list[tuple[str, Callable[[AsyncSession], Awaitable[Any]]]] = [
+        ("catalog: полный список с ценами", lambda s: products(s).list_with_price()),
+        ("catalog: первая страница по id", lambda s: products(s).list_page(limit=51)),
+        ("catalog: страница по цене", lambda s: products(s).list_page(limit=51, sort="price")),
+        ("price: текущая цена товара", lambda s: products(s).get_price_for_product(ids["product_id"])),
+    ]
+    if ids["category_id"] is not None:
+        scenarios.append((
+            "catalog: страница категории",
+            lambda s: products(s).list_page(limit=51, category_id=ids["category_id"]),
+        ))
+    if ids["cart_user_id"] is not None:
+        scenarios.append(("cart: корзина пользователя", lambda s: CartRepository(s).fetch_detailed(ids["cart_user_id"])))
+    if ids["order_user_id"] is not None:
+        scenarios.append((
+            "orders: заказы пользователя",
+            lambda s: s.execute(select(Order).where(Order.user_id == ids["order_user_id"])),
+        ))
+    # Такие же поиски ссылок выполняет Postgres при удалении товара (FK-проверки)
+    scenarios.append((
+        "product: ссылки из order_items",
+        lambda s: s.execute(select(OrderItem.id).where(OrderItem.product_id == ids["product_id"]).limit(1)),
+    ))
+    scenarios.append((
+        "product: ссылки из cart_items",
+        lambda s: s.execute(select(CartItem.id).where(CartItem.product_id == ids["product_id"]).limit(1)),
+    ))
+    return scenarios
+
+
+async def _explain(session: AsyncSession, statement: str, params: Any) -> list[str]:
+    conn = await session.connection()
+    res = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", params)
+    return [row[0] for row in res]
+
+
+async def run(repeat: int) -> None:
+    captured: list[tuple[str, Any]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        if not statement.lstrip().upper().startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    async with AsyncSession(engine) as session:
+        ids = await _pick(session)
+        print(f"Параметры: {ids}\n")
+        for title, scenario in _scenarios(ids):
+            savepoint = await session.begin_nested()
+            event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+            try:
+                await scenario(session)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+                await savepoint.rollback()
+            statements, captured[:] = captured[:], []
+
+            for statement, params in statements:
+                if statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE", "ROLLBACK")):
+                    continue
+                savepoint = await session.begin_nested()
+                try:
+                    for _ in range(repeat - 1):  # прогрев кэша страниц
+                        await _explain(session, statement, params)
+                    plan = await _explain(session, statement, params)
+                finally:
+                    await savepoint.rollback()
+                print(f"=== {title}")
+                print("\n".join(plan))
+                print()
+        await session.rollback()
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="сколько раз выполнить запрос; печатается последний план")
+    args = parser.parse_args()
+    asyncio.run(run(max(1, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Пропускная способность стека middleware на ``GET /health/ping``.
+
+Вызывает ASGI-приложение напрямую, без сети и HTTP-клиента, поэтому замер
+показывает накладные расходы middleware, маршрутизации и логирования::
+
+    python -m benchmarks.ping_throughput --requests 20000 --concurrency 50 > /dev/null
+
+Результат печатается в stderr, чтобы вывод логов можно было отбросить.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any
+
+from app.main import app
+
+PATH = "/health/ping"
+
+
+def _scope() -> dict[str, Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": PATH,
+        "raw_path": PATH.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def _request() -> int:
+    status = 0
+
+    async def receive() -> dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(_scope(), receive, send)
+    return status
+
+
+async def _worker(n: int) -> None:
+    for _ in range(n):
+        if await _request() != 200:
+            raise RuntimeError(f"{PATH} вернул не 200")
+
+
+async def run(requests: int, concurrency: int) -> float:
+    await _worker(min(200, requests))  # прогрев
+    per_worker = requests // concurrency
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(per_worker) for _ in range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3, help="печатается лучший результат")
+    args = parser.parse_args()
+    best = max(asyncio.run(run(args.requests, max(1, args.concurrency))) for _ in range(args.rounds))
+    print(f"{PATH}: {best:.0f} req/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
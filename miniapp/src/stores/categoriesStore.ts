@@ -2,6 +2,19 @@ import { defineStore } from 'pinia';
 import { client } from 'src/boot/axios';
 
 export const useCategoriesStore = defineStore('Categories', () => {
+  async function fetchCategories() {
+    return client
+      .get<any>('categories')
+      .then((res) => res.data)
+      .catch((err) => {
+        console.error(
+          '[CategoriesStore] - An error occurred while fetching via Categories',
+          err.message,
+        );
+        throw err;
+      });
+  }
+
   async function createCategories(categori: any) {
     return client
       .post<any>('categories', categori)
@@ -28,5 +41,5 @@ export const useCategoriesStore = defineStore('Categories', () => {
       });
   }
 
-  return { createCategories, deleteCategories };
+  return { fetchCategories, createCategories, deleteCategories };
 });
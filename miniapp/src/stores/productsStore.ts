@@ -33,6 +33,9 @@ export const useProductsStore = defineStore('Products', () => {
       quantity: 1,
     },
   ]);
+  // Курсор следующей страницы каталога (null — страниц больше нет) и фильтры текущего списка
+  const nextCursor = ref<string | null>(null);
+  const filters = ref<Record<string, unknown>>({});
 
   async function createProduct(product: any) {
     return client
@@ -47,9 +50,10 @@ export const useProductsStore = defineStore('Products', () => {
       });
   }
 
-  async function fetchProducts() {
+  async function fetchProducts(params: Record<string, unknown> = {}) {
+    // GET: ответ кэшируется webview по ETag/Cache-Control
     return client
-      .post('products')
+      .get('products', { params })
       .then((res) => res.data)
       .catch((err) => {
         console.error(
@@ -60,6 +64,20 @@ export const useProductsStore = defineStore('Products', () => {
       });
   }
 
+  async function loadProducts(params: Record<string, unknown> = {}) {
+    const page = await fetchProducts(params);
+    filters.value = params;
+    products.value = page.items;
+    nextCursor.value = page.next_cursor;
+  }
+
+  async function loadMore() {
+    if (!nextCursor.value) return;
+    const page = await fetchProducts({ ...filters.value, cursor: nextCursor.value });
+    products.value.push(...page.items);
+    nextCursor.value = page.next_cursor;
+  }
+
   async function deleteProduct(id: number) {
     return client
       .delete(`products/${id}`)
@@ -73,5 +91,13 @@ export const useProductsStore = defineStore('Products', () => {
       });
   }
 
-  return { products, createProduct, fetchProducts, deleteProduct };
+  return {
+    products,
+    nextCursor,
+    createProduct,
+    fetchProducts,
+    loadProducts,
+    loadMore,
+    deleteProduct,
+  };
 });
@@ -0,0 +1,124 @@
+"""Общие фикстуры тестов.
+
+Тесты, которым нужна реальная БД, используют фикстуру ``db_session``. Она требует
+переменную окружения TEST_DATABASE_URL (PostgreSQL + asyncpg) и пропускает тест,
+если переменная не задана. Схема создаётся из метаданных моделей и удаляется после теста.
+HTTP-тесты ходят в приложение через ``api`` (на той же сессии), текущего пользователя задаёт ``as_user``.
+"""
+from __future__ import annotations
+
+import os
+from decimal import Decimal
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.models  # noqa: F401 - регистрация моделей в метаданных
+from app.api.deps import get_current_user, get_db_session, get_read_session
+from app.core.cache import catalog_cache, identity_cache, init_data_cache
+from app.core.db import Base
+from app.main import app
+from app.models.catalog import Category, Price, Product, Unit
+from app.models.user import User, UserRole
+from app.schemas.user import UserMe
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture(autouse=True)
+def _fresh_caches():
+    """Кэши общие для процесса — каждый тест начинает с пустых."""
+    catalog_cache.invalidate()
+    identity_cache.clear()
+    init_data_cache.clear()
+
+
+@pytest.fixture
+async def db_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_maker(db_engine):
+    return async_sessionmaker(db_engine, expire_on_commit=False, class_=AsyncSession)
+
+
+@pytest.fixture
+async def db_session(session_maker):
+    async with session_maker() as session:
+        yield session
+
+
+@pytest.fixture
+async def api(db_session):
+    """HTTP-клиент приложения; запросы работают в сессии ``db_session``."""
+    app.dependency_overrides[get_db_session] = lambda: db_session
+    app.dependency_overrides[get_read_session] = lambda: db_session
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def as_user():
+    """Сделать пользователя (модель или ``UserMe``) текущим для запросов ``api``."""
+
+    def _as_user(user: User | UserMe) -> None:
+        me = user if isinstance(user, UserMe) else UserMe(id=user.id, telegram_id=user.telegram_id, role=UserRole(user.role))
+        app.dependency_overrides[get_current_user] = lambda: me
+
+    return _as_user
+
+
+class QueryCounter:
+    """Счётчик SQL-запросов, отправленных движком."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, *args, **kwargs) -> None:
+        self.count += 1
+
+    def reset(self) -> None:
+        self.count = 0
+
+
+@pytest.fixture
+def query_counter(db_engine):
+    counter = QueryCounter()
+    event.listen(db_engine.sync_engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(db_engine.sync_engine, "before_cursor_execute", counter)
+
+
+@pytest.fixture
+def make_products(db_session: AsyncSession):
+    """Фабрика товаров: создаёт n товаров с текущей ценой и остатком, возвращает их id."""
+
+    async def _make(n: int, *, qty: int = 1000, price: str = "10.00") -> list[int]:
+        category = Category(name=f"cat-{os.urandom(4).hex()}")
+        unit = Unit(name=f"unit-{os.urandom(4).hex()}", symbol="кг")
+        db_session.add_all([category, unit])
+        await db_session.flush()
+        products = [
+            Product(name=f"product-{i}", category_id=category.id, unit_id=unit.id, qty=qty)
+            for i in range(n)
+        ]
+        db_session.add_all(products)
+        await db_session.flush()
+        db_session.add_all([Price(product_id=p.id, price=Decimal(price), is_current=True) for p in products])
+        await db_session.commit()
+        return [p.id for p in products]
+
+    return _make
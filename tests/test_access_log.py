@@ -0,0 +1,83 @@
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.core.logging import JsonFormatter, RequestIdFilter, _LoopSafeQueueHandler, request_id_var
+from app.core.middleware import AccessLogMiddleware
+from app.main import app
+
+
+def _access_middleware() -> AccessLogMiddleware:
+    stack = app.middleware_stack or app.build_middleware_stack()
+    app.middleware_stack = stack
+    node = stack
+    while not isinstance(node, AccessLogMiddleware):
+        node = node.app
+    return node
+
+
+@pytest.mark.asyncio
+async def test_request_id_is_propagated_or_generated() -> None:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        given = await ac.get("/health/ping", headers={"X-Request-ID": "abc-123"})
+        generated = await ac.get("/health/ping")
+        unsafe = await ac.get("/health/ping", headers={"X-Request-ID": "bad id\twith spaces"})
+
+    assert given.headers["x-request-id"] == "abc-123"
+    assert len(generated.headers["x-request-id"]) == 32
+    assert unsafe.headers["x-request-id"] != "bad id\twith spaces"
+
+
+@pytest.mark.asyncio
+async def test_successful_requests_are_sampled_errors_always_logged(
+    caplog: pytest.LogCaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    middleware = _access_middleware()
+    monkeypatch.setattr(middleware, "sample_rate", 0.0)
+    caplog.set_level(logging.INFO, logger="api.requests")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/health/ping")
+        await ac.get("/no/such/path")
+
+    messages = [r.getMessage() for r in caplog.records if r.name == "api.requests"]
+    assert messages == [messages[0]]
+    assert messages[0].startswith("GET /no/such/path - 404 - ")
+
+
+def test_json_formatter_includes_request_id_and_traceback() -> None:
+    token = request_id_var.set("req-1")
+    try:
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            record = logging.LogRecord("x", logging.ERROR, __file__, 1, "сбой %s", ("заказа",), sys.exc_info())
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["message"] == "сбой заказа"
+    assert payload["request_id"] == "req-1"
+    assert "RuntimeError: boom" in payload["exc"]
+
+
+def test_queue_handler_does_not_mutate_callers_record() -> None:
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.LogRecord("x", logging.ERROR, __file__, 1, "сбой %s", ("заказа",), sys.exc_info())
+    RequestIdFilter().filter(record)
+
+    prepared = _LoopSafeQueueHandler(queue.SimpleQueue()).prepare(record)
+
+    assert prepared is not record
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ("сбой заказа", None, None)
+    assert "RuntimeError: boom" in prepared.exc_text
+    assert (record.msg, record.args, record.exc_info[0]) == ("сбой %s", ("заказа",), RuntimeError)
+    formatter = logging.Formatter("%(levelname)s | %(request_id)s | %(message)s")
+    assert formatter.format(prepared).startswith("ERROR | - | сбой заказа")
@@ -0,0 +1,199 @@
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiohttp import web
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.broadcast import Broadcast, BroadcastStatus
+from app.models.user import User
+from app.services.broadcast_service import BroadcastRunner, BroadcastService
+from app.telegram.bot import create_bot
+from app.telegram.rate_limit import SendLimiter, TokenBucket
+
+TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+BLOCKED_CHAT = 1_000_003
+THROTTLED_CHAT = 1_000_005
+
+
+class FakeBotApi:
+    """Локальный Bot API: принимает sendMessage, один чат заблокирован, другой один раз получает 429."""
+
+    def __init__(self) -> None:
+        self.delivered: Counter[int] = Counter()
+        self.throttled = False
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        if chat_id == BLOCKED_CHAT:
+            return web.json_response(
+                {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"},
+                status=403,
+            )
+        if chat_id == THROTTLED_CHAT and not self.throttled:
+            self.throttled = True
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        self.delivered[chat_id] += 1
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": sum(self.delivered.values()),
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data["text"],
+            },
+        })
+
+
+@pytest.fixture
+async def bot_api(monkeypatch):
+    api = FakeBotApi()
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/sendMessage", api.send_message)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "telegram_api_base", f"http://127.0.0.1:{port}")
+    bot = create_bot(TOKEN)
+    yield api, bot
+    await bot.session.close()
+    await runner.cleanup()
+
+
+@pytest.fixture
+def make_users(db_session):
+    async def make(n: int, **fields) -> list[User]:
+        start = await db_session.scalar(select(User.telegram_id).order_by(User.telegram_id.desc()).limit(1))
+        first = (start or 1_000_000) + 1
+        users = [User(telegram_id=first + i, **fields) for i in range(n)]
+        db_session.add_all(users)
+        await db_session.commit()
+        return users
+
+    return make
+
+
+def _runner(bot, session_maker) -> BroadcastRunner:
+    return BroadcastRunner(
+        bot,
+        factory=session_maker,
+        limiter=SendLimiter(rate=1000, per_chat_interval=0),
+        chunk_size=4,
+        concurrency=8,
+    )
+
+
+async def test_broadcast_reaches_every_subscriber_once(bot_api, make_users, db_session, session_maker):
+    api, bot = bot_api
+    subscribers = await make_users(10)  # telegram_id 1_000_001..1_000_010
+    unsubscribed = await make_users(3, subscribe_news=False)
+    bots = await make_users(1, is_bot=True)
+    broadcast = await BroadcastService(db_session).create("Свежий урожай капусты")
+
+    assert await _runner(bot, session_maker).run_pending() == 1
+
+    expected = {u.telegram_id for u in subscribers} - {BLOCKED_CHAT}
+    assert set(api.delivered) == expected
+    assert all(count == 1 for count in api.delivered.values())
+    assert not {u.telegram_id for u in unsubscribed + bots} & set(api.delivered)
+
+    await db_session.refresh(broadcast)
+    assert broadcast.status == BroadcastStatus.COMPLETED
+    assert (broadcast.sent, broadcast.blocked, broadcast.failed) == (9, 1, 0)
+    assert broadcast.last_user_id == subscribers[-1].id
+    assert broadcast.finished_at is not None
+
+
+async def test_broadcast_with_expired_lease_resumes_after_cursor(bot_api, make_users, db_session, session_maker):
+    api, bot = bot_api
+    users = await make_users(8)
+    crashed = Broadcast(
+        text="Скидки",
+        status=BroadcastStatus.RUNNING.value,
+        last_user_id=users[5].id,
+        sent=5,
+        blocked=1,
+        started_at=datetime.now(timezone.utc) - timedelta(minutes=5),
+        lease_until=datetime.now(timezone.utc) - timedelta(seconds=1),
+    )
+    alive = Broadcast(
+        text="Идёт в другом процессе",
+        status=BroadcastStatus.RUNNING.value,
+        lease_until=datetime.now(timezone.utc) + timedelta(minutes=1),
+    )
+    db_session.add_all([crashed, alive])
+    await db_session.commit()
+
+    assert await _runner(bot, session_maker).run_pending() == 1
+
+    assert set(api.delivered) == {users[6].telegram_id, users[7].telegram_id}
+    await db_session.refresh(crashed)
+    await db_session.refresh(alive)
+    assert crashed.status == BroadcastStatus.COMPLETED
+    assert (crashed.sent, crashed.blocked) == (7, 1)
+    assert alive.status == BroadcastStatus.RUNNING and alive.sent == 0
+
+
+async def test_broadcast_stops_when_lease_is_taken_over(bot_api, make_users, db_session, session_maker):
+    api, bot = bot_api
+    users = await make_users(8)
+    broadcast = await BroadcastService(db_session).create("Перехвачена")
+    runner = _runner(bot, session_maker)
+    claimed = await runner.claim()
+    assert claimed.lease_owner
+
+    # Аренду забрал другой процесс (например, эта порция простояла на 429 дольше аренды)
+    broadcast.lease_owner = "other"
+    await db_session.commit()
+
+    await runner.run(claimed)
+    # Ушла только первая порция, дальше отправка остановлена
+    assert set(api.delivered) == {u.telegram_id for u in users[:4]} - {BLOCKED_CHAT}
+    await db_session.refresh(broadcast)
+    assert broadcast.status == BroadcastStatus.RUNNING and broadcast.lease_owner == "other"
+    assert (broadcast.sent, broadcast.last_user_id) == (0, 0)
+
+    runner.lease = timedelta(seconds=0.3)
+    lost = asyncio.Event()
+    await asyncio.wait_for(runner._keep_lease(claimed, lost), timeout=1)
+    assert lost.is_set()
+
+
+async def test_cancelled_broadcast_is_not_sent(bot_api, make_users, db_session, session_maker):
+    api, bot = bot_api
+    await make_users(3)
+    service = BroadcastService(db_session)
+    broadcast = await service.create("Отменено")
+    assert await service.cancel(broadcast.id)
+    assert not await service.cancel(broadcast.id)
+
+    assert await _runner(bot, session_maker).run_pending() == 0
+    assert not api.delivered
+
+
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    for _ in range(11):
+        await bucket.acquire()
+    assert time.monotonic() - started >= 0.18
+
+
+async def test_send_limiter_spaces_messages_to_one_chat():
+    limiter = SendLimiter(rate=1000, per_chat_interval=0.05)
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire(42)
+    await limiter.acquire(43)  # другой чат не ждёт
+    assert 0.09 <= time.monotonic() - started < 0.5
@@ -0,0 +1,49 @@
+import pytest
+
+from app.models.user import User
+from app.repositories.cart_repository import CartRepository
+from app.services.cart_service import CartService
+
+
+async def _fill_cart(session, user_id: int, product_ids: list[int]) -> None:
+    repo = CartRepository(session)
+    for pid in product_ids:
+        await repo.add_item(user_id, pid, 2)
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_get_cart_query_count_is_constant(db_session, make_products, query_counter) -> None:
+    product_ids = await make_products(31)
+    small, large = User(telegram_id=1), User(telegram_id=2)
+    db_session.add_all([small, large])
+    await db_session.commit()
+    await _fill_cart(db_session, small.id, product_ids[:1])
+    await _fill_cart(db_session, large.id, product_ids[1:])
+
+    svc = CartService(db_session)
+
+    query_counter.reset()
+    cart_small = await svc.get_cart(small.id)
+    small_queries = query_counter.count
+
+    query_counter.reset()
+    cart_large = await svc.get_cart(large.id)
+    large_queries = query_counter.count
+
+    assert len(cart_small.items) == 1
+    assert len(cart_large.items) == 30
+    assert cart_large.total == pytest.approx(30 * 2 * 10.0)
+    assert small_queries == large_queries == 1
+
+
+@pytest.mark.asyncio
+async def test_get_cart_without_cart_is_empty(db_session) -> None:
+    user = User(telegram_id=3)
+    db_session.add(user)
+    await db_session.commit()
+
+    cart = await CartService(db_session).get_cart(user.id)
+
+    assert cart.items == []
+    assert cart.total == 0
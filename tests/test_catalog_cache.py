@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import SnapshotCache, catalog_cache
+from app.models.catalog import Product
+from app.repositories.product_repository import ProductRepository
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_rebuild_once() -> None:
+    cache: SnapshotCache[int] = SnapshotCache("test", ttl_seconds=0)
+    builds = 0
+
+    async def build() -> list[int]:
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.01)
+        return [builds]
+
+    snapshots = await asyncio.gather(*(cache.get(build, lambda items: repr(items).encode()) for _ in range(50)))
+
+    assert builds == 1
+    assert {s.body for s in snapshots} == {b"[1]"}
+    assert cache.misses == 50 and cache.rebuilds == 1
+
+    assert (await cache.get(build, lambda items: b"")).value == [1]
+    assert cache.hits == 1
+
+    cache.invalidate()
+    assert (await cache.get(build, lambda items: b"")).value == [2]
+    assert cache.rebuilds == 2
+
+
+@pytest.mark.asyncio
+async def test_catalog_invalidated_only_after_commit(db_session, make_products) -> None:
+    [pid] = await make_products(1)
+    product = await db_session.get(Product, pid)
+    repo = ProductRepository(db_session)
+
+    version = catalog_cache.version
+    await repo.update(product, {"name": "renamed"})
+    assert catalog_cache.version == version
+    await db_session.rollback()
+    assert catalog_cache.version == version
+
+    product = await db_session.get(Product, pid)
+    await repo.update(product, {"name": "renamed"})
+    await db_session.commit()
+    assert catalog_cache.version == version + 1
@@ -0,0 +1,123 @@
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.models.catalog import Category, Price, Product, Unit
+from app.models.user import UserRole
+from app.schemas.user import UserMe
+from app.services.catalog_import import CatalogImportService
+
+
+@pytest.fixture
+async def refs(db_session):
+    category = Category(name="Овощи")
+    unit = Unit(name="килограмм", symbol="кг")
+    db_session.add_all([category, unit])
+    await db_session.commit()
+    return category, unit
+
+
+async def _prices(db_session, sku: str) -> list[tuple[Decimal, bool, Decimal | None]]:
+    res = await db_session.execute(
+        select(Price.price, Price.is_current, Price.old_price)
+        .join(Product, Product.id == Price.product_id)
+        .where(Product.sku == sku)
+        .order_by(Price.id)
+    )
+    return [tuple(r) for r in res.all()]
+
+
+async def test_csv_import_loads_valid_rows_and_reports_the_rest(api, as_user, db_session, refs):
+    category, unit = refs
+    as_user(UserMe(id=1, telegram_id=1, role=UserRole.MANAGER))
+    body = "\n".join([
+        "sku;name;category;unit;price;qty",
+        "A-1;Капуста;Овощи;кг;45,50;1000",
+        f"A-2;Морковь;{category.id};{unit.id};30;",
+        "A-3;Свёкла;Фрукты;кг;20;",
+        "A-4;Лук;Овощи;кг;дорого;",
+        "A-1;Капуста ещё раз;Овощи;кг;50;",
+        ";Без артикула;Овощи;кг;10;",
+    ]).encode()
+
+    r = await api.post("/products/import", files={"file": ("prices.csv", body, "text/csv")})
+    assert r.status_code == 200
+    result = r.json()
+    assert (result["rows"], result["created"], result["updated"], result["prices_changed"]) == (6, 2, 0, 2)
+    assert [(e["line"], e["error"].split(":")[0]) for e in result["errors"]] == [
+        (4, "категория не найдена"),
+        (5, "некорректная цена"),
+        (6, "sku A-1 уже был в строке 2"),
+        (7, "sku и name обязательны"),
+    ]
+    cabbage = await db_session.scalar(select(Product).where(Product.sku == "A-1"))
+    assert (cabbage.name, cabbage.category_id, cabbage.unit_id, cabbage.qty) == ("Капуста", category.id, unit.id, 1000)
+    assert await _prices(db_session, "A-1") == [(Decimal("45.50"), True, None)]
+
+    assert (await api.post("/products/import", files={"file": ("prices.xlsx", body)})).status_code == 400
+    no_price = "sku,name,category,unit\nA-9,Редис,Овощи,кг\n".encode()
+    r = await api.post("/products/import", files={"file": ("prices.csv", no_price)})
+    assert r.status_code == 400 and "price" in r.json()["detail"]
+
+
+async def test_reimport_updates_products_and_changes_only_different_prices(db_session, refs):
+    first = [
+        {"sku": f"S-{i}", "name": f"Товар {i}", "category": "овощи", "unit": "килограмм", "price": "10.00", "qty": 5}
+        for i in range(5)
+    ]
+    service = CatalogImportService(db_session, batch_size=2)
+    result = await service.import_stream(io.StringIO("\n".join(json.dumps(r) for r in first)), "jsonl")
+    assert (result.created, result.prices_changed, result.errors_total) == (5, 5, 0)
+
+    # Цена меняется только у S-0, остаток не указан — не трогаем
+    second = [{**r, "name": r["name"] + " (новый)", "qty": None} for r in first]
+    second[0]["price"] = 12.5
+    lines = [json.dumps(r) for r in second] + ["не json", "[1, 2]"]
+    result = await service.import_stream(io.StringIO("\n".join(lines)), "jsonl")
+    assert (result.created, result.updated, result.prices_changed, result.errors_total) == (0, 5, 1, 2)
+
+    assert await _prices(db_session, "S-0") == [
+        (Decimal("10.00"), False, None),
+        (Decimal("12.50"), True, Decimal("10.00")),
+    ]
+    assert await _prices(db_session, "S-1") == [(Decimal("10.00"), True, None)]
+    products = (await db_session.execute(
+        select(Product.name, Product.qty).where(Product.sku.like("S-%")).order_by(Product.sku)
+    )).all()
+    assert products[0] == ("Товар 0 (новый)", 5)
+
+
+async def test_import_query_count_does_not_depend_on_rows(db_session, refs, query_counter):
+    def csv_body(n: int, offset: int) -> io.StringIO:
+        rows = [f"Q-{offset + i},Товар {i},Овощи,кг,{10 + i}" for i in range(n)]
+        return io.StringIO("sku,name,category,unit,price\n" + "\n".join(rows))
+
+    service = CatalogImportService(db_session, batch_size=1000)
+
+    query_counter.reset()
+    await service.import_stream(csv_body(2, 0), "csv")
+    small = query_counter.count
+
+    query_counter.reset()
+    result = await service.import_stream(csv_body(300, 100), "csv")
+    large = query_counter.count
+
+    assert result.created == 300 and small == large
+
+
+async def test_product_api_rejects_duplicate_sku(api, as_user, refs):
+    category, unit = refs
+    as_user(UserMe(id=1, telegram_id=1, role=UserRole.MANAGER))
+    body = {"name": "Капуста", "category_id": category.id, "unit_id": unit.id, "qty": 0}
+
+    first = await api.post("/products", json={**body, "sku": "D-1"})
+    second = await api.post("/products", json={**body, "sku": "D-2"})
+    assert first.status_code == second.status_code == 201
+
+    r = await api.post("/products", json={**body, "sku": "D-1"})
+    assert r.status_code == 400 and "D-1" in r.json()["detail"]
+    assert (await api.put(f"/products/{second.json()['id']}", json={"sku": "D-1"})).status_code == 400
+    assert (await api.put(f"/products/{first.json()['id']}", json={"sku": "D-1", "name": "Капуста белая"})).status_code == 200
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import Settings
+from app.core.db import engine_options, make_engine, pool_stats, warm_up_pool
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_pgbouncer_mode_disables_prepared_statement_caches() -> None:
+    args = engine_options(Settings(db_pgbouncer=True))["connect_args"]
+    assert args["statement_cache_size"] == 0
+    assert args["prepared_statement_cache_size"] == 0
+    assert args["prepared_statement_name_func"]() != args["prepared_statement_name_func"]()
+
+
+@pytest.fixture
+async def small_engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    engine = make_engine(TEST_DATABASE_URL, Settings(db_pool_size=3, db_max_overflow=0))
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_pre_opens_connections(small_engine) -> None:
+    assert await warm_up_pool(5, small_engine) == 3
+    stats = pool_stats(small_engine)
+    assert stats["checked_in"] == 3 and stats["connects"] == 3
+
+    async with small_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    stats = pool_stats(small_engine)
+    assert stats["connects"] == 3
+    assert stats["checkouts"] == 4 and stats["checkins"] == 4
+
+
+@pytest.mark.asyncio
+async def test_pgbouncer_mode_runs_repeated_statements() -> None:
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    engine = make_engine(TEST_DATABASE_URL, Settings(db_pgbouncer=True))
+    try:
+        async with engine.connect() as conn:
+            for i in range(3):
+                assert (await conn.execute(text("SELECT CAST(:x AS integer)"), {"x": i})).scalar() == i
+    finally:
+        await engine.dispose()
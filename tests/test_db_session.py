@@ -0,0 +1,48 @@
+import logging
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import Settings
+from app.core.db import LeakDetector, make_engine, pool_stats, request_session
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+async def engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    engine = make_engine(TEST_DATABASE_URL, Settings(db_pool_size=2, db_max_overflow=0))
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_connection_is_checked_out_lazily_and_returned_on_exit(engine) -> None:
+    factory = async_sessionmaker(engine)
+    async with request_session("GET /lazy", factory) as session:
+        assert pool_stats(engine)["checked_out"] == 0
+        await session.execute(text("SELECT 1"))
+        assert pool_stats(engine)["checked_out"] == 1
+    assert pool_stats(engine)["checked_out"] == 0
+
+
+@pytest.mark.asyncio
+async def test_leak_detector_reports_connection_outliving_request(engine, caplog) -> None:
+    detector = LeakDetector()
+    detector.install(engine)
+    factory = async_sessionmaker(engine)
+
+    caplog.set_level(logging.WARNING, logger="app.core.db")
+    async with request_session("GET /leaky", factory, detector) as session:
+        await session.execute(text("SELECT 1"))
+        leaked = await engine.connect()
+        await leaked.execute(text("SELECT 1"))
+
+    assert detector.leaks == 1
+    message = next(r.getMessage() for r in caplog.records if "GET /leaky" in r.getMessage())
+    assert "tests/test_db_session.py" in message
+    await leaked.close()
@@ -0,0 +1,101 @@
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+from app.services.file_service import FileService, detect_image_extension, object_path
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200_000
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8 "
+
+
+@pytest.fixture
+def media_root(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    return tmp_path
+
+
+def _upload(content: bytes, filename: str, size: int | None = None) -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename, size=size)
+
+
+def test_format_is_detected_by_magic_bytes() -> None:
+    assert detect_image_extension(PNG[:12]) == ".png"
+    assert detect_image_extension(JPEG[:12]) == ".jpg"
+    assert detect_image_extension(WEBP[:12]) == ".webp"
+    assert detect_image_extension(b"RIFF\x00\x00\x00\x00WAVE") is None
+    assert detect_image_extension(b"<html>") is None
+
+
+@pytest.mark.asyncio
+async def test_upload_is_addressed_by_content(media_root) -> None:
+    files = FileService()
+    # Расширение в имени не совпадает с содержимым — берётся по сигнатуре
+    first = await files.stage_upload(_upload(PNG, "photo.jpg"))
+    await files.publish(first)
+    again = await files.stage_upload(_upload(PNG, "copy.png"))
+    await files.publish(again)
+
+    assert first.file_path == again.file_path == object_path(hashlib.sha256(PNG).hexdigest(), ".png")
+    assert (media_root / first.file_path).read_bytes() == PNG
+    assert list((media_root / ".incoming").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_rejects_non_image_and_oversized_without_leftovers(media_root, monkeypatch) -> None:
+    files = FileService()
+    with pytest.raises(HTTPException) as e:
+        await files.stage_upload(_upload(b"#!/bin/sh\necho pwned", "evil.png"))
+    assert e.value.status_code == 400
+
+    monkeypatch.setattr(settings, "max_upload_size_mb", 0.1)
+    # Размер не объявлен клиентом — лимит срабатывает во время чтения
+    with pytest.raises(HTTPException, match="слишком большой"):
+        await files.stage_upload(_upload(PNG, "big.png", size=None))
+    assert list((media_root / ".incoming").iterdir()) == []
+
+    await files.delete("objects/ab/missing.png")  # отсутствующий файл — не ошибка
+
+
+def test_variants_are_rendered_without_upscaling(media_root) -> None:
+    from PIL import Image
+
+    from app.services.image_variants import render_variants
+
+    (media_root / "products" / "3").mkdir(parents=True)
+    Image.new("RGBA", (800, 400), (0, 128, 0, 128)).save(media_root / "products/3/a.png")
+
+    assert render_variants(str(media_root), "products/3/a.png", [1080, 160], 80) == [160, 1080]
+    with Image.open(media_root / "products/3/a_w160.webp") as small:
+        assert small.size == (160, 80)
+    with Image.open(media_root / "products/3/a_w1080.jpg") as large:
+        assert large.size == (800, 400) and large.mode == "RGB"
+
+    urls = FileService().variant_urls("products/3/a.png", [160, 1080])
+    assert urls["webp"][160] == f"{settings.media_url_prefix}/products/3/a_w160.webp"
+    assert urls["jpeg"][1080] == f"{settings.media_url_prefix}/products/3/a_w1080.jpg"
+    assert FileService().variant_urls("products/3/a.png", None) is None
+
+
+def test_failed_variant_leaves_no_temp_file(media_root, monkeypatch) -> None:
+    from PIL import Image
+
+    from app.services.image_variants import render_variants
+
+    (media_root / "products" / "4").mkdir(parents=True)
+    Image.new("RGB", (400, 200)).save(media_root / "products/4/a.png")
+
+    save = Image.Image.save
+
+    def broken_save(self, fp, format=None, **params):
+        save(self, fp, format, **params)
+        if format == "JPEG":
+            raise OSError("диск заполнен")
+
+    monkeypatch.setattr(Image.Image, "save", broken_save)
+    with pytest.raises(OSError):
+        render_variants(str(media_root), "products/4/a.png", [160], 80)
+    assert sorted(p.name for p in (media_root / "products/4").iterdir()) == ["a.png", "a_w160.webp"]
@@ -0,0 +1,122 @@
+import asyncio
+import os
+
+import pytest
+from aiohttp import web
+
+from app.core.config import settings
+from app.core.leader import LeaderElection
+from app.telegram.bot import create_bot
+from app.telegram.lifecycle import ensure_webhook
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+
+def _election() -> LeaderElection:
+    return LeaderElection("test-role", url=TEST_DATABASE_URL, retry_interval=0.05, check_interval=0.05)
+
+
+async def _wait_for(condition, timeout: float = 5.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def test_only_one_process_leads_and_follower_takes_over(db_engine):
+    leading: list[str] = []
+
+    def lead(name: str):
+        async def _lead() -> None:
+            leading.append(name)
+            try:
+                await asyncio.Event().wait()
+            finally:
+                leading.remove(name)
+
+        return _lead
+
+    first, second = _election(), _election()
+    tasks = {
+        "first": asyncio.create_task(first.run(lead("first"))),
+        "second": asyncio.create_task(second.run(lead("second"))),
+    }
+    await _wait_for(lambda: leading)
+    await asyncio.sleep(0.3)  # несколько попыток ведомого
+    assert len(leading) == 1
+    winner = leading[0]
+    follower = "second" if winner == "first" else "first"
+
+    # Лидер «упал» — его соединение закрыто, ведомый забирает роль
+    tasks[winner].cancel()
+    await asyncio.gather(tasks[winner], return_exceptions=True)
+    await _wait_for(lambda: leading == [follower])
+
+    tasks[follower].cancel()
+    await asyncio.gather(tasks[follower], return_exceptions=True)
+
+
+async def test_failed_leader_task_releases_lock(db_engine):
+    calls = 0
+
+    async def crash() -> None:
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("boom")
+
+    election = _election()
+    task = asyncio.create_task(election.run(crash))
+    await _wait_for(lambda: calls >= 2)  # блокировка отпущена и снова получена
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+class FakeWebhookApi:
+    def __init__(self) -> None:
+        self.url = ""
+        self.set_calls = 0
+
+    async def get_webhook_info(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "ok": True,
+            "result": {"url": self.url, "has_custom_certificate": False, "pending_update_count": 0},
+        })
+
+    async def set_webhook(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        self.url = data["url"]
+        self.set_calls += 1
+        return web.json_response({"ok": True, "result": True})
+
+
+@pytest.fixture
+async def webhook_api(monkeypatch):
+    api = FakeWebhookApi()
+    app = web.Application()
+    app.router.add_post(f"/bot{TOKEN}/getWebhookInfo", api.get_webhook_info)
+    app.router.add_post(f"/bot{TOKEN}/setWebhook", api.set_webhook)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "telegram_api_base", f"http://127.0.0.1:{port}")
+    bot = create_bot(TOKEN)
+    yield api, bot
+    await bot.session.close()
+    await runner.cleanup()
+
+
+async def test_webhook_is_registered_only_when_changed(webhook_api, session_maker):
+    api, bot = webhook_api
+    url = "https://example.com/telegram/webhook"
+
+    assert await ensure_webhook(bot, url, "s1", session_maker)
+    assert not await ensure_webhook(bot, url, "s1", session_maker)
+    assert api.set_calls == 1
+
+    assert await ensure_webhook(bot, url, "s2", session_maker)  # новый секрет
+    api.url = ""  # webhook сняли вручную
+    assert await ensure_webhook(bot, url, "s2", session_maker)
+    assert not await ensure_webhook(bot, url, "s2", session_maker)
+    assert api.set_calls == 3
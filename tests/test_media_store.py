@@ -0,0 +1,129 @@
+import io
+
+import pytest
+from fastapi import UploadFile
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from app.api.http_cache import IMMUTABLE_CACHE_CONTROL, MediaFiles
+from app.core.config import settings
+from app.models.catalog import MediaFile, ProductImage
+from app.services import media_migration
+from app.services.product_service import ProductService
+
+
+@pytest.fixture
+def media_root(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "media_root", str(tmp_path))
+    monkeypatch.setattr(settings, "image_variant_widths", [16])
+    return tmp_path
+
+
+def _png(color: tuple[int, int, int]) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 24), color).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _upload(content: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename="photo.png", size=len(content))
+
+
+@pytest.mark.asyncio
+async def test_same_photo_is_stored_once_and_removed_with_last_reference(
+    media_root, db_session, make_products
+) -> None:
+    first_id, second_id = await make_products(2)
+    service = ProductService(db_session)
+    photo = _png((10, 200, 10))
+
+    a = await service.upload_product_image(first_id, _upload(photo), is_primary=True)
+    b = await service.upload_product_image(second_id, _upload(photo))
+    assert a.file_path == b.file_path and a.file_path.startswith("objects/")
+    assert a.variants is not None and 16 in a.variants.webp
+    assert (await db_session.get(MediaFile, a.file_path)).refcount == 2
+
+    await service.delete_product_image(a.id)
+    assert (media_root / b.file_path).exists()  # второй товар всё ещё ссылается на файл
+
+    await service.delete_product_image(b.id)
+    assert not (media_root / b.file_path).exists()
+    assert not list(media_root.glob("objects/*/*"))
+    db_session.expunge_all()
+    assert await db_session.get(MediaFile, b.file_path) is None
+
+
+@pytest.mark.asyncio
+async def test_deleting_product_releases_its_images(media_root, db_session, make_products) -> None:
+    first_id, second_id = await make_products(2)
+    service = ProductService(db_session)
+    shared, own = _png((200, 10, 10)), _png((10, 10, 200))
+    await service.upload_product_image(first_id, _upload(shared))
+    own_img = await service.upload_product_image(first_id, _upload(own))
+    kept = await service.upload_product_image(second_id, _upload(shared))
+
+    await service.delete_product(first_id)
+
+    assert not (media_root / own_img.file_path).exists()
+    assert (media_root / kept.file_path).exists()
+    db_session.expunge_all()
+    assert await db_session.get(MediaFile, own_img.file_path) is None
+    assert (await db_session.get(MediaFile, kept.file_path)).refcount == 1
+    with pytest.raises(ValueError):
+        await service.delete_product(first_id)
+
+
+@pytest.mark.asyncio
+async def test_failed_upload_removes_published_file(media_root, db_session) -> None:
+    service = ProductService(db_session)
+    with pytest.raises(IntegrityError):
+        await service.upload_product_image(999_999, _upload(_png((1, 2, 3))))  # товара нет — запись не создаётся
+
+    assert not list(media_root.glob("objects/*/*"))
+    assert not list(media_root.glob(".incoming/*"))
+    assert (await db_session.scalar(select(func.count()).select_from(MediaFile))) == 0
+
+
+@pytest.mark.asyncio
+async def test_legacy_files_are_moved_into_the_store(media_root, db_session, session_maker, make_products) -> None:
+    (product_id,) = await make_products(1)
+    photo = _png((200, 10, 10))
+    for name in ("a.png", "b.png"):
+        (media_root / "products" / str(product_id)).mkdir(parents=True, exist_ok=True)
+        (media_root / "products" / str(product_id) / name).write_bytes(photo)
+        db_session.add(ProductImage(product_id=product_id, file_path=f"products/{product_id}/{name}"))
+    db_session.add(ProductImage(product_id=product_id, file_path=f"products/{product_id}/gone.png"))
+    await db_session.commit()
+
+    assert await media_migration.migrate(factory=session_maker) == 2
+    assert await media_migration.migrate(factory=session_maker) == 0  # повторный запуск ничего не делает
+
+    db_session.expunge_all()
+    paths = {img.file_path for img in (await db_session.execute(ProductImage.__table__.select())).all()}
+    moved = {p for p in paths if p.startswith("objects/")}
+    assert len(moved) == 1 and f"products/{product_id}/gone.png" in paths
+    assert (await db_session.get(MediaFile, moved.pop())).refcount == 2
+    assert not list((media_root / "products" / str(product_id)).iterdir())
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_media_is_cached_forever(tmp_path) -> None:
+    digest = "ab" * 32
+    (tmp_path / "objects" / "ab").mkdir(parents=True)
+    (tmp_path / "objects" / "ab" / f"{digest}_w16.webp").write_bytes(b"RIFF")
+    (tmp_path / "legacy.png").write_bytes(b"png")
+    app = Starlette(routes=[Mount("/media", MediaFiles(directory=str(tmp_path)))])
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        obj = await ac.get(f"/media/objects/ab/{digest}_w16.webp")
+        cached = await ac.get(f"/media/objects/ab/{digest}_w16.webp", headers={"If-None-Match": obj.headers["etag"]})
+        legacy = await ac.get("/media/legacy.png")
+
+    assert obj.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert obj.headers["etag"] == f'"{digest}_w16"'
+    assert cached.status_code == 304
+    assert "cache-control" not in legacy.headers
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+from aiogram import Dispatcher, Router
+from aiogram.filters import Command
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.metrics import _after_cursor_execute, _before_cursor_execute, install_db_metrics
+from app.main import app
+from app.telegram.middlewares import HandlerMetricsMiddleware, install_metrics
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _sample(body: str, prefix: str) -> float:
+    line = next(line for line in body.splitlines() if line.startswith(prefix))
+    return float(line.rsplit(" ", 1)[1])
+
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_template_not_raw_path() -> None:
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/health/ping")
+        await ac.get("/no/such/path/123")
+        body = (await ac.get("/metrics")).text
+
+    assert 'http_requests_total{method="GET",route="/health/ping",status="200"}' in body
+    assert 'route="<unmatched>",status="404"' in body
+    assert "/no/such/path/123" not in body
+    assert 'http_request_duration_seconds_bucket{le="+Inf",method="GET",route="/health/ping"}' in body
+    assert _sample(body, "http_requests_in_flight") == 1  # сам запрос /metrics
+    assert 'cache_hits_total{cache="catalog"}' in body
+    assert 'db_pool_size{engine="primary"}' in body
+
+
+def _run_process(directory, code: str) -> str:
+    """Выполнить код в отдельном процессе с общим каталогом метрик и вернуть его stdout."""
+    env = {**os.environ, "METRICS_MULTIPROC_DIR": str(directory)}
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    script = "from app.core import metrics\n" + code
+    done = subprocess.run(
+        [sys.executable, "-c", script], env=env, cwd=ROOT, capture_output=True, text=True, timeout=60, check=True
+    )
+    return done.stdout
+
+
+def test_counters_and_live_gauges_merge_across_processes(tmp_path) -> None:
+    worker = textwrap.dedent("""
+        metrics.http_requests.labels("GET", "/x", "200").inc({n})
+        metrics.http_request_duration.labels("GET", "/x").observe(0.3)
+        metrics.http_in_flight.inc()
+        metrics.leader.labels("bot").set({leader})
+    """)
+    _run_process(tmp_path, worker.format(n=2, leader=1) + "metrics.stop_metrics()")  # завершился штатно
+    _run_process(tmp_path, worker.format(n=3, leader=0))  # остался «живым»: gauge учитываются
+    body = _run_process(tmp_path, "print(metrics.exposition().decode())")
+
+    assert 'http_requests_total{method="GET",route="/x",status="200"} 5.0' in body
+    assert 'http_request_duration_seconds_bucket{le="0.5",method="GET",route="/x"} 2.0' in body
+    assert _sample(body, "http_requests_in_flight ") == 1
+    assert _sample(body, 'leader{role="bot"}') == 0
+    assert 'cache_hits_total{cache="catalog"}' in body
+
+
+@pytest.mark.asyncio
+async def test_failed_statement_does_not_skew_query_timing(db_engine) -> None:
+    install_db_metrics(db_engine)
+    try:
+        before = REGISTRY.get_sample_value("db_query_duration_seconds_count") or 0
+        async with db_engine.connect() as conn:
+            with pytest.raises(DBAPIError):
+                await conn.execute(text("SELECT 1 / 0"))
+            await conn.rollback()
+            await conn.execute(text("SELECT 1"))
+            assert not any("start" in str(key) for key in conn.sync_connection.info)
+        assert REGISTRY.get_sample_value("db_query_duration_seconds_count") == before + 1
+    finally:
+        event.remove(db_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(db_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@pytest.mark.asyncio
+async def test_bot_handler_latency_is_labelled_by_handler() -> None:
+    router = Router()
+
+    @router.message(Command("ping"))
+    async def ping_handler(message) -> None:
+        return None
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    install_metrics(dp)
+    assert any(isinstance(m, HandlerMetricsMiddleware) for m in dp.message.middleware)
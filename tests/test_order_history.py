@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app.models.order import Order
+from app.models.user import User, UserRole
+from app.schemas.order import OrderCreate, OrderItemIn
+from app.services.order_service import OrderService
+
+
+@pytest.fixture
+async def customers(db_session):
+    users = [User(telegram_id=50), User(telegram_id=51), User(telegram_id=52, role=UserRole.MANAGER.value)]
+    db_session.add_all(users)
+    await db_session.commit()
+    return users
+
+
+async def _orders(db_session, user: User, product_ids: list[int], n: int, *, items: int = 1) -> list[int]:
+    """Создать n заказов с разными датами (старые первыми)."""
+    service = OrderService(db_session)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    ids = []
+    for i in range(n):
+        data = OrderCreate(
+            items=[OrderItemIn(product_id=pid, quantity=1) for pid in product_ids[:items]], delivery_type="pickup"
+        )
+        order = await service.create_order(user=user, data=data)
+        # Две пары заказов с одинаковой датой: порядок внутри пары задаёт id
+        await db_session.execute(
+            update(Order).where(Order.id == order.id).values(order_date=base + timedelta(hours=i // 2))
+        )
+        ids.append(order.id)
+    await db_session.commit()
+    return ids
+
+
+async def test_customer_pages_through_own_orders_newest_first(api, as_user, db_session, customers, make_products):
+    alice, bob, _ = customers
+    pids = await make_products(2)
+    mine = await _orders(db_session, alice, pids, 5, items=2)
+    await _orders(db_session, bob, pids, 2)
+
+    as_user(alice)
+    seen, cursor = [], None
+    while True:
+        r = await api.get("/orders", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        page = r.json()
+        seen += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [o["id"] for o in seen] == list(reversed(mine))
+    assert all(o["user_id"] == alice.id and len(o["items"]) == 2 for o in seen)
+    assert (await api.get("/orders", params={"cursor": "garbage"})).status_code == 400
+
+
+async def test_order_list_query_count_does_not_depend_on_page_size(db_session, customers, make_products, query_counter):
+    alice = customers[0]
+    pids = await make_products(3)
+    await _orders(db_session, alice, pids, 12, items=3)
+    service = OrderService(db_session)
+
+    query_counter.reset()
+    small = await service.list_orders(limit=1, user_id=alice.id)
+    small_queries = query_counter.count
+
+    query_counter.reset()
+    large = await service.list_orders(limit=10, user_id=alice.id)
+    large_queries = query_counter.count
+
+    assert len(small.items) == 1 and len(large.items) == 10
+    assert small_queries == large_queries == 2  # заказы + позиции всех заказов страницы
+
+
+async def test_get_order_is_limited_to_owner_and_managers(api, as_user, db_session, customers, make_products):
+    alice, bob, manager = customers
+    pids = await make_products(1)
+    [order_id] = await _orders(db_session, alice, pids, 1)
+
+    as_user(alice)
+    r = await api.get(f"/orders/{order_id}")
+    assert r.status_code == 200
+    assert r.json()["items"] == [{"product_id": pids[0], "quantity": 1.0, "price": 10.0}]
+
+    as_user(bob)
+    assert (await api.get(f"/orders/{order_id}")).status_code == 404
+    assert (await api.get("/orders/all")).status_code == 403
+
+    as_user(manager)
+    assert (await api.get(f"/orders/{order_id}")).status_code == 200
+    r = await api.get("/orders/all", params={"user_id": alice.id, "status": "created"})
+    assert [o["id"] for o in r.json()["items"]] == [order_id]
+    assert (await api.get("/orders/all", params={"status": "cancelled"})).json()["items"] == []
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import select
+
+from app.models.catalog import Product
+from app.models.user import User
+from app.repositories.order_repository import OrderRepository
+
+
+async def _create(session, user_id: int, items: list[tuple[int, int]]):
+    order = await OrderRepository(session).create_order(
+        user_id=user_id, items=items, delivery_type="pickup", address_id=None, payment_method=None,
+    )
+    await session.commit()
+    return order
+
+
+@pytest.mark.asyncio
+async def test_create_order_query_count_is_constant(db_session, make_products, query_counter) -> None:
+    product_ids = await make_products(21, qty=100)
+    user = User(telegram_id=10)
+    db_session.add(user)
+    await db_session.commit()
+
+    query_counter.reset()
+    await _create(db_session, user.id, [(product_ids[0], 5)])
+    small_queries = query_counter.count
+
+    query_counter.reset()
+    order = await _create(db_session, user.id, [(pid, 5) for pid in product_ids[1:]])
+    large_queries = query_counter.count
+
+    assert small_queries == large_queries
+    assert len(order.items) == 20
+    assert float(order.total_amount) == pytest.approx(20 * 5 * 10.0)
+
+
+@pytest.mark.asyncio
+async def test_create_order_decrements_stock_for_repeated_product(db_session, make_products) -> None:
+    [pid] = await make_products(1, qty=100)
+    user = User(telegram_id=11)
+    db_session.add(user)
+    await db_session.commit()
+
+    await _create(db_session, user.id, [(pid, 30), (pid, 20)])
+
+    qty = (await db_session.execute(select(Product.qty).where(Product.id == pid))).scalar_one()
+    assert qty == 50
+
+    with pytest.raises(ValueError):
+        await _create(db_session, user.id, [(pid, 40), (pid, 20)])
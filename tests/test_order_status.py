@@ -0,0 +1,150 @@
+import pytest
+from aiohttp import web
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.catalog import Product
+from app.models.notification import Notification
+from app.models.order import Order, OrderStatus, ReservationStatus, StockReservation
+from app.models.user import User, UserRole
+from app.schemas.order import OrderCreate, OrderItemIn
+from app.services.notification_service import NotificationSender
+from app.services.order_service import OrderService
+from app.telegram.bot import create_bot
+from app.telegram.rate_limit import SendLimiter
+
+TOKEN = "42:notifications"
+
+
+@pytest.fixture
+async def users(db_session):
+    users = [User(telegram_id=60), User(telegram_id=61), User(telegram_id=62, role=UserRole.MANAGER.value)]
+    db_session.add_all(users)
+    await db_session.commit()
+    return users
+
+
+async def _order(db_session, user: User, pid: int, payment_method: str | None = None) -> int:
+    data = OrderCreate(items=[OrderItemIn(product_id=pid, quantity=3)], delivery_type="pickup", payment_method=payment_method)
+    return (await OrderService(db_session).create_order(user=user, data=data)).id
+
+
+async def _change(client: AsyncClient, order_ids: list[int], status: str):
+    return await client.post("/orders/status", json={"order_ids": order_ids, "status": status})
+
+
+async def test_bulk_transition_skips_invalid_orders_and_notifies_each_user_once(api, as_user, db_session, users, make_products):
+    alice, bob, manager = users
+    [pid] = await make_products(1, qty=100)
+    alices = [await _order(db_session, alice, pid) for _ in range(3)]
+    bobs = await _order(db_session, bob, pid)
+    unpaid_prepaid = await _order(db_session, bob, pid, payment_method="yookassa")
+
+    as_user(alice)
+    assert (await _change(api, alices, "assembling")).status_code == 403
+
+    as_user(manager)
+    r = await _change(api, [*alices, bobs, unpaid_prepaid, 999_999, alices[0]], "assembling")
+    assert r.status_code == 200
+    assert r.json() == {
+        "updated": sorted([*alices, bobs]),
+        "skipped": [{"id": unpaid_prepaid, "status": "created"}, {"id": 999_999, "status": None}],
+    }
+    notifications = (await db_session.execute(
+        select(Notification.user_id, Notification.text).order_by(Notification.user_id)
+    )).all()
+    assert [user_id for user_id, _ in notifications] == [alice.id, bob.id]
+    assert all(f"№{order_id}" in notifications[0].text for order_id in alices)
+    assert notifications[1].text == f"Заказ №{bobs}: собирается"
+
+    # Повтор того же перехода ничего не меняет; перескочить через статус нельзя
+    r = await _change(api, alices, "assembling")
+    assert r.json()["updated"] == [] and {s["status"] for s in r.json()["skipped"]} == {"assembling"}
+    assert (await _change(api, [unpaid_prepaid], "completed")).json()["updated"] == []
+    assert (await _change(api, alices, "created")).status_code == 400
+
+
+async def test_completion_and_cancellation_settle_reservations(api, as_user, db_session, users, make_products):
+    alice, _, manager = users
+    [pid] = await make_products(1, qty=100)
+    kept, cancelled = await _order(db_session, alice, pid), await _order(db_session, alice, pid)
+    as_user(manager)
+
+    assert (await _change(api, [kept, cancelled], "assembling")).json()["updated"] == sorted([kept, cancelled])
+    assert (await _change(api, [cancelled], "cancelled")).json()["updated"] == [cancelled]
+    assert (await _change(api, [kept], "delivering")).json()["updated"] == [kept]
+    assert (await _change(api, [kept, cancelled], "completed")).json()["updated"] == [kept]
+
+    reservations = dict((await db_session.execute(
+        select(StockReservation.order_id, StockReservation.status).where(StockReservation.order_id.in_([kept, cancelled]))
+    )).all())
+    assert reservations == {kept: ReservationStatus.COMMITTED, cancelled: ReservationStatus.RELEASED}
+    assert await db_session.scalar(select(Product.qty).where(Product.id == pid)) == 97
+
+
+async def test_transition_query_count_does_not_depend_on_batch_size(db_session, users, make_products, query_counter):
+    alice, bob, _ = users
+    [pid] = await make_products(1, qty=1000)
+    orders = [await _order(db_session, user, pid) for user in (alice, bob) * 10]
+    service = OrderService(db_session)
+
+    query_counter.reset()
+    await service.change_status(order_ids=orders[:1], status=OrderStatus.CANCELLED)
+    small = query_counter.count
+
+    query_counter.reset()
+    result = await service.change_status(order_ids=orders[1:], status=OrderStatus.CANCELLED)
+    large = query_counter.count
+
+    assert len(result.updated) == 19 and small == large
+
+
+@pytest.fixture
+async def bot_api(monkeypatch):
+    delivered: list[tuple[int, str]] = []
+
+    async def send_message(request: web.Request) -> web.Response:
+        data = await request.post()
+        chat_id = int(data["chat_id"])
+        if chat_id == 61:
+            return web.json_response(
+                {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}, status=403
+            )
+        delivered.append((chat_id, data["text"]))
+        return web.json_response({
+            "ok": True,
+            "result": {"message_id": len(delivered), "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": data["text"]},
+        })
+
+    server = web.Application()
+    server.router.add_post(f"/bot{TOKEN}/sendMessage", send_message)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "telegram_api_base", f"http://127.0.0.1:{port}")
+    bot = create_bot(TOKEN)
+    yield delivered, bot
+    await bot.session.close()
+    await runner.cleanup()
+
+
+async def test_notifications_are_sent_once(db_session, session_maker, users, make_products, bot_api):
+    delivered, bot = bot_api
+    alice, bob, _ = users
+    [pid] = await make_products(1)
+    orders = [await _order(db_session, alice, pid), await _order(db_session, alice, pid), await _order(db_session, bob, pid)]
+    await OrderService(db_session).change_status(order_ids=orders, status=OrderStatus.ASSEMBLING)
+
+    sender = NotificationSender(bot, factory=session_maker, limiter=SendLimiter(1000, 0))
+    assert await sender.send_pending() == 2
+    assert await sender.send_pending() == 0
+
+    assert delivered == [(60, f"Заказы №{orders[0]}, №{orders[1]}: статус «собирается»")]
+    results = dict((await db_session.execute(
+        select(Notification.user_id, Notification.result).where(Notification.sent_at.is_not(None))
+    )).all())
+    assert results == {alice.id: "sent", bob.id: "blocked"}
+    assert (await db_session.scalar(select(Order.status).where(Order.id == orders[2]))) == "assembling"
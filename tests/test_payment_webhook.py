@@ -0,0 +1,211 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiohttp import web
+from httpx import AsyncClient
+from sqlalchemy import func, select, update
+
+from app.core.config import YooKassaSettings, settings
+from app.models.catalog import Product
+from app.models.order import Order, OrderStatus, ReservationStatus, StockReservation
+from app.models.payment import PaymentEvent
+from app.models.user import User
+from app.schemas.order import OrderCreate, OrderItemIn
+from app.services.order_service import OrderService
+from app.services.payment_inbox import PaymentEventProcessor
+from app.services.payments import YooKassaClient
+
+
+class MockYooKassa:
+    """Локальная ЮKassa: GET /v3/payments/{id} отдаёт заданное состояние платежа."""
+
+    def __init__(self) -> None:
+        self.payments: dict[str, dict] = {}
+        self.down = False
+        self.gets = 0
+
+    async def get(self, request: web.Request) -> web.Response:
+        self.gets += 1
+        if self.down:
+            return web.json_response({"type": "error"}, status=503)
+        payment = self.payments.get(request.match_info["payment_id"])
+        if payment is None:
+            return web.json_response({"type": "error", "code": "not_found"}, status=404)
+        return web.json_response(payment)
+
+
+@pytest.fixture
+async def yookassa():
+    mock = MockYooKassa()
+    server = web.Application()
+    server.router.add_get("/v3/payments/{payment_id}", mock.get)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    client = YooKassaClient(YooKassaSettings(
+        shop_id="shop", secret_key="secret", api_url=f"http://127.0.0.1:{port}/v3", retries=0, breaker_failures=100,
+    ))
+    yield mock, client
+    await client.aclose()
+    await runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def _webhook_secret(monkeypatch):
+    monkeypatch.setattr(settings.yookassa, "webhook_secret", "hook-secret")
+
+
+@pytest.fixture
+async def prepaid_order(db_session, make_products):
+    [pid] = await make_products(1, qty=10, price="12.50")
+    user = User(telegram_id=40)
+    db_session.add(user)
+    await db_session.commit()
+    order = await OrderService(db_session).create_order(
+        user=user,
+        data=OrderCreate(items=[OrderItemIn(product_id=pid, quantity=2)], delivery_type="pickup", payment_method="yookassa"),
+    )
+    await db_session.execute(update(Order).where(Order.id == order.id).values(payment_id="pay-1"))
+    await db_session.commit()
+    return order.id, pid
+
+
+def _notification(event: str, payment_id: str = "pay-1", order_id: int = 1) -> dict:
+    return {
+        "type": "notification",
+        "event": event,
+        "object": {"id": payment_id, "status": event.split(".")[1], "metadata": {"order_id": str(order_id)}},
+    }
+
+
+def _payment(status: str, order_id: int, value: str = "25.00") -> dict:
+    return {
+        "id": "pay-1",
+        "status": status,
+        "amount": {"value": value, "currency": "RUB"},
+        "metadata": {"order_id": str(order_id)},
+    }
+
+
+async def _post(api: AsyncClient, body: dict, token: str | None = "hook-secret"):
+    params = {"token": token} if token else {}
+    return await api.post("/payments/yookassa/callback", json=body, params=params)
+
+
+async def test_callback_requires_token_and_stores_each_event_once(api, db_session):
+    assert (await _post(api, _notification("payment.succeeded"), token=None)).status_code == 403
+    assert (await _post(api, _notification("payment.succeeded"), token="wrong")).status_code == 403
+    assert (await _post(api, {"type": "notification", "event": "payment.succeeded"})).status_code == 400
+
+    # Шлюз повторяет одно и то же уведомление
+    responses = [await _post(api, _notification("payment.succeeded")) for _ in range(5)]
+    assert all(r.status_code == 200 for r in responses)
+    assert (await _post(api, _notification("payment.waiting_for_capture"))).status_code == 200
+
+    rows = (await db_session.execute(select(PaymentEvent.event).order_by(PaymentEvent.event))).scalars().all()
+    assert rows == ["payment.succeeded", "payment.waiting_for_capture"]
+
+
+async def test_succeeded_payment_marks_order_paid_once(api, db_session, session_maker, yookassa, prepaid_order):
+    mock, client = yookassa
+    order_id, _ = prepaid_order
+    mock.payments["pay-1"] = _payment("succeeded", order_id)
+    for _ in range(3):
+        await _post(api, _notification("payment.succeeded", order_id=order_id))
+
+    processor = PaymentEventProcessor(factory=session_maker, client=client)
+    assert await asyncio.gather(processor.process_pending(), processor.process_pending()) in ([1, 0], [0, 1])
+    assert mock.gets == 1
+
+    order = await db_session.get(Order, order_id, populate_existing=True)
+    assert order.is_paid and order.status == OrderStatus.CREATED
+    statuses = (await db_session.execute(
+        select(StockReservation.status).where(StockReservation.order_id == order_id)
+    )).scalars().all()
+    assert statuses == [ReservationStatus.COMMITTED]
+    event = await db_session.get(PaymentEvent, ("pay-1", "payment.succeeded"), populate_existing=True)
+    assert event.result == "paid" and event.processed_at is not None
+    assert await processor.process_pending() == 0
+
+
+async def test_canceled_payment_cancels_order_and_returns_stock(api, db_session, session_maker, yookassa, prepaid_order):
+    mock, client = yookassa
+    order_id, pid = prepaid_order
+    mock.payments["pay-1"] = _payment("canceled", order_id)
+    await _post(api, _notification("payment.canceled", order_id=order_id))
+
+    await PaymentEventProcessor(factory=session_maker, client=client).process_pending()
+
+    order = await db_session.get(Order, order_id, populate_existing=True)
+    assert order.status == OrderStatus.CANCELLED and not order.is_paid
+    assert await db_session.scalar(select(Product.qty).where(Product.id == pid)) == 10
+
+
+async def test_notification_is_verified_against_the_api(api, db_session, session_maker, yookassa, prepaid_order):
+    mock, client = yookassa
+    order_id, _ = prepaid_order
+    # Уведомление утверждает, что оплачено, но в ЮKassa платёж на другую сумму
+    mock.payments["pay-1"] = _payment("succeeded", order_id, value="1.00")
+    await _post(api, _notification("payment.succeeded", order_id=order_id))
+
+    await PaymentEventProcessor(factory=session_maker, client=client).process_pending()
+
+    assert not (await db_session.get(Order, order_id, populate_existing=True)).is_paid
+    event = await db_session.get(PaymentEvent, ("pay-1", "payment.succeeded"), populate_existing=True)
+    assert event.result == "amount_mismatch"
+
+
+async def test_gateway_outage_postpones_event(api, db_session, session_maker, yookassa, prepaid_order):
+    mock, client = yookassa
+    order_id, _ = prepaid_order
+    mock.down = True
+    await _post(api, _notification("payment.succeeded", order_id=order_id))
+    processor = PaymentEventProcessor(factory=session_maker, client=client)
+
+    assert await processor.process_pending() == 1
+    event = await db_session.get(PaymentEvent, ("pay-1", "payment.succeeded"), populate_existing=True)
+    assert event.processed_at is None and event.attempts == 1 and "503" in event.last_error
+    assert event.next_attempt_at > datetime.now(timezone.utc)
+    assert await processor.process_pending() == 0  # ещё не время повтора
+
+    # Время повтора наступило, шлюз снова доступен
+    mock.down = False
+    mock.payments["pay-1"] = _payment("succeeded", order_id)
+    await db_session.execute(
+        update(PaymentEvent).values(next_attempt_at=func.now() - timedelta(seconds=1))
+    )
+    await db_session.commit()
+    assert await processor.process_pending() == 1
+    assert (await db_session.get(Order, order_id, populate_existing=True)).is_paid
+
+
+async def test_hopeless_events_are_closed_instead_of_retried(
+    api, db_session, session_maker, yookassa, prepaid_order, monkeypatch
+):
+    mock, client = yookassa
+    order_id, _ = prepaid_order
+    monkeypatch.setattr(settings, "payment_event_max_attempts", 2)
+    mock.payments["pay-1"] = {**_payment("succeeded", order_id), "metadata": {"order_id": "abc"}}
+    mock.payments["pay-2"] = {**_payment("pending", order_id), "id": "pay-2"}
+    await _post(api, _notification("payment.succeeded", order_id=order_id))
+    await _post(api, _notification("payment.succeeded", payment_id="pay-unknown"))  # 404 в ЮKassa
+    await _post(api, _notification("payment.succeeded", payment_id="pay-2"))  # в API так и не оплачен
+    processor = PaymentEventProcessor(factory=session_maker, client=client)
+
+    assert await processor.process_pending() == 3
+    await db_session.execute(update(PaymentEvent).values(next_attempt_at=func.now() - timedelta(seconds=1)))
+    await db_session.commit()
+    assert await processor.process_pending() == 1
+    assert await processor.process_pending() == 0
+
+    events = {
+        e.payment_id: e
+        for e in (await db_session.execute(select(PaymentEvent).execution_options(populate_existing=True))).scalars()
+    }
+    assert {pid: e.result for pid, e in events.items()} == {"pay-1": "invalid", "pay-unknown": "rejected", "pay-2": "failed"}
+    assert all(e.processed_at is not None for e in events.values())
+    assert "404" in events["pay-unknown"].last_error and events["pay-2"].attempts == 2
+    assert not (await db_session.get(Order, order_id, populate_existing=True)).is_paid
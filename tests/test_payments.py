@@ -0,0 +1,154 @@
+import asyncio
+import base64
+import uuid
+
+import pytest
+from aiohttp import web
+from sqlalchemy import select
+
+from app.core.config import YooKassaSettings
+from app.models.order import Order
+from app.models.user import User
+from app.schemas.order import OrderCreate, OrderItemIn
+from app.services.order_service import OrderService
+from app.services.payments import (
+    PaymentGatewayUnavailable,
+    PaymentRejected,
+    PaymentService,
+    YooKassaClient,
+)
+
+
+class MockYooKassa:
+    """Локальная ЮKassa: POST /v3/payments с ключами идемпотентности и сценариями сбоев."""
+
+    def __init__(self) -> None:
+        self.requests: list[str] = []  # Idempotence-Key каждого запроса
+        self.payments: dict[str, dict] = {}
+        self.fail_next = 0  # ответить 500 столько раз
+        self.delay = 0.0  # задержка ответа, сек.
+        self.reject = False
+
+    async def create(self, request: web.Request) -> web.Response:
+        key = request.headers["Idempotence-Key"]
+        self.requests.append(key)
+        assert request.headers["Authorization"] == "Basic " + base64.b64encode(b"shop:secret").decode()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_next:
+            self.fail_next -= 1
+            return web.json_response({"type": "error", "code": "internal_server_error"}, status=500)
+        if self.reject:
+            return web.json_response(
+                {"type": "error", "code": "invalid_request", "description": "Invalid amount"}, status=400
+            )
+        if key not in self.payments:
+            body = await request.json()
+            payment_id = str(uuid.uuid4())
+            self.payments[key] = {
+                "id": payment_id,
+                "status": "pending",
+                "amount": body["amount"],
+                "metadata": body["metadata"],
+                "confirmation": {"type": "redirect", "confirmation_url": f"https://yoomoney.test/{payment_id}"},
+            }
+        return web.json_response(self.payments[key])
+
+
+@pytest.fixture
+async def yookassa():
+    mock = MockYooKassa()
+    app = web.Application()
+    app.router.add_post("/v3/payments", mock.create)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    config = YooKassaSettings(
+        shop_id="shop",
+        secret_key="secret",
+        api_url=f"http://127.0.0.1:{port}/v3",
+        timeout_seconds=0.2,
+        retries=2,
+        retry_backoff_seconds=0.01,
+        breaker_failures=3,
+        breaker_reset_seconds=30,
+    )
+    client = YooKassaClient(config)
+    yield mock, client
+    await client.aclose()
+    await runner.cleanup()
+
+
+async def _create(client: YooKassaClient, key: str = "order-1") -> dict:
+    return await client.create_payment(amount=100, description="test", idempotence_key=key)
+
+
+async def test_server_errors_are_retried_with_the_same_key(yookassa):
+    mock, client = yookassa
+    mock.fail_next = 2
+    payment = await _create(client)
+    assert payment["status"] == "pending"
+    assert mock.requests == ["order-1"] * 3
+    assert client.breaker.state == "closed"
+
+
+async def test_rejected_request_is_not_retried_and_does_not_trip_breaker(yookassa):
+    mock, client = yookassa
+    mock.reject = True
+    for _ in range(5):
+        with pytest.raises(PaymentRejected, match="Invalid amount"):
+            await _create(client)
+    assert len(mock.requests) == 5
+    assert client.breaker.state == "closed"
+
+
+async def test_slow_gateway_opens_breaker_and_calls_fail_fast(yookassa):
+    mock, client = yookassa
+    now = 1000.0
+    client.breaker.clock = lambda: now
+    mock.delay = 0.5  # дольше таймаута клиента
+    with pytest.raises(PaymentGatewayUnavailable):
+        await _create(client)  # 3 попытки — 3 ошибки подряд
+    assert client.breaker.state == "open"
+
+    attempts = len(mock.requests)
+    now += 29
+    with pytest.raises(PaymentGatewayUnavailable) as exc:
+        await _create(client)
+    assert len(mock.requests) == attempts  # в шлюз не ходили
+    assert exc.value.retry_after == pytest.approx(1)
+
+    # После паузы пробный запрос проходит и замыкает предохранитель
+    mock.delay = 0
+    now += 1
+    assert client.breaker.state == "half_open"
+    assert (await _create(client))["status"] == "pending"
+    assert client.breaker.state == "closed"
+
+
+async def test_order_payment_is_created_once_per_order(yookassa, db_session, make_products):
+    mock, client = yookassa
+    [pid] = await make_products(1, qty=10, price="12.50")
+    user = User(telegram_id=30)
+    db_session.add(user)
+    await db_session.commit()
+    order = await OrderService(db_session).create_order(
+        user=user,
+        data=OrderCreate(items=[OrderItemIn(product_id=pid, quantity=2)], delivery_type="pickup", payment_method="yookassa"),
+    )
+
+    service = PaymentService(db_session, client)
+    first = await service.create_for_order(user_id=user.id, order_id=order.id)
+    again = await service.create_for_order(user_id=user.id, order_id=order.id)
+
+    assert first == again
+    assert first.confirmation_url.endswith(first.payment_id)
+    assert mock.requests == [f"order-{order.id}"] * 2
+    assert mock.payments[f"order-{order.id}"]["amount"] == {"value": "25.00", "currency": "RUB"}
+    assert mock.payments[f"order-{order.id}"]["metadata"] == {"order_id": str(order.id)}
+    assert await db_session.scalar(select(Order.payment_id).where(Order.id == order.id)) == first.payment_id
+
+    with pytest.raises(ValueError):
+        await service.create_for_order(user_id=user.id + 1, order_id=order.id)
@@ -0,0 +1,123 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models.catalog import Category, Price, Product, ProductImage, Unit
+from app.repositories.product_repository import ProductRepository
+
+
+@pytest.fixture
+async def catalog(db_session):
+    """Дерево категорий root → child и товары с разными ценами и остатками."""
+    root = Category(name="root")
+    db_session.add(root)
+    await db_session.flush()
+    child = Category(name="child", parent_id=root.id)
+    other = Category(name="other")
+    unit = Unit(name="kg", symbol="кг")
+    db_session.add_all([child, other, unit])
+    await db_session.flush()
+
+    specs = [(root, "30", 5), (child, "10", 0), (child, "20", 3), (other, "10", 7), (child, "10", 1)]
+    products = []
+    for i, (cat, price, qty) in enumerate(specs):
+        p = Product(name=f"p{i}", category_id=cat.id, unit_id=unit.id, qty=qty)
+        db_session.add(p)
+        await db_session.flush()
+        db_session.add(Price(product_id=p.id, price=Decimal(price), is_current=True))
+        products.append(p)
+    await db_session.commit()
+    return {"root": root, "products": products}
+
+
+async def _collect(api, **params) -> list[int]:
+    ids: list[int] = []
+    cursor = None
+    while True:
+        query = dict(params, limit=2)
+        if cursor:
+            query["cursor"] = cursor
+        resp = await api.get("/products", params=query)
+        assert resp.status_code == 200
+        body = resp.json()
+        ids += [item["id"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_by_price_with_filters(api, catalog) -> None:
+    p = [prod.id for prod in catalog["products"]]
+
+    assert await _collect(api) == sorted(p)
+    assert await _collect(api, sort="price") == [p[1], p[3], p[4], p[2], p[0]]
+    assert await _collect(api, sort="price", category_id=catalog["root"].id) == [p[1], p[4], p[2], p[0]]
+    assert await _collect(api, sort="price", category_id=catalog["root"].id, in_stock=True) == [p[4], p[2], p[0]]
+    assert await _collect(api, price_min="15", price_max="25") == [p[2]]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_rejected(api, catalog) -> None:
+    resp = await api.get("/products", params={"cursor": "garbage"})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_returns_304_until_catalog_changes(api, catalog, db_session) -> None:
+    first = await api.get("/products")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert "max-age" in first.headers["cache-control"]
+
+    repeat = await api.get("/products", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+
+    await ProductRepository(db_session).set_current_price(catalog["products"][0].id, 99)
+    await db_session.commit()
+
+    changed = await api.get("/products", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_categories_list_supports_etag(api, catalog) -> None:
+    first = await api.get("/categories")
+    assert [c["name"] for c in first.json()] == ["root", "child", "other"]
+
+    repeat = await api.get("/categories", headers={"If-None-Match": first.headers["etag"]})
+    assert repeat.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_only_one_current_price_per_product(catalog, db_session) -> None:
+    product = catalog["products"][0]
+    repo = ProductRepository(db_session)
+    await repo.set_current_price(product.id, 35)
+    await db_session.commit()
+    assert await repo.get_price_for_product(product.id) == 35
+
+    db_session.add(Price(product_id=product.id, price=Decimal("1"), is_current=True))
+    with pytest.raises(IntegrityError):
+        await db_session.flush()
+    await db_session.rollback()
+
+
+@pytest.mark.asyncio
+async def test_listing_exposes_primary_image_variants(api, catalog, db_session) -> None:
+    first, second = catalog["products"][:2]
+    db_session.add_all([
+        ProductImage(product_id=first.id, file_path=f"products/{first.id}/a.png", is_primary=True, variant_widths=[160, 480]),
+        ProductImage(product_id=second.id, file_path=f"products/{second.id}/b.png", is_primary=True),
+    ])
+    await db_session.commit()
+
+    items = {item["id"]: item for item in (await api.get("/products", params={"limit": 2})).json()["items"]}
+    variants = items[first.id]["primary_image_variants"]
+    assert variants["webp"]["160"].endswith(f"/products/{first.id}/a_w160.webp")
+    assert variants["jpeg"]["480"].endswith(f"/products/{first.id}/a_w480.jpg")
+    assert items[second.id]["primary_image_variants"] is None  # варианты ещё не созданы
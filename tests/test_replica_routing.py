@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.cache import catalog_cache
+from app.core.config import Settings
+from app.core.db import ReplicaRouter
+from app.models.catalog import Category
+from app.models.user import User
+from app.schemas.order import OrderCreate, OrderItemIn
+from app.services.cart_service import CartService
+from app.services.order_service import OrderService
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+DEAD_REPLICA_URL = "postgresql+asyncpg://postgres@127.0.0.1:1/cabbage"
+
+
+@pytest.fixture
+async def primary(db_engine):
+    return async_sessionmaker(db_engine, expire_on_commit=False)
+
+
+@pytest.fixture
+async def make_router(primary):
+    routers: list[ReplicaRouter] = []
+
+    def _make(*urls: str, **overrides) -> ReplicaRouter:
+        router = ReplicaRouter(primary, list(urls), Settings(**overrides))
+        routers.append(router)
+        return router
+
+    yield _make
+    for router in routers:
+        await router.dispose()
+
+
+def _replica_url(name: str) -> str:
+    url = make_url(TEST_DATABASE_URL).update_query_dict({"application_name": name})
+    return url.render_as_string(hide_password=False)
+
+
+def _name(factory) -> str:
+    return factory.kw["bind"].url.query["application_name"]
+
+
+@pytest.mark.asyncio
+async def test_reads_go_round_robin_and_fall_back_to_primary(make_router, primary) -> None:
+    assert make_router().read_factory() is primary
+
+    router = make_router(_replica_url("r1"), _replica_url("r2"))
+    assert [_name(router.read_factory()) for _ in range(4)] == ["r1", "r2", "r1", "r2"]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_is_ejected(make_router, primary) -> None:
+    router = make_router(DEAD_REPLICA_URL, db_replica_eject_seconds=60)
+
+    factory = router.read_factory()
+    assert factory is not primary
+    with pytest.raises(OSError):
+        async with factory() as session:
+            await session.execute(text("SELECT 1"))
+
+    assert router.read_factory() is primary
+    assert router.stats()[0]["available"] is False
+
+
+@pytest.mark.asyncio
+async def test_only_catalog_commits_pin_reads_to_primary(make_router, primary, make_products) -> None:
+    [pid] = await make_products(1)
+    router = make_router(_replica_url("r1"), db_replica_max_lag_seconds=60)
+
+    # Корзина и заказы — записи на primary, но каталог они не меняют
+    async with primary() as session:
+        user = User(telegram_id=70)
+        session.add(user)
+        await session.commit()
+        await CartService(session).add_item(user.id, pid, 2)
+        data = OrderCreate(items=[OrderItemIn(product_id=pid, quantity=2)], delivery_type="pickup")
+        await OrderService(session).create_order(user=user, data=data)
+    assert router.read_factory() is not primary
+
+    async with primary() as session:
+        session.add(Category(name="c"))
+        catalog_cache.mark_dirty(session)
+        await session.commit()
+    assert router.read_factory() is primary
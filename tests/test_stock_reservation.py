@@ -0,0 +1,104 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.catalog import Product
+from app.models.order import Order, OrderStatus, ReservationStatus, StockReservation
+from app.models.user import User
+from app.repositories.order_repository import OrderRepository
+from app.repositories.reservation_repository import ReservationRepository
+from app.schemas.order import OrderCreate, OrderItemIn
+from app.services.order_service import OrderService
+from app.services.reservation_service import ReservationService
+
+
+async def _stock(session, product_ids: list[int]) -> list[int]:
+    res = await session.execute(select(Product.qty).where(Product.id.in_(product_ids)).order_by(Product.id))
+    return list(res.scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_parallel_checkouts_never_oversell(db_session, session_maker, make_products) -> None:
+    stock = 50
+    attempts = 300
+    product_ids = await make_products(2, qty=stock)
+    user = User(telegram_id=20)
+    db_session.add(user)
+    await db_session.commit()
+
+    async def checkout() -> bool:
+        # Товары в заказе в случайном порядке: блокировки всё равно берутся по возрастанию id
+        items = [OrderItemIn(product_id=pid, quantity=1) for pid in random.sample(product_ids, 2)]
+        async with session_maker() as session:
+            try:
+                await OrderService(session).create_order(user=user, data=OrderCreate(items=items, delivery_type="pickup"))
+            except ValueError:
+                return False
+        return True
+
+    results = await asyncio.gather(*(checkout() for _ in range(attempts)))
+
+    assert sum(results) == stock
+    assert await _stock(db_session, product_ids) == [0, 0]
+    reserved = await db_session.execute(select(func.sum(StockReservation.quantity)))
+    assert reserved.scalar_one() == 2 * stock
+
+
+@pytest.mark.asyncio
+async def test_cancel_releases_reservation_once(db_session, make_products) -> None:
+    [pid] = await make_products(1, qty=10)
+    user = User(telegram_id=21)
+    db_session.add(user)
+    await db_session.commit()
+    svc = OrderService(db_session)
+    order = await svc.create_order(user=user, data=OrderCreate(items=[OrderItemIn(product_id=pid, quantity=4)], delivery_type="pickup"))
+
+    await svc.cancel_order(user=user, order_id=order.id)
+    with pytest.raises(ValueError):
+        await svc.cancel_order(user=user, order_id=order.id)
+
+    assert await _stock(db_session, [pid]) == [10]
+    statuses = await db_session.execute(select(StockReservation.status).where(StockReservation.order_id == order.id))
+    assert statuses.scalars().all() == [ReservationStatus.RELEASED.value]
+
+
+@pytest.mark.asyncio
+async def test_expired_unpaid_orders_are_cancelled(db_session, make_products) -> None:
+    [pid] = await make_products(1, qty=10)
+    user = User(telegram_id=22)
+    db_session.add(user)
+    await db_session.commit()
+    repo = OrderRepository(db_session)
+    expired = await repo.create_order(
+        user_id=user.id, items=[(pid, 3)], delivery_type="pickup", address_id=None,
+        payment_method="yookassa", reservation_expires_at=datetime.utcnow() - timedelta(minutes=1),
+    )
+    fresh = await repo.create_order(
+        user_id=user.id, items=[(pid, 2)], delivery_type="pickup", address_id=None,
+        payment_method="yookassa", reservation_expires_at=datetime.utcnow() + timedelta(minutes=30),
+    )
+    await db_session.commit()
+
+    svc = ReservationService(db_session)
+    assert await svc.release_expired() == 1
+    assert await svc.release_expired() == 0
+
+    assert await _stock(db_session, [pid]) == [8]
+    res = await db_session.execute(select(Order.id, Order.status).where(Order.id.in_([expired.id, fresh.id])))
+    assert dict(res.all()) == {expired.id: OrderStatus.CANCELLED.value, fresh.id: OrderStatus.CREATED.value}
+
+
+@pytest.mark.asyncio
+async def test_order_without_items_is_rejected(api, as_user, db_session) -> None:
+    user = User(telegram_id=22)
+    db_session.add(user)
+    await db_session.commit()
+    as_user(user)
+
+    r = await api.post("/orders", json={"items": [], "delivery_type": "pickup"})
+    assert r.status_code == 422
+    with pytest.raises(ValueError):
+        await ReservationRepository(db_session).reserve(order_id=1, demand={}, expires_at=None)
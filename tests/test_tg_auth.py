@@ -0,0 +1,69 @@
+import hashlib
+import hmac
+import json
+import time
+import urllib.parse
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models.user import User
+from app.repositories.user_repository import UserRepository
+
+BOT_TOKEN = "123:test-token"
+
+
+def _init_data(user: dict, auth_date: int | None = None) -> str:
+    data = {"auth_date": str(auth_date or int(time.time())), "user": json.dumps(user)}
+    check = "\n".join(f"{k}={v}" for k, v in sorted(data.items())).encode()
+    secret = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    data["hash"] = hmac.new(secret, check, hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(data)
+
+
+@pytest.fixture
+def client(api, monkeypatch):
+    monkeypatch.setattr(settings, "telegram_bot_token", BOT_TOKEN)
+    monkeypatch.setattr(settings, "jwt_secret", "secret")
+    return api
+
+
+@pytest.mark.asyncio
+async def test_replayed_init_data_skips_verification_and_db(client, query_counter) -> None:
+    init_data = _init_data({"id": 42, "first_name": "Ann"})
+
+    first = await client.post("/tg/webapp/auth", json={"init_data": init_data})
+    assert first.status_code == 200
+
+    query_counter.reset()
+    second = await client.post("/tg/webapp/auth", json={"init_data": init_data})
+    assert second.status_code == 200
+    assert query_counter.count == 0
+    assert second.json()["user_id"] == first.json()["user_id"]
+
+
+@pytest.mark.asyncio
+async def test_tampered_init_data_is_rejected_even_after_replay(client) -> None:
+    init_data = _init_data({"id": 42, "first_name": "Ann"})
+    assert (await client.post("/tg/webapp/auth", json={"init_data": init_data})).status_code == 200
+
+    forged = init_data.replace("42", "43")
+    assert (await client.post("/tg/webapp/auth", json={"init_data": forged})).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_upsert_writes_only_changed_profiles(db_session) -> None:
+    repo = UserRepository(db_session)
+    created = await repo.upsert_profile(telegram_id=7, profile={"first_name": "Ann"})
+    await db_session.commit()
+    assert created is not None
+
+    assert await repo.upsert_profile(telegram_id=7, profile={"first_name": "Ann"}) is None
+    await db_session.rollback()
+
+    changed = await repo.upsert_profile(telegram_id=7, profile={"first_name": "Anna"})
+    await db_session.commit()
+    assert changed.id == created.id
+    user = await db_session.scalar(select(User).where(User.telegram_id == 7))
+    assert user.first_name == "Anna"
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from app.main import app
+from app.telegram.update_queue import Submit, UpdateQueue
+
+TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+
+def _raw(update_id: int, chat_id: int, text: str = "hi") -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "u"},
+            "text": text,
+        },
+    }
+
+
+def _dispatcher(seen: list[tuple[int, int]], gate: asyncio.Event | None = None) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def record(message: Message) -> None:
+        if gate is not None:
+            await gate.wait()
+        await asyncio.sleep(0.001 * (message.message_id % 3))  # разное время обработки
+        seen.append((message.chat.id, message.message_id))
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_chat_are_processed_in_order() -> None:
+    seen: list[tuple[int, int]] = []
+    bot = Bot(TOKEN)
+    queue = UpdateQueue(_dispatcher(seen), bot, workers=3, max_size=300)
+    queue.start()
+    for i in range(1, 61):
+        update = Update.model_validate(_raw(i, chat_id=i % 4), context={"bot": bot})
+        assert queue.submit(update) is Submit.QUEUED
+    await queue.stop()
+
+    assert len(seen) == 60
+    for chat_id in range(4):
+        ids = [mid for cid, mid in seen if cid == chat_id]
+        assert ids == sorted(ids)
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_duplicates_and_overflow_are_not_queued() -> None:
+    bot = Bot(TOKEN)
+    queue = UpdateQueue(_dispatcher([]), bot, workers=1, max_size=2)  # воркеры не запущены
+    updates = [Update.model_validate(_raw(i, chat_id=1), context={"bot": bot}) for i in (1, 2, 3)]
+
+    assert queue.submit(updates[0]) is Submit.QUEUED
+    assert queue.submit(updates[0]) is Submit.DUPLICATE
+    assert queue.submit(updates[1]) is Submit.QUEUED
+    assert queue.submit(updates[2]) is Submit.QUEUE_FULL
+    assert queue.qsize() == 2
+    await bot.session.close()
+
+
+@pytest.mark.asyncio
+async def test_webhook_acks_before_handler_finishes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "telegram_mode", "webhook")
+    monkeypatch.setattr(settings, "telegram_webhook_secret", "s3cret")
+    seen: list[tuple[int, int]] = []
+    gate = asyncio.Event()
+    bot = Bot(TOKEN)
+    queue = UpdateQueue(_dispatcher(seen, gate), bot, workers=2, max_size=10)
+    queue.start()
+    monkeypatch.setattr(app.state, "update_queue", queue, raising=False)
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.post(settings.telegram_webhook_path, json=_raw(10, 5), headers=headers)
+        retry = await ac.post(settings.telegram_webhook_path, json=_raw(10, 5), headers=headers)
+        forged = await ac.post(settings.telegram_webhook_path, json=_raw(11, 5), headers={})
+        broken = await ac.post(settings.telegram_webhook_path, content=b"{not json", headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert (forged.status_code, broken.status_code) == (403, 400)
+    assert seen == []  # хендлер ещё ждёт, а Telegram уже получил ответ
+
+    gate.set()
+    await queue.stop()
+    assert seen == [(5, 10)]
+    await bot.session.close()
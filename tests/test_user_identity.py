@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import event, func, select
+
+from app.models.user import User, UserRole
+from app.schemas.user import UserMe
+from app.services.user_service import UserService
+
+
+@pytest.mark.asyncio
+async def test_known_user_is_resolved_read_only_and_cached(db_session, db_engine, query_counter) -> None:
+    db_session.add(User(telegram_id=10))
+    await db_session.commit()
+
+    commits: list[object] = []
+
+    def on_commit(conn) -> None:
+        commits.append(conn)
+
+    event.listen(db_engine.sync_engine, "commit", on_commit)
+    try:
+        query_counter.reset()
+        first = await UserService(db_session).resolve_identity(telegram_id=10)
+        assert query_counter.count == 1
+        assert not db_session.dirty and not db_session.new
+
+        query_counter.reset()
+        second = await UserService(db_session).resolve_identity(telegram_id=10)
+        assert query_counter.count == 0
+    finally:
+        event.remove(db_engine.sync_engine, "commit", on_commit)
+
+    assert commits == []
+    assert first == second
+    assert first.role == UserRole.CUSTOMER
+
+
+@pytest.mark.asyncio
+async def test_new_user_is_created_once(db_session) -> None:
+    identity = await UserService(db_session).resolve_identity(telegram_id=11)
+    assert await db_session.scalar(select(func.count()).select_from(User)) == 1
+    assert identity.telegram_id == 11
+
+
+@pytest.mark.asyncio
+async def test_role_change_invalidates_cached_identity(db_session) -> None:
+    svc = UserService(db_session)
+    assert (await svc.resolve_identity(telegram_id=12)).role == UserRole.CUSTOMER
+
+    await svc.set_role(telegram_id=12, role=UserRole.MANAGER)
+    assert (await svc.resolve_identity(telegram_id=12)).role == UserRole.MANAGER
+
+
+@pytest.mark.asyncio
+async def test_admin_changes_role_via_api(api, as_user, db_session) -> None:
+    svc = UserService(db_session)
+    customer = await svc.resolve_identity(telegram_id=13)
+    assert customer.role == UserRole.CUSTOMER
+
+    as_user(customer)
+    assert (await api.put("/users/13/role", json={"role": 1})).status_code == 403
+
+    as_user(UserMe(id=0, telegram_id=1, role=UserRole.ADMIN))
+    r = await api.put("/users/13/role", json={"role": int(UserRole.MANAGER)})
+    assert r.status_code == 200 and r.json()["role"] == UserRole.MANAGER
+    assert (await api.put("/users/999/role", json={"role": 2})).status_code == 404
+    assert (await api.put("/users/13/role", json={"role": 5})).status_code == 422
+
+    assert (await svc.resolve_identity(telegram_id=13)).role == UserRole.MANAGER